@@ -1,13 +1,21 @@
-from flask import Flask, g, session
+from flask import Flask, session
 from config import Config
-from .models import db, Notification
+from .models import db
 from flask_bcrypt import Bcrypt
 from flask_mail import Mail
+from .jobs.runner import JobRunner
+from .notification.outbox import OutboxDispatcher
+from .attendance.ingest import PunchWriter
+from .database import engine_options, configure_engine, init_read_engine
+from .notification.cache import get_unread_count
 import os
 
 # Khởi tạo các extensions ở ngoài factory
 bcrypt = Bcrypt()
 mail = Mail()
+job_runner = JobRunner()
+outbox = OutboxDispatcher()
+punch_writer = PunchWriter()
 
 def create_app(config_class=Config):
     app = Flask(__name__)
@@ -17,26 +25,40 @@ def create_app(config_class=Config):
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
     # Khởi tạo các extensions với app
+    # Pool + PRAGMA SQLite theo DB_PROFILE (xem app/database.py), phải có trước khi engine mở kết nối đầu tiên
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
     db.init_app(app)
+    with app.app_context():
+        configure_engine(db.engine, app.config)
     bcrypt.init_app(app)
     mail.init_app(app)
 
-    @app.before_request
-    def load_user_notifications():
+    # Cập nhật schema (bảng / index mới) trước khi các extension khác dùng tới CSDL
+    from .migrations import upgrade, schema_cli
+    app.cli.add_command(schema_cli)
+    from .schedule.generator import schedule_cli
+    app.cli.add_command(schedule_cli)
+    applied = []
+    if app.config.get('AUTO_MIGRATE', True):
+        with app.app_context():
+            applied = upgrade()
+    # Engine đọc tạo SAU migration: bản sao chỉ đọc được chụp lại khi schema vừa thay đổi
+    with app.app_context():
+        init_read_engine(app, db.engine, refresh=bool(applied))
+
+    job_runner.init_app(app)
+    outbox.init_app(app)
+    punch_writer.init_app(app)
+
+    @app.context_processor
+    def inject_unread_notifications_count():
         """
-        Hàm này sẽ chạy TRƯỚC MỖI REQUEST.
-        Nó lấy số thông báo chưa đọc và lưu vào biến global 'g'
-        để template có thể truy cập được.
+        Chỉ chạy khi render template (không chạy cho file static hay API JSON).
+        Lấy số thông báo chưa đọc từ cache để hiển thị trên thanh điều hướng.
         """
         if 'user_id' in session:
-            # Chỉ đếm số thông báo CHƯA ĐỌC
-            count = Notification.query.filter_by(
-                user_id=session['user_id'], 
-                is_read=False
-            ).count()
-            g.unread_notifications_count = count
-        else:
-            g.unread_notifications_count = 0
+            return {'unread_notifications_count': get_unread_count(session['user_id'])}
+        return {'unread_notifications_count': 0}
     # ========================================================
 
     # Đăng ký các Blueprints
@@ -49,6 +71,7 @@ def create_app(config_class=Config):
     from .notification.routes import notification_bp
     from .user.routes import user_bp
     from .schedule.routes import schedule_bp
+    from .jobs.routes import jobs_bp
 
     
     app.register_blueprint(auth_bp)
@@ -60,6 +83,7 @@ def create_app(config_class=Config):
     app.register_blueprint(notification_bp)
     app.register_blueprint(user_bp)
     app.register_blueprint(schedule_bp)
+    app.register_blueprint(jobs_bp)
 
 
     return app
\ No newline at end of file
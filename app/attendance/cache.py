@@ -0,0 +1,101 @@
+# /app/attendance/cache.py
+# Cache cho trang lịch sử chấm công toàn công ty (all_history):
+#   - danh sách nhân viên cho dropdown lọc (TTL, xóa khi thêm/sửa/xóa nhân viên)
+#   - tổng số lượt chấm công: số gần đúng, khi hết hạn vẫn trả về số cũ và đếm lại ở thread nền,
+#     nên request không bao giờ phải chờ một COUNT(*) trên cả bảng (trừ lần đầu tiên).
+
+import threading
+from datetime import datetime, timedelta
+from typing import List, Tuple
+from cachetools import TTLCache
+from flask import current_app
+from ..models import db, User, Attendance
+
+_employee_options = None
+_attendance_totals = {}  # employee_id (0 = tất cả) -> (số lượt, thời điểm đếm)
+_refreshing = set()
+_lock = threading.Lock()
+
+
+# ============================================
+# ===     DANH SÁCH NHÂN VIÊN (DROPDOWN)    ===
+# ============================================
+
+def _options_cache() -> TTLCache:
+    global _employee_options
+    if _employee_options is None:
+        with _lock:
+            if _employee_options is None:
+                _employee_options = TTLCache(maxsize=1, ttl=current_app.config.get('EMPLOYEE_CACHE_TTL', 300))
+    return _employee_options
+
+
+def get_employee_options() -> List[Tuple[int, str]]:
+    """(id, username) của tất cả nhân viên (không tính admin), sắp theo username."""
+    cache = _options_cache()
+    with _lock:
+        options = cache.get('employees')
+    if options is None:
+        options = db.session.query(User.id, User.username).filter(
+            User.role != 'admin').order_by(User.username).all()
+        with _lock:
+            cache['employees'] = options
+    return options
+
+
+def invalidate_employee_options():
+    """Gọi sau khi thêm / đổi tên / xóa nhân viên."""
+    cache = _options_cache()
+    with _lock:
+        cache.pop('employees', None)
+
+
+# ============================================
+# ===     TỔNG SỐ LƯỢT CHẤM CÔNG (GẦN ĐÚNG)  ===
+# ============================================
+
+def _count_attendances(employee_id: int) -> int:
+    query = db.session.query(db.func.count(Attendance.id))
+    if employee_id:
+        query = query.filter(Attendance.user_id == employee_id)
+    return query.scalar()
+
+
+def _refresh_total(app, employee_id: int):
+    """Đếm lại ở thread nền rồi cập nhật cache."""
+    try:
+        with app.app_context():
+            try:
+                count = _count_attendances(employee_id)
+                with _lock:
+                    _attendance_totals[employee_id] = (count, datetime.utcnow())
+            finally:
+                db.session.remove()
+    finally:
+        with _lock:
+            _refreshing.discard(employee_id)
+
+
+def get_attendance_total(employee_id: int = 0) -> Tuple[int, datetime]:
+    """
+    Tổng số lượt chấm công (của một nhân viên, hoặc cả công ty nếu employee_id = 0)
+    và thời điểm đếm (UTC). Số có thể cũ tối đa ATTENDANCE_COUNT_TTL giây cộng thời gian đếm lại.
+    """
+    ttl = timedelta(seconds=current_app.config.get('ATTENDANCE_COUNT_TTL', 300))
+    with _lock:
+        cached = _attendance_totals.get(employee_id)
+        stale = cached is not None and datetime.utcnow() - cached[1] > ttl
+        start_refresh = stale and employee_id not in _refreshing
+        if start_refresh:
+            _refreshing.add(employee_id)
+
+    if cached is None:
+        # Lần đầu: chưa có số nào để trả về, phải đếm ngay
+        count = _count_attendances(employee_id)
+        cached = (count, datetime.utcnow())
+        with _lock:
+            _attendance_totals[employee_id] = cached
+    elif start_refresh:
+        threading.Thread(target=_refresh_total, args=(current_app._get_current_object(), employee_id),
+                         name='attendance-count', daemon=True).start()
+    return cached
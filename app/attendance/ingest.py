@@ -0,0 +1,233 @@
+# /app/attendance/ingest.py
+# Ghi lượt check-in / check-out.
+#   - Mặc định: mỗi request tự ghi và commit (một transaction / lượt chấm công).
+#   - PUNCH_BATCHING bật: request đưa lượt chấm công vào hàng đợi trong bộ nhớ, MỘT thread ghi duy nhất
+#     gom các lượt đến trong vài mili-giây thành một transaction (group commit) rồi mới trả kết quả,
+#     nên giờ giao ca không còn hàng trăm request tranh nhau khóa ghi SQLite ("database is locked").
+
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import datetime
+import pytz
+from sqlalchemy.exc import IntegrityError
+from ..models import db, Attendance, Schedule, Shift
+from .rollup import refresh_daily_rollup, record_first_check_in
+
+VN_TZ = pytz.timezone('Asia/Ho_Chi_Minh')
+
+# Kết quả một lượt chấm công, route hiển thị bằng flash(message, category)
+PunchResult = namedtuple('PunchResult', ['category', 'message'])
+
+DUPLICATE_CHECK_IN = PunchResult('warning', 'Bạn đã check-in rồi (yêu cầu bị gửi trùng).')
+NOT_ACKNOWLEDGED = PunchResult('danger', 'Hệ thống đang bận, lượt chấm công chưa được xác nhận. '
+                                         'Vui lòng tải lại trang để kiểm tra trước khi thử lại.')
+
+
+# ============================================
+# ===     ÁP DỤNG MỘT LƯỢT CHẤM CÔNG        ===
+# ============================================
+
+def _check_in_state(user_id: int, today):
+    """
+    Toàn bộ dữ liệu cần cho check-in trong MỘT câu SELECT:
+    open_check_in (ca chưa check-out), existing_today_id (đã check-in hôm nay),
+    schedule_id / shift_name / shift_start (lịch và ca làm hôm nay, nếu có).
+    """
+    open_check_in = db.select(Attendance.check_in).where(
+        Attendance.user_id == user_id, Attendance.check_out.is_(None)
+    ).limit(1).scalar_subquery()
+    existing_today = db.select(Attendance.id).where(
+        Attendance.user_id == user_id, Attendance.date == today, Attendance.check_in.isnot(None)
+    ).limit(1).scalar_subquery()
+    anchor = db.select(db.literal(1).label('one')).subquery()
+
+    stmt = db.select(
+        open_check_in.label('open_check_in'),
+        existing_today.label('existing_today_id'),
+        Schedule.id.label('schedule_id'),
+        Shift.name.label('shift_name'),
+        Shift.start_time.label('shift_start')
+    ).select_from(anchor).outerjoin(
+        Schedule, db.and_(Schedule.user_id == user_id, Schedule.date == today)
+    ).outerjoin(Shift, Shift.id == Schedule.shift_id)
+    return db.session.execute(stmt).one()
+
+
+def apply_check_in(user_id: int, check_time: datetime) -> PunchResult:
+    """
+    Check-in (KHÔNG commit): một câu SELECT trạng thái, một câu INSERT và cập nhật bảng tổng hợp.
+    - CHỈ cho phép check-in nếu không có ca làm nào khác đang mở.
+    - Tự gán schedule_id theo lịch hôm nay và tính số phút trễ.
+    Index unique một phần (một ca mở / nhân viên) làm câu INSERT ném IntegrityError nếu bị gửi trùng.
+    """
+    today = check_time.date()
+    state = _check_in_state(user_id, today)
+
+    if state.open_check_in:
+        open_check_in = state.open_check_in
+        if open_check_in.tzinfo is None:
+            open_check_in = VN_TZ.localize(open_check_in)
+        return PunchResult('danger', f"Lỗi: Bạn chưa check-out cho ca làm bắt đầu lúc "
+                                     f"{open_check_in.astimezone(VN_TZ).strftime('%H:%M ngày %d/%m')}. "
+                                     f"Vui lòng check-out trước!")
+
+    if state.existing_today_id:
+        return PunchResult('warning', 'Bạn đã check-in hôm nay rồi (logic dự phòng).')
+
+    db.session.execute(db.insert(Attendance).values(
+        user_id=user_id,
+        check_in=check_time,
+        date=today,
+        schedule_id=state.schedule_id
+    ))
+    late_minutes = record_first_check_in(user_id, today, check_time, state.schedule_id, state.shift_start)
+
+    if not state.schedule_id:
+        return PunchResult('success', f'Check-in thành công lúc {check_time.strftime("%H:%M:%S")} (Không có lịch làm việc)')
+    if late_minutes > 0:
+        return PunchResult('warning', f'Check-in thành công lúc {check_time.strftime("%H:%M:%S")} - '
+                                      f'Ca: {state.shift_name} (Trễ {late_minutes} phút)')
+    return PunchResult('success', f'Check-in thành công lúc {check_time.strftime("%H:%M:%S")} - Ca: {state.shift_name}')
+
+
+def apply_check_out(user_id: int, check_time: datetime) -> PunchResult:
+    """Check-out (KHÔNG commit): đóng ca làm GẦN NHẤT chưa check-out."""
+    attendance_to_close = Attendance.query.filter_by(
+        user_id=user_id,
+        check_out=None
+    ).order_by(Attendance.check_in.desc()).first()
+
+    if not attendance_to_close:
+        return PunchResult('warning', 'Bạn chưa check-in (hoặc đã check-out rồi)!')
+
+    attendance_to_close.check_out = check_time
+    refresh_daily_rollup(user_id, attendance_to_close.date)
+    return PunchResult('success', f'Check-out thành công lúc {check_time.strftime("%H:%M:%S")}')
+
+
+_APPLY = {'check_in': apply_check_in, 'check_out': apply_check_out}
+
+
+def record_punch(kind: str, user_id: int, check_time: datetime) -> PunchResult:
+    """Ghi một lượt chấm công trong transaction riêng ('check_in' hoặc 'check_out')."""
+    try:
+        result = _APPLY[kind](user_id, check_time)
+        db.session.commit()
+        return result
+    except IntegrityError:
+        db.session.rollback()
+        if kind == 'check_in':
+            return DUPLICATE_CHECK_IN
+        raise
+
+
+# ============================================
+# ===        GHI GỘP (GROUP COMMIT)        ===
+# ============================================
+
+class PunchWriter:
+    """
+    Thread ghi duy nhất cho các lượt chấm công khi bật PUNCH_BATCHING.
+
+    Khởi tạo giống các extension khác: punch_writer = PunchWriter(); punch_writer.init_app(app)
+    Cấu hình:
+      - PUNCH_BATCHING: bật chế độ ghi gộp (tắt = mỗi request tự commit như cũ)
+      - PUNCH_BATCH_WINDOW: số giây chờ gom thêm lượt sau lượt đầu tiên của một lô
+      - PUNCH_BATCH_SIZE: số lượt tối đa mỗi lô (mỗi lô là một transaction)
+      - PUNCH_ACK_TIMEOUT: số giây request chờ lô của mình được commit
+    Request chỉ nhận kết quả SAU KHI lô đã commit, nên lượt chấm công được báo thành công là đã nằm trong CSDL.
+    Với SQLite, chế độ này chuyển CSDL sang WAL để các request đọc không bị chặn khi thread ghi đang commit.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = queue.Queue()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('PUNCH_BATCHING', False)
+        app.config.setdefault('PUNCH_BATCH_WINDOW', 0.005)
+        app.config.setdefault('PUNCH_BATCH_SIZE', 200)
+        app.config.setdefault('PUNCH_ACK_TIMEOUT', 10)
+        app.extensions['punch_writer'] = self
+
+        if app.config['PUNCH_BATCHING'] and self._thread is None:
+            # journal_mode do configure_engine (app/database.py) đặt theo DB_PROFILE
+            self._thread = threading.Thread(target=self._loop, name='punch-writer', daemon=True)
+            self._thread.start()
+
+    @property
+    def enabled(self) -> bool:
+        return self._thread is not None
+
+    def record(self, kind: str, user_id: int, check_time: datetime) -> PunchResult:
+        """
+        Ghi một lượt chấm công và trả về kết quả để hiển thị.
+        Chế độ ghi gộp: chờ tới khi lô chứa lượt này được commit (tối đa PUNCH_ACK_TIMEOUT giây).
+        """
+        if not self.enabled:
+            return record_punch(kind, user_id, check_time)
+
+        future = Future()
+        self._queue.put((kind, user_id, check_time, future))
+        try:
+            return future.result(timeout=self.app.config['PUNCH_ACK_TIMEOUT'])
+        except FutureTimeoutError:
+            return NOT_ACKNOWLEDGED
+
+    def _next_batch(self):
+        """Chờ lượt đầu tiên, rồi gom thêm trong PUNCH_BATCH_WINDOW giây hoặc tới PUNCH_BATCH_SIZE lượt."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.app.config['PUNCH_BATCH_WINDOW']
+        while len(batch) < self.app.config['PUNCH_BATCH_SIZE']:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            with self.app.app_context():
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    self.app.logger.exception('Không ghi được lô %d lượt chấm công', len(batch))
+                    for *_, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                finally:
+                    db.session.remove()
+
+    def _write_batch(self, batch):
+        """
+        Áp dụng cả lô trong MỘT transaction rồi commit một lần.
+        Thread ghi là nơi duy nhất ghi lượt chấm công nên các lượt trong lô được kiểm tra tuần tự, không tranh chấp.
+        Nếu lô lỗi (vd. trùng với một lượt admin vừa sửa tay), ghi lại từng lượt riêng lẻ
+        để lỗi chỉ ảnh hưởng tới đúng request gây ra nó.
+        """
+        try:
+            results = [_APPLY[kind](user_id, check_time) for kind, user_id, check_time, _ in batch]
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            for kind, user_id, check_time, future in batch:
+                try:
+                    future.set_result(record_punch(kind, user_id, check_time))
+                except Exception as e:
+                    db.session.rollback()
+                    self.app.logger.exception('Không ghi được lượt %s của nhân viên %s (lô %d lượt)',
+                                              kind, user_id, len(batch))
+                    future.set_exception(e)
+            return
+
+        for (*_, future), result in zip(batch, results):
+            future.set_result(result)
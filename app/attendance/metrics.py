@@ -0,0 +1,195 @@
+# /app/attendance/metrics.py
+
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+from ..models import db, User, Attendance, AttendanceDaily, Contract, Payroll, LeaveRequest
+
+
+# ============================================
+# === CÁC HÀM HỖ TRỢ CHO DASHBOARD ADMIN  ===
+# ============================================
+# Mỗi biểu đồ được tính bằng MỘT truy vấn gộp (GROUP BY) trên toàn bộ nhân viên,
+# thay vì lặp qua từng nhân viên. Số truy vấn không phụ thuộc vào số nhân viên.
+
+def _employee_ids_subquery():
+    """Subquery id của tất cả nhân viên (không tính admin)."""
+    return db.select(User.id).where(User.role != 'admin').scalar_subquery()
+
+
+def _month_range(month_date: date) -> Tuple[date, date]:
+    """Trả về ngày đầu và ngày cuối của tháng chứa month_date."""
+    month_start = month_date.replace(day=1)
+    month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return month_start, month_end
+
+
+def _recent_months(today: date, count: int = 6) -> List[date]:
+    """Danh sách ngày đại diện cho `count` tháng gần nhất (cũ nhất trước)."""
+    return [today.replace(day=1) - timedelta(days=i * 30) for i in range(count - 1, -1, -1)]
+
+
+def _bin_hours(hours: float) -> str:
+    if hours < 20:
+        return '0-20'
+    elif hours < 40:
+        return '20-40'
+    elif hours < 60:
+        return '40-60'
+    elif hours < 80:
+        return '60-80'
+    elif hours < 100:
+        return '80-100'
+    return '100+'
+
+
+def _bin_salary(salary: float) -> str:
+    if salary < 5000000:
+        return '0-5M'
+    elif salary < 10000000:
+        return '5-10M'
+    elif salary < 15000000:
+        return '10-15M'
+    elif salary < 20000000:
+        return '15-20M'
+    return '20M+'
+
+
+def _daily_checkin_counts(start: date, end: date) -> Dict[date, int]:
+    """Số lượt check-in của nhân viên theo từng ngày trong khoảng [start, end]."""
+    rows = db.session.query(
+        Attendance.date, db.func.count(Attendance.id)
+    ).filter(
+        Attendance.date.between(start, end),
+        Attendance.check_in.isnot(None),
+        Attendance.user_id.in_(_employee_ids_subquery())
+    ).group_by(Attendance.date).all()
+    return {day: count for day, count in rows}
+
+
+def _monthly_trends(today: date, total_employees: int) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Tính đồng thời 'attendance_trend' (tỷ lệ ngày có điểm danh / ngày làm việc)
+    và 'performance_trend' (số ngày làm trung bình mỗi nhân viên) cho 6 tháng gần nhất.
+    """
+    months = _recent_months(today)
+    ranges = [_month_range(m) for m in months]
+    daily_counts = _daily_checkin_counts(ranges[0][0], ranges[-1][1])
+
+    attendance_trend = []
+    performance_trend = []
+    for month_date, (month_start, month_end) in zip(months, ranges):
+        days_in_month = [d for d in daily_counts if month_start <= d <= month_end]
+
+        total_days = (month_end - month_start).days + 1
+        working_days = sum(1 for d in range(total_days) if (month_start + timedelta(days=d)).weekday() < 5)
+        if working_days > 0:
+            attendance_trend.append({
+                'month': month_date.strftime('%m/%Y'),
+                'rate': round((len(days_in_month) / working_days) * 100, 1)
+            })
+
+        total_working_days = sum(daily_counts[d] for d in days_in_month)
+        performance_trend.append({
+            'month': month_date.strftime('%m/%Y'),
+            'avg_days': round(total_working_days / total_employees, 1) if total_employees else 0
+        })
+    return attendance_trend, performance_trend
+
+
+def _today_status(today: date, total_employees: int) -> Dict[str, int]:
+    """Phân bố trạng thái điểm danh hôm nay."""
+    checked_in, checked_out = db.session.query(
+        db.func.count(Attendance.id),
+        db.func.count(Attendance.check_out)
+    ).filter(
+        Attendance.date == today,
+        Attendance.check_in.isnot(None),
+        Attendance.user_id.in_(_employee_ids_subquery())
+    ).one()
+    return {
+        'checked_in': checked_in,
+        'still_working': checked_in - checked_out,
+        'not_checked_in': total_employees - checked_in
+    }
+
+
+def _leave_counts(column, keys: List[str]) -> Dict[str, int]:
+    """Đếm đơn từ theo một cột (status hoặc request_type) bằng một GROUP BY."""
+    counts = dict(db.session.query(column, db.func.count(LeaveRequest.id)).group_by(column).all())
+    return {key: counts.get(key, 0) for key in keys}
+
+
+def _hours_bins(today: date) -> Dict[str, int]:
+    """Histogram tổng giờ làm trong tháng hiện tại của từng nhân viên (đọc từ bảng tổng hợp theo ngày)."""
+    month_start, month_end = _month_range(today)
+    rows = db.session.query(db.func.sum(AttendanceDaily.worked_seconds)).filter(
+        AttendanceDaily.date.between(month_start, month_end),
+        AttendanceDaily.completed_punches > 0,
+        AttendanceDaily.user_id.in_(_employee_ids_subquery())
+    ).group_by(AttendanceDaily.user_id).all()
+
+    hours_bins = {'0-20': 0, '20-40': 0, '40-60': 0, '60-80': 0, '80-100': 0, '100+': 0}
+    for (total_seconds,) in rows:
+        total_hours = round((total_seconds or 0) / 3600, 1)
+        if total_hours > 0:
+            hours_bins[_bin_hours(total_hours)] += 1
+    return hours_bins
+
+
+def _salary_bins(today: date) -> Dict[str, int]:
+    """Histogram lương tháng theo hợp đồng mới nhất (đã có hiệu lực) của từng nhân viên."""
+    ranked = db.session.query(
+        Contract.pay_rate,
+        Contract.pay_unit,
+        db.func.row_number().over(
+            partition_by=Contract.user_id,
+            order_by=(Contract.start_date.desc(), Contract.id.desc())
+        ).label('rank')
+    ).filter(
+        Contract.start_date <= today,
+        Contract.user_id.in_(_employee_ids_subquery())
+    ).subquery()
+
+    rows = db.session.query(ranked.c.pay_rate).filter(
+        ranked.c.rank == 1,
+        ranked.c.pay_unit == 'month'
+    ).all()
+
+    salary_bins = {'0-5M': 0, '5-10M': 0, '10-15M': 0, '15-20M': 0, '20M+': 0}
+    for (pay_rate,) in rows:
+        salary_bins[_bin_salary(pay_rate)] += 1
+    return salary_bins
+
+
+# ============================================
+# ===        HÀM TỔNG HỢP CHÍNH           ===
+# ============================================
+
+def compute_admin_dashboard_metrics(today: date, total_employees: int) -> Dict:
+    """
+    Tính toàn bộ số liệu cho dashboard admin.
+    Số truy vấn là hằng số (khoảng 10), không phụ thuộc số lượng nhân viên.
+    """
+    attendance_status = _today_status(today, total_employees)
+    attendance_rate = 0
+    if total_employees > 0:
+        attendance_rate = round((attendance_status['checked_in'] / total_employees) * 100)
+
+    total_salary = db.session.query(db.func.sum(Payroll.net_salary)).filter(
+        Payroll.month == today.month,
+        Payroll.year == today.year
+    ).scalar() or 0
+
+    attendance_trend, performance_trend = _monthly_trends(today, total_employees)
+
+    return {
+        'attendance_rate': attendance_rate,
+        'total_salary': f"{total_salary:,.0f}",
+        'attendance_trend': attendance_trend,
+        'attendance_status': attendance_status,
+        'leave_status': _leave_counts(LeaveRequest.status, ['pending', 'approved', 'rejected']),
+        'hours_bins': _hours_bins(today),
+        'salary_bins': _salary_bins(today),
+        'leave_types': _leave_counts(LeaveRequest.request_type, ['leave', 'late', 'early', 'shift_change']),
+        'performance_trend': performance_trend
+    }
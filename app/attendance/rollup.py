@@ -0,0 +1,234 @@
+# /app/attendance/rollup.py
+
+from datetime import datetime, date
+from typing import Iterable, List, Optional
+import click
+import pytz
+from flask.cli import with_appcontext
+from ..models import db, Attendance, AttendanceDaily, Schedule, Shift
+
+VN_TZ = pytz.timezone('Asia/Ho_Chi_Minh')
+
+
+# ============================================
+# === CÁC HÀM HỖ TRỢ TỔNG HỢP THEO NGÀY    ===
+# ============================================
+
+def _as_local_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Đưa datetime về giờ Việt Nam không kèm tzinfo (đúng như giá trị lưu trong CSDL)."""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(VN_TZ).replace(tzinfo=None)
+    return value
+
+
+def _late_minutes(day: date, first_check_in: Optional[datetime], shift_start) -> int:
+    """Số phút trễ so với giờ bắt đầu ca (0 nếu không có ca hoặc đến đúng giờ)."""
+    if first_check_in is None or shift_start is None:
+        return 0
+    delta = (first_check_in - datetime.combine(day, shift_start)).total_seconds()
+    return int(delta / 60) if delta > 0 else 0
+
+
+def _build_row(user_id: int, day: date, punches: List[Attendance], shift_start) -> dict:
+    """Gộp các lượt chấm công của một nhân viên trong một ngày thành một dòng tổng hợp."""
+    worked_seconds = 0.0
+    completed_punches = 0
+    check_ins, check_outs = [], []
+    schedule_id = None
+    for att in punches:
+        check_in = _as_local_naive(att.check_in)
+        check_out = _as_local_naive(att.check_out)
+        if check_in:
+            check_ins.append(check_in)
+        if check_out:
+            check_outs.append(check_out)
+        if check_in and check_out:
+            completed_punches += 1
+            worked_seconds += (check_out - check_in).total_seconds()
+        if schedule_id is None:
+            schedule_id = att.schedule_id
+
+    first_check_in = min(check_ins) if check_ins else None
+    return {
+        'user_id': user_id,
+        'date': day,
+        'worked_seconds': worked_seconds,
+        'completed_punches': completed_punches,
+        'first_check_in': first_check_in,
+        'last_check_out': max(check_outs) if check_outs else None,
+        'late_minutes': _late_minutes(day, first_check_in, shift_start),
+        'schedule_id': schedule_id
+    }
+
+
+# ============================================
+# ===   CẬP NHẬT TĂNG DẦN (TRONG REQUEST)  ===
+# ============================================
+
+def refresh_daily_rollup(user_id: int, day: date):
+    """
+    Tính lại dòng tổng hợp của (user_id, day) từ các lượt chấm công của ngày đó.
+    Gọi TRƯỚC db.session.commit() để bảng tổng hợp được lưu cùng transaction.
+    """
+    if day is None:
+        return
+    db.session.flush()
+    punches = Attendance.query.filter_by(user_id=user_id, date=day).order_by(Attendance.id).all()
+    daily = AttendanceDaily.query.filter_by(user_id=user_id, date=day).first()
+
+    if not punches:
+        if daily:
+            db.session.delete(daily)
+        return
+
+    schedule_id = next((att.schedule_id for att in punches if att.schedule_id), None)
+    shift_start = None
+    if schedule_id:
+        shift_start = db.session.query(Shift.start_time).join(
+            Schedule, Schedule.shift_id == Shift.id
+        ).filter(Schedule.id == schedule_id).scalar()
+
+    values = _build_row(user_id, day, punches, shift_start)
+    if not daily:
+        daily = AttendanceDaily(user_id=user_id, date=day)
+        db.session.add(daily)
+    for key, value in values.items():
+        setattr(daily, key, value)
+
+
+def record_first_check_in(user_id: int, day: date, check_in: datetime, schedule_id: Optional[int], shift_start) -> int:
+    """
+    Cập nhật dòng tổng hợp khi nhân viên check-in LẦN ĐẦU trong ngày (đường check-in nhanh):
+    một câu INSERT ... ON CONFLICT thay vì đọc lại toàn bộ lượt chấm công như refresh_daily_rollup.
+    Lượt mới chưa check-out nên chỉ first_check_in / late_minutes / schedule_id thay đổi.
+    Trả về số phút trễ của lượt check-in.
+    """
+    first_check_in = _as_local_naive(check_in)
+    values = {
+        'user_id': user_id,
+        'date': day,
+        'worked_seconds': 0.0,
+        'completed_punches': 0,
+        'first_check_in': first_check_in,
+        'last_check_out': None,
+        'late_minutes': _late_minutes(day, first_check_in, shift_start),
+        'schedule_id': schedule_id
+    }
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in ('sqlite', 'postgresql'):
+        refresh_daily_rollup(user_id, day)
+        return values['late_minutes']
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    stmt = insert(AttendanceDaily).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'date'],
+        set_={
+            'first_check_in': stmt.excluded.first_check_in,
+            'late_minutes': stmt.excluded.late_minutes,
+            'schedule_id': db.func.coalesce(AttendanceDaily.schedule_id, stmt.excluded.schedule_id)
+        }
+    )
+    db.session.execute(stmt)
+    return values['late_minutes']
+
+
+# ============================================
+# ===     DỰNG LẠI TOÀN BỘ (BACKFILL)      ===
+# ============================================
+
+def _write_rows(rows: List[dict], replace: bool):
+    """INSERT các dòng tổng hợp; replace=False: bỏ qua (user_id, date) đã có."""
+    if replace:
+        db.session.execute(db.insert(AttendanceDaily), rows)
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        db.session.execute(insert(AttendanceDaily).on_conflict_do_nothing(index_elements=['user_id', 'date']), rows)
+        return
+    existing = set(db.session.query(AttendanceDaily.user_id, AttendanceDaily.date).filter(
+        db.tuple_(AttendanceDaily.user_id, AttendanceDaily.date).in_([(r['user_id'], r['date']) for r in rows])
+    ).all())
+    rows = [r for r in rows if (r['user_id'], r['date']) not in existing]
+    if rows:
+        db.session.execute(db.insert(AttendanceDaily), rows)
+
+
+def rebuild_daily_rollup(start: Optional[date] = None, end: Optional[date] = None,
+                         batch_size: int = 1000, replace: bool = True) -> int:
+    """
+    Dựng lại bảng AttendanceDaily từ Attendance trong khoảng [start, end]
+    (mặc định: toàn bộ). Trả về số dòng tổng hợp đã tính.
+    replace=False: không xóa, chỉ thêm các (nhân viên, ngày) còn thiếu (backfill, chạy lại được).
+    """
+    filters = []
+    if start:
+        filters.append(Attendance.date >= start)
+    if end:
+        filters.append(Attendance.date <= end)
+
+    if replace:
+        delete_query = AttendanceDaily.query
+        if start:
+            delete_query = delete_query.filter(AttendanceDaily.date >= start)
+        if end:
+            delete_query = delete_query.filter(AttendanceDaily.date <= end)
+        delete_query.delete(synchronize_session=False)
+
+    shift_starts = dict(db.session.query(Schedule.id, Shift.start_time).join(
+        Shift, Schedule.shift_id == Shift.id
+    ).join(
+        Attendance, Attendance.schedule_id == Schedule.id
+    ).filter(*filters).distinct().all())
+
+    punches = Attendance.query.filter(
+        Attendance.date.isnot(None), *filters
+    ).order_by(Attendance.user_id, Attendance.date, Attendance.id).yield_per(batch_size)
+
+    written = 0
+    batch = []
+    for (user_id, day), group in _group_by_user_day(punches):
+        schedule_id = next((att.schedule_id for att in group if att.schedule_id), None)
+        batch.append(_build_row(user_id, day, group, shift_starts.get(schedule_id)))
+        if len(batch) >= batch_size:
+            _write_rows(batch, replace)
+            written += len(batch)
+            batch = []
+    if batch:
+        _write_rows(batch, replace)
+        written += len(batch)
+
+    db.session.commit()
+    return written
+
+
+def _group_by_user_day(punches: Iterable[Attendance]):
+    """Gom các lượt chấm công (đã sắp xếp theo user_id, date) thành từng nhóm (user, ngày)."""
+    current_key, group = None, []
+    for att in punches:
+        key = (att.user_id, att.date)
+        if key != current_key and group:
+            yield current_key, group
+            group = []
+        current_key = key
+        group.append(att)
+    if group:
+        yield current_key, group
+
+
+@click.command('rebuild-rollup')
+@with_appcontext
+@click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Ngày bắt đầu (YYYY-MM-DD), mặc định: toàn bộ dữ liệu.')
+@click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Ngày kết thúc (YYYY-MM-DD).')
+def rebuild_rollup_command(start, end):
+    """Dựng lại bảng tổng hợp chấm công theo ngày: flask attendance rebuild-rollup"""
+    written = rebuild_daily_rollup(start.date() if start else None, end.date() if end else None)
+    click.echo(f'Đã dựng lại {written} dòng tổng hợp chấm công.')
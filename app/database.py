@@ -0,0 +1,171 @@
+# /app/database.py
+# Cấu hình engine CSDL theo profile (DB_PROFILE), được create_app gọi quanh db.init_app:
+#   - engine_options(config): kích thước pool theo loại CSDL (file SQLite hay máy chủ PostgreSQL/MySQL)
+#   - configure_engine(engine, config): với SQLite profile 'production', đặt PRAGMA cho MỖI kết nối mới
+#     (WAL để đọc không chặn ghi, synchronous=NORMAL, mmap, cache lớn hơn, busy_timeout thay vì lỗi "database is locked")
+#   - init_read_engine(app): engine CSDL đọc (replica hoặc bản sao SQLite chỉ đọc) cho các view / hàm @read_only,
+#     RoutingSession gửi truy vấn đọc trong các khối đó sang engine này, mọi câu lệnh ghi vẫn về CSDL chính.
+
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Optional
+from flask import current_app, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+
+
+def _is_sqlite_file(uri: str) -> bool:
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def engine_options(config) -> dict:
+    """
+    Tham số tạo engine cho profile hiện tại. Giá trị trong SQLALCHEMY_ENGINE_OPTIONS (nếu có) được giữ nguyên,
+    chỉ bổ sung các khóa còn thiếu.
+    """
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if config.get('DB_PROFILE', 'production') != 'production':
+        return options
+
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if make_url(uri).get_backend_name() == 'sqlite':
+        if _is_sqlite_file(uri):
+            # SQLite chỉ có một writer: pool nhỏ là đủ, request chờ kết nối thay vì mở thêm hàng loạt file handle
+            options.setdefault('pool_size', config.get('DB_POOL_SIZE') or 5)
+            options.setdefault('max_overflow', config.get('DB_MAX_OVERFLOW') or 5)
+            options.setdefault('pool_timeout', config.get('DB_POOL_TIMEOUT', 30))
+        return options
+
+    # PostgreSQL / MySQL: pool lớn hơn, kiểm tra kết nối chết và làm mới kết nối cũ
+    options.setdefault('pool_size', config.get('DB_POOL_SIZE') or 10)
+    options.setdefault('max_overflow', config.get('DB_MAX_OVERFLOW') or 20)
+    options.setdefault('pool_timeout', config.get('DB_POOL_TIMEOUT', 30))
+    options.setdefault('pool_pre_ping', True)
+    options.setdefault('pool_recycle', config.get('DB_POOL_RECYCLE', 1800))
+    return options
+
+
+def _sqlite_pragmas(config) -> list:
+    return [
+        ('journal_mode', 'WAL'),
+        ('synchronous', config.get('SQLITE_SYNCHRONOUS', 'NORMAL')),
+        ('busy_timeout', int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))),
+        ('cache_size', -int(config.get('SQLITE_CACHE_SIZE_KB', 64 * 1024))),  # Số âm = KiB
+        ('mmap_size', int(config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))),
+        ('temp_store', 'MEMORY'),
+    ]
+
+
+def configure_engine(engine, config):
+    """Gắn hook 'connect' đặt PRAGMA cho mỗi kết nối SQLite mới (chỉ với profile 'production')."""
+    if config.get('DB_PROFILE', 'production') != 'production' or engine.dialect.name != 'sqlite':
+        return
+    pragmas = _sqlite_pragmas(config)
+    if not _is_sqlite_file(config['SQLALCHEMY_DATABASE_URI']):
+        # CSDL trong bộ nhớ không có WAL / mmap
+        pragmas = [(name, value) for name, value in pragmas if name not in ('journal_mode', 'mmap_size')]
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+
+def sqlite_settings(engine) -> dict:
+    """Giá trị PRAGMA thực tế của một kết nối (dùng để kiểm tra cấu hình)."""
+    with engine.connect() as conn:
+        return {name: conn.exec_driver_sql(f'PRAGMA {name}').scalar()
+                for name in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store')}
+
+
+# ============================================
+# ===      ĐỊNH TUYẾN ĐỌC (READ REPLICA)    ===
+# ============================================
+
+class RoutingSession(Session):
+    """
+    Session của db: trong khối read_only_session (decorator @read_only), truy vấn đọc đi tới engine đọc
+    (app.extensions['read_engine']) nếu có cấu hình; flush và INSERT / UPDATE / DELETE luôn về CSDL chính.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and self.info.get('read_only') and not self._flushing
+                and not getattr(clause, 'is_dml', False) and has_app_context()):
+            read_engine = current_app.extensions.get('read_engine')
+            if read_engine is not None:
+                return read_engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def read_only_session(session):
+    """Đánh dấu các truy vấn trong khối with là chỉ đọc (lồng nhau được)."""
+    session.info['read_only'] = session.info.get('read_only', 0) + 1
+    try:
+        yield
+    finally:
+        session.info['read_only'] -= 1
+
+
+def _snapshot_path(app) -> Optional[str]:
+    path = app.config.get('READ_SNAPSHOT_PATH')
+    if not path or not _is_sqlite_file(app.config['SQLALCHEMY_DATABASE_URI']):
+        return None
+    return path if os.path.isabs(path) else os.path.join(app.instance_path, path)
+
+
+def refresh_read_snapshot(app, engine) -> Optional[str]:
+    """
+    Chụp lại bản sao chỉ đọc của CSDL SQLite chính (READ_SNAPSHOT_PATH) bằng backup API rồi thay file nguyên tử:
+    các kết nối đọc đang mở vẫn đọc bản cũ, kết nối mới đọc bản mới. Trả về đường dẫn, None nếu không cấu hình.
+    """
+    path = _snapshot_path(app)
+    if path is None:
+        return None
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    source = engine.raw_connection()
+    try:
+        target = sqlite3.connect(tmp_path)
+        try:
+            source.driver_connection.backup(target)
+            # Bản sao mở ở chế độ chỉ đọc nên không dùng WAL (WAL cần tạo file -shm)
+            target.execute('PRAGMA journal_mode=DELETE')
+        finally:
+            target.close()
+    finally:
+        source.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+def init_read_engine(app, engine, refresh: bool = False):
+    """
+    Tạo engine đọc cho create_app (gọi sau migration):
+      - READ_REPLICA_URI: replica của CSDL máy chủ (pool giống CSDL chính)
+      - READ_SNAPSHOT_PATH (chỉ SQLite): kết nối chỉ đọc tới bản sao, chụp lần đầu nếu chưa có hoặc khi
+        refresh=True (migration vừa đổi schema); làm mới bằng "flask schema snapshot" (vd. cron)
+        và tự làm mới sau mỗi job tính lương, ở đầu mỗi job báo cáo chi tiết.
+    Không cấu hình gì: app.extensions['read_engine'] = None, mọi truy vấn dùng CSDL chính.
+    """
+    read_engine = None
+    replica_uri = app.config.get('READ_REPLICA_URI')
+    if replica_uri:
+        replica_config = dict(app.config, SQLALCHEMY_DATABASE_URI=replica_uri, SQLALCHEMY_ENGINE_OPTIONS={})
+        read_engine = create_engine(replica_uri, **engine_options(replica_config))
+    else:
+        path = _snapshot_path(app)
+        if path is not None:
+            if refresh or not os.path.exists(path):
+                refresh_read_snapshot(app, engine)
+            # NullPool: mỗi lần đọc mở file mới, nên luôn thấy bản sao mới nhất sau khi được thay
+            read_engine = create_engine(f'sqlite:///file:{path}?mode=ro&uri=true', poolclass=NullPool)
+    app.extensions['read_engine'] = read_engine
@@ -1,7 +1,10 @@
 # /app/decorators.py
 
+import inspect
 from functools import wraps
 from flask import session, flash, redirect, url_for
+from .models import db
+from .database import read_only_session
 
 
 def admin_required(f):
@@ -20,6 +23,26 @@ def admin_required(f):
     return decorated_function
 
 
+def read_only(f):
+    """
+    Decorator đánh dấu view / hàm chỉ đọc (báo cáo theo kỳ): các truy vấn bên trong được gửi tới
+    CSDL đọc (READ_REPLICA_URI hoặc bản sao READ_SNAPSHOT_PATH) nếu có cấu hình, ghi vẫn về CSDL chính.
+    Dùng được cho generator (báo cáo stream từng dòng): đánh dấu kéo dài tới khi generator chạy xong.
+    """
+    if inspect.isgeneratorfunction(f):
+        @wraps(f)
+        def generator_function(*args, **kwargs):
+            with read_only_session(db.session):
+                yield from f(*args, **kwargs)
+        return generator_function
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with read_only_session(db.session):
+            return f(*args, **kwargs)
+    return decorated_function
+
+
 def login_required(f):
     """
     Decorator để đảm bảo người dùng đã đăng nhập.
@@ -7,6 +7,7 @@ from ..decorators import admin_required
 from .. import bcrypt
 import pytz
 from ..models import db, User, Attendance, Contract, Payroll
+from ..attendance.cache import invalidate_employee_options
 
 # Decorator kiểm tra quyền Admin
 # để có thể tái sử dụng ở nhiều nơi mà không cần định nghĩa lại.
@@ -51,6 +52,7 @@ def add_employee():
         
         db.session.add(new_user)
         db.session.commit()
+        invalidate_employee_options()
         
         # CHỈNH SỬA 4: Cập nhật thông báo flash cho rõ ràng
         flash(f'Tạo tài khoản "{username}" (vai trò: {role}) thành công!', 'success')
@@ -81,6 +83,7 @@ def edit_employee(user_id):
         # (Chưa có chức năng sửa vai trò ở đây, xem ghi chú)
         
         db.session.commit()
+        invalidate_employee_options()
         flash(f'Cập nhật thông tin cho "{user_to_edit.username}" thành công!', 'success')
         return redirect(url_for('attendance.dashboard'))
         
@@ -107,6 +110,7 @@ def delete_employee(user_id):
     
     db.session.delete(user_to_delete)
     db.session.commit()
+    invalidate_employee_options()
     
     flash(f'Đã xóa thành công nhân viên "{username}" và tất cả dữ liệu liên quan.', 'success')
     return redirect(url_for('attendance.dashboard'))
\ No newline at end of file
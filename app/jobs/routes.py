@@ -0,0 +1,35 @@
+# /app/jobs/routes.py
+
+import os
+from flask import Blueprint, jsonify, send_file, url_for, abort
+from ..models import db, BackgroundJob
+from ..decorators import admin_required
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/jobs')
+
+
+@jobs_bp.route('/<job_id>')
+@admin_required
+def job_status(job_id):
+    """API trả về trạng thái và tiến độ của một job (dùng để polling)."""
+    job = db.session.get(BackgroundJob, job_id) or abort(404)
+    data = {
+        'id': job.id,
+        'type': job.job_type,
+        'status': job.status,
+        'progress': round(job.progress or 0, 3),
+        'message': job.message,
+        'download_url': url_for('jobs.job_download', job_id=job.id) if job.result_path else None
+    }
+    return jsonify(data)
+
+
+@jobs_bp.route('/<job_id>/download')
+@admin_required
+def job_download(job_id):
+    """Tải về file kết quả của job đã hoàn thành."""
+    job = db.session.get(BackgroundJob, job_id) or abort(404)
+    if job.status != 'done' or not job.result_path or not os.path.exists(job.result_path):
+        abort(404)
+    return send_file(job.result_path, mimetype=job.result_mimetype, as_attachment=True,
+                     download_name=job.result_name)
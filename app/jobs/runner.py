@@ -0,0 +1,218 @@
+# /app/jobs/runner.py
+
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from sqlalchemy.exc import SQLAlchemyError
+from ..models import db, BackgroundJob
+
+# Kết quả trả về của một job có file tải về: data là bytes, file-like object hoặc iterable các chunk bytes
+JobArtifact = namedtuple('JobArtifact', ['data', 'download_name', 'mimetype'])
+
+
+class JobRunner:
+    """
+    Hàng đợi công việc chạy nền trong cùng tiến trình (thread pool),
+    trạng thái được lưu trong bảng BackgroundJob để các request khác theo dõi.
+    Mỗi job mang lease (worker_id + heartbeat_at) của tiến trình chạy nó: thread nền của runner cập nhật heartbeat
+    cho các job của mình, và chỉ đánh dấu 'failed' các job đã quá hạn lease (tiến trình giữ job đã chết),
+    nên khởi động thêm worker / chạy lệnh CLI không làm hỏng job đang chạy ở tiến trình khác.
+
+    Khởi tạo giống các extension khác: job_runner = JobRunner(); job_runner.init_app(app)
+    Cấu hình:
+      - JOB_WORKERS: số thread chạy nền (0 = chạy ngay trong request, dùng cho serverless/test)
+      - JOB_RESULT_FOLDER: thư mục lưu file kết quả (mặc định instance/jobs)
+      - JOB_HEARTBEAT_INTERVAL: số giây giữa 2 lần cập nhật heartbeat / dọn dẹp (0 = không chạy thread nền)
+      - JOB_LEASE_SECONDS: job không có heartbeat quá số giây này bị coi là gián đoạn
+      - JOB_RESULT_RETENTION_DAYS: xóa job đã kết thúc (và file kết quả) cũ hơn số ngày này (0 = giữ mãi)
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        self.worker_id = None
+        self._active = set()  # Id các job của tiến trình này chưa kết thúc
+        self._lock = threading.Lock()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('JOB_WORKERS', 2)
+        app.config.setdefault('JOB_RESULT_FOLDER', os.path.join(app.instance_path, 'jobs'))
+        app.config.setdefault('JOB_HEARTBEAT_INTERVAL', 30)
+        app.config.setdefault('JOB_LEASE_SECONDS', 120)
+        app.config.setdefault('JOB_RESULT_RETENTION_DAYS', 7)
+        os.makedirs(app.config['JOB_RESULT_FOLDER'], exist_ok=True)
+
+        workers = app.config['JOB_WORKERS']
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job') if workers > 0 else None
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'[-64:]
+        app.extensions['job_runner'] = self
+
+        with app.app_context():
+            try:
+                self.reap_expired()
+                self.cleanup_results()
+            except SQLAlchemyError:
+                # Bảng chưa được tạo (AUTO_MIGRATE tắt và chưa chạy "flask schema upgrade")
+                db.session.rollback()
+
+        if app.config['JOB_HEARTBEAT_INTERVAL'] > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='job-heartbeat', daemon=True)
+            self._thread.start()
+
+    # ============================================
+    # ===        LEASE / DỌN DẸP               ===
+    # ============================================
+
+    def _loop(self):
+        while True:
+            time.sleep(self.app.config['JOB_HEARTBEAT_INTERVAL'])
+            with self.app.app_context():
+                try:
+                    self._heartbeat()
+                    self.reap_expired()
+                    self.cleanup_results()
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception('Lỗi khi gia hạn / dọn dẹp job nền')
+                finally:
+                    db.session.remove()
+
+    def _heartbeat(self):
+        """Gia hạn lease cho các job của tiến trình này (không ghi gì khi không có job nào đang chạy)."""
+        with self._lock:
+            job_ids = list(self._active)
+        if job_ids:
+            with db.engine.begin() as conn:
+                conn.execute(db.update(BackgroundJob).where(BackgroundJob.id.in_(job_ids)).values(
+                    heartbeat_at=datetime.utcnow()))
+
+    def reap_expired(self) -> int:
+        """Đánh dấu 'failed' các job chưa kết thúc đã quá hạn lease (tiến trình giữ job đã dừng). Trả về số job."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.app.config['JOB_LEASE_SECONDS'])
+        expired = (
+            BackgroundJob.status.in_(['queued', 'running']),
+            db.func.coalesce(BackgroundJob.heartbeat_at, BackgroundJob.created_at) < cutoff
+        )
+        # Đọc trước: trường hợp thường gặp là không có job nào quá hạn, khỏi giữ khóa ghi
+        if not db.session.query(BackgroundJob.id).filter(*expired).first():
+            db.session.rollback()
+            return 0
+        count = BackgroundJob.query.filter(*expired).update(
+            {'status': 'failed', 'message': 'Bị gián đoạn do tiến trình chạy job đã dừng.',
+             'finished_at': datetime.utcnow()},
+            synchronize_session=False
+        )
+        db.session.commit()
+        return count
+
+    def cleanup_results(self) -> int:
+        """Xóa các job đã kết thúc quá JOB_RESULT_RETENTION_DAYS ngày cùng file kết quả. Trả về số job đã xóa."""
+        retention_days = self.app.config['JOB_RESULT_RETENTION_DAYS']
+        if not retention_days:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(days=retention_days)
+        old_jobs = db.session.query(BackgroundJob.id, BackgroundJob.result_path).filter(
+            BackgroundJob.status.in_(['done', 'failed']),
+            BackgroundJob.finished_at < cutoff
+        ).limit(500).all()
+        if not old_jobs:
+            db.session.rollback()
+            return 0
+        for _, result_path in old_jobs:
+            if result_path and os.path.exists(result_path):
+                os.remove(result_path)
+        BackgroundJob.query.filter(BackgroundJob.id.in_([job_id for job_id, _ in old_jobs])).delete(
+            synchronize_session=False)
+        db.session.commit()
+        return len(old_jobs)
+
+    # ============================================
+    # ===           CHẠY JOB                   ===
+    # ============================================
+
+    def submit(self, job_type: str, func: Callable, params: dict, user_id: Optional[int] = None) -> str:
+        """
+        Tạo job mới và đưa vào hàng đợi. Trả về job id ngay lập tức.
+        func(progress, **params) nhận hàm progress(fraction, message=None) và có thể trả về JobArtifact.
+        """
+        job_id = uuid.uuid4().hex
+        db.session.add(BackgroundJob(id=job_id, job_type=job_type, status='queued',
+                                     params=json.dumps(params), created_by=user_id,
+                                     worker_id=self.worker_id, heartbeat_at=datetime.utcnow()))
+        db.session.commit()
+        with self._lock:
+            self._active.add(job_id)
+
+        if self.executor is None:
+            self._run(job_id, func, params)
+        else:
+            self.executor.submit(self._run, job_id, func, params)
+        return job_id
+
+    def _update(self, job_id: str, **values):
+        """Cập nhật trạng thái job (kèm gia hạn lease) bằng một transaction ngắn, tách khỏi session của công việc."""
+        with db.engine.begin() as conn:
+            conn.execute(db.update(BackgroundJob).where(BackgroundJob.id == job_id).values(
+                heartbeat_at=datetime.utcnow(), **values))
+
+    def _run(self, job_id: str, func: Callable, params: dict):
+        with self.app.app_context():
+            self._update(job_id, status='running', started_at=datetime.utcnow())
+
+            def progress(fraction: float, message: Optional[str] = None):
+                values = {'progress': max(0.0, min(1.0, fraction))}
+                if message:
+                    values['message'] = message
+                self._update(job_id, **values)
+
+            try:
+                artifact = func(progress, **params)
+                values = {'status': 'done', 'progress': 1.0, 'message': 'Hoàn tất.', 'finished_at': datetime.utcnow()}
+                if artifact is not None:
+                    values.update(self._store_artifact(job_id, artifact))
+                self._update(job_id, **values)
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.exception('Job %s thất bại', job_id)
+                self._update(job_id, status='failed', message=str(e)[:255], finished_at=datetime.utcnow())
+            finally:
+                with self._lock:
+                    self._active.discard(job_id)
+                db.session.remove()
+
+    def _store_artifact(self, job_id: str, artifact: JobArtifact) -> dict:
+        """
+        Ghi file kết quả ra đĩa để endpoint tải về phục vụ sau. Ghi vào file .tmp rồi đổi tên:
+        công việc lỗi giữa chừng (vd. generator ZIP) không để lại file kết quả bị cắt cụt.
+        """
+        path = os.path.join(self.app.config['JOB_RESULT_FOLDER'], job_id)
+        tmp_path = path + '.tmp'
+        data = artifact.data
+        try:
+            with open(tmp_path, 'wb') as target:
+                if isinstance(data, (bytes, bytearray)):
+                    target.write(data)
+                elif hasattr(data, 'read'):
+                    shutil.copyfileobj(data, target)
+                else:
+                    # Generator các chunk bytes: ghi dần, không giữ cả file trong bộ nhớ
+                    for chunk in data:
+                        target.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return {'result_path': path, 'result_name': artifact.download_name, 'result_mimetype': artifact.mimetype}
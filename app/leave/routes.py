@@ -1,25 +1,133 @@
 # /app/leave/routes.py
 
 from flask import (Blueprint, render_template, request, redirect, url_for, 
-                   session, flash)
+                   session, flash, jsonify)
 from datetime import datetime, date, time 
 # SỬA: Import thêm các model và decorator cần thiết
 from ..models import db, User, LeaveRequest, Notification
 from ..decorators import admin_required, login_required # Đảm bảo bạn đã có login_required
+from ..notification.cache import invalidate_unread_count
+from ..schedule.analysis import invalidate_analysis
+from ..notification.outbox import enqueue_for_user, enqueue_bulk
+from ..pagination import keyset_paginate
+from .. import outbox
 
 leave_bp = Blueprint('leave', __name__, url_prefix='/leave')
 
+# Số đơn tối đa cho một lần duyệt hàng loạt
+BULK_PROCESS_LIMIT = 1000
+# Số đơn mỗi trang (phân trang keyset theo LeaveRequest.id giảm dần)
+REQUESTS_PER_PAGE = 50
+
+TYPE_VN = {
+    'leave': 'nghỉ phép',
+    'late': 'đi trễ',
+    'early': 'về sớm',
+    'shift_change': 'đổi ca'
+}
+
+
+def _decision_message(request_type, relevant_date, action):
+    """Nội dung thông báo gửi cho nhân viên khi đơn được duyệt / từ chối."""
+    type_vn = TYPE_VN.get(request_type, 'yêu cầu')
+    relevant_date_str = ""
+    if relevant_date:
+        relevant_date_str = f"(ngày {relevant_date.strftime('%d/%m')})"
+    status_vn = "ĐƯỢC DUYỆT" if action == 'approved' else "BỊ TỪ CHỐI"
+    return f"Đơn xin {type_vn} {relevant_date_str} của bạn đã được {status_vn}."
+
+
+def _parse_ids(raw_ids):
+    """
+    Danh sách id (số nguyên hoặc chuỗi số) -> danh sách int đã sắp xếp, bỏ trùng; None nếu không hợp lệ.
+    Phải là một mảng: chuỗi "12" không được hiểu thành các id 1 và 2.
+    """
+    if not isinstance(raw_ids, list):
+        return None
+    ids = set()
+    for raw_id in raw_ids:
+        if isinstance(raw_id, bool) or not isinstance(raw_id, (int, str)):
+            return None
+        try:
+            ids.add(int(raw_id))
+        except ValueError:
+            return None
+    return sorted(ids)
+
+
+# Ngày áp dụng của đơn tính ngay trong SQL (giống property LeaveRequest.relevant_date)
+_relevant_date = db.case(
+    (LeaveRequest.request_type.in_(['late', 'early']), LeaveRequest.request_date),
+    else_=LeaveRequest.start_date
+)
+
+
+def _parse_date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def _list_filters():
+    """Đọc bộ lọc từ URL: loại đơn, khoảng ngày áp dụng, nhân viên (chỉ admin). Chỉ giữ giá trị hợp lệ."""
+    filters = {}
+    if request.args.get('type') in TYPE_VN:
+        filters['type'] = request.args['type']
+    for name in ('from', 'to'):
+        if _parse_date_arg(name):
+            filters[name] = request.args[name]
+    if request.args.get('user_id', type=int):
+        filters['user_id'] = request.args.get('user_id', type=int)
+    return filters
+
+
+def _request_page(query, filters, cursor):
+    """
+    Một trang đơn từ: chỉ chọn các cột template cần (kèm username qua JOIN, không lazy-load
+    request.user cho từng dòng), lọc theo `filters`, phân trang keyset theo id giảm dần.
+    """
+    if 'type' in filters:
+        query = query.filter(LeaveRequest.request_type == filters['type'])
+    if 'from' in filters:
+        query = query.filter(_relevant_date >= _parse_date_arg('from'))
+    if 'to' in filters:
+        query = query.filter(_relevant_date <= _parse_date_arg('to'))
+    return keyset_paginate(
+        query,
+        columns=(LeaveRequest.id,),
+        descending=(True,),
+        cursor=cursor,
+        per_page=REQUESTS_PER_PAGE,
+        key=lambda row: (row.id,)
+    )
+
+
+def _request_columns():
+    return (LeaveRequest.id, LeaveRequest.request_type, LeaveRequest.reason, LeaveRequest.status,
+            _relevant_date.label('relevant_date'))
+
 # --- HÀM MỚI 1: Trang cho nhân viên xem đơn của mình ---
 @leave_bp.route('/my_requests')
 @login_required
 def my_requests():
     """Trang cho nhân viên xem lịch sử đơn từ của họ."""
     user_id = session['user_id']
+    filters = _list_filters()
+    filters.pop('user_id', None)
+    cursor = request.args.get('cursor')
     
-    # Lấy tất cả đơn từ của user này, sắp xếp mới nhất lên đầu
-    requests = LeaveRequest.query.filter_by(user_id=user_id).order_by(LeaveRequest.id.desc()).all()
+    # Đơn từ của user này, mới nhất lên đầu, từng trang một
+    page = _request_page(
+        db.session.query(*_request_columns()).filter(LeaveRequest.user_id == user_id),
+        filters, cursor
+    )
     
-    return render_template('leave/my_requests.html', requests=requests)
+    return render_template('leave/my_requests.html', requests=page.items, filters=filters,
+                           next_cursor=page.next_cursor, is_first_page=not cursor, type_labels=TYPE_VN)
 
 # --- HÀM MỚI 2: Trang cho admin quản lý tất cả đơn từ ---
 @leave_bp.route('/manage')
@@ -30,17 +138,27 @@ def manage_requests():
     # Lấy bộ lọc trạng thái từ URL (ví dụ: /manage?status=pending)
     # Mặc định là 'pending' để admin thấy việc cần làm ngay
     status_filter = request.args.get('status', 'pending')
+    filters = _list_filters()
+    cursor = request.args.get('cursor')
 
-    query = LeaveRequest.query.join(User).order_by(LeaveRequest.id.desc())
+    query = db.session.query(*_request_columns(), User.username).join(User, LeaveRequest.user_id == User.id)
     
     if status_filter != 'all':
         query = query.filter(LeaveRequest.status == status_filter)
+    if 'user_id' in filters:
+        query = query.filter(LeaveRequest.user_id == filters['user_id'])
         
-    all_requests = query.all()
+    page = _request_page(query, filters, cursor)
+    employees = db.session.query(User.id, User.username).filter(User.role != 'admin').order_by(User.username).all()
     
     return render_template('leave/manage_requests.html', 
-                           requests=all_requests, 
-                           current_status=status_filter)
+                           requests=page.items, 
+                           current_status=status_filter,
+                           filters=filters,
+                           employees=employees,
+                           type_labels=TYPE_VN,
+                           next_cursor=page.next_cursor,
+                           is_first_page=not cursor)
 
 # --- Code cũ của bạn (Giữ nguyên) ---
 
@@ -126,21 +244,9 @@ def process_request(request_id):
         leave_request.status = action
         
         # --- Cập nhật thông báo ---
-        type_vn = {
-            'leave': 'nghỉ phép',
-            'late': 'đi trễ',
-            'early': 'về sớm',
-            'shift_change': 'đổi ca'
-        }.get(leave_request.request_type, 'yêu cầu')
-
-        # (Giả sử bạn có property 'relevant_date' trong model)
-        relevant_date_str = ""
-        if leave_request.relevant_date: 
-             relevant_date_str = f"(ngày {leave_request.relevant_date.strftime('%d/%m')})"
-
+        type_vn = TYPE_VN.get(leave_request.request_type, 'yêu cầu')
         status_vn = "ĐƯỢC DUYỆT" if action == 'approved' else "BỊ TỪ CHỐI"
-        
-        message = f"Đơn xin {type_vn} {relevant_date_str} của bạn đã được {status_vn}."
+        message = _decision_message(leave_request.request_type, leave_request.relevant_date, action)
         
         new_notif = Notification(
             user_id=leave_request.user_id,
@@ -148,11 +254,92 @@ def process_request(request_id):
             leave_request_id=leave_request.id 
         )
         db.session.add(new_notif)
+        # Email / push được ghi vào outbox cùng transaction, gửi nền sau khi commit
+        enqueue_for_user(leave_request.user, 'Kết quả xử lý đơn từ', message)
         
         db.session.commit()
+        invalidate_unread_count(leave_request.user_id)
+        invalidate_analysis()  # Nghỉ phép được duyệt / hủy duyệt làm thay đổi độ phủ lịch
+        outbox.wake()
         flash(f'Đã {status_vn} đơn {type_vn}.', 'success')
     else:
         flash('Hành động không hợp lệ.', 'danger')
     
     # SỬA: Chuyển hướng về trang quản lý
-    return redirect(url_for('leave.manage_requests', status='pending'))
\ No newline at end of file
+    return redirect(url_for('leave.manage_requests', status='pending'))
+
+
+@leave_bp.route('/process_bulk', methods=['POST'])
+@admin_required
+def process_bulk():
+    """
+    API (chỉ admin) duyệt / từ chối nhiều đơn cùng lúc.
+    Nhận JSON {"ids": [1, 2, ...], "action": "approved" | "rejected"} (hoặc form ids=...&action=...).
+    Cập nhật trạng thái bằng MỘT câu UPDATE, insert thông báo hàng loạt, commit một lần.
+    Chỉ các đơn đang 'pending' được xử lý; các id còn lại được trả về trong 'skipped_ids'.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'message': 'Dữ liệu gửi lên phải là một object JSON.'}), 400
+    action = data.get('action', request.form.get('action'))
+
+    if action not in ['approved', 'rejected']:
+        return jsonify({'success': False, 'message': 'Hành động không hợp lệ.'}), 400
+    ids = _parse_ids(data.get('ids') if data else request.form.getlist('ids'))
+    if ids is None:
+        return jsonify({'success': False, 'message': 'Danh sách id không hợp lệ.'}), 400
+    if not ids:
+        return jsonify({'success': False, 'message': 'Chưa chọn đơn nào.'}), 400
+    if len(ids) > BULK_PROCESS_LIMIT:
+        return jsonify({'success': False,
+                        'message': f'Chỉ xử lý tối đa {BULK_PROCESS_LIMIT} đơn mỗi lần.'}), 400
+
+    columns = (LeaveRequest.id, LeaveRequest.user_id, LeaveRequest.request_type,
+               LeaveRequest.start_date, LeaveRequest.request_date)
+    update_stmt = db.update(LeaveRequest).where(
+        LeaveRequest.id.in_(ids),
+        LeaveRequest.status == 'pending'
+    ).values(status=action)
+
+    if db.engine.dialect.update_returning:
+        # UPDATE ... RETURNING: biết chính xác các đơn vừa đổi trạng thái trong cùng một câu lệnh
+        processed = db.session.execute(update_stmt.returning(*columns),
+                                       execution_options={'synchronize_session': False}).all()
+    else:
+        processed = db.session.query(*columns).filter(
+            LeaveRequest.id.in_(ids), LeaveRequest.status == 'pending'
+        ).with_for_update().all()
+        db.session.execute(update_stmt, execution_options={'synchronize_session': False})
+
+    notifications = []
+    for request_id, user_id, request_type, start_date, request_date in processed:
+        relevant_date = request_date if request_type in ['late', 'early'] else start_date
+        notifications.append({
+            'user_id': user_id,
+            'message': _decision_message(request_type, relevant_date, action),
+            'leave_request_id': request_id,
+            'is_read': False,
+            'timestamp': datetime.utcnow()
+        })
+    if notifications:
+        db.session.execute(db.insert(Notification), notifications)
+        enqueue_bulk((n['user_id'], 'Kết quả xử lý đơn từ', n['message']) for n in notifications)
+    db.session.commit()
+
+    user_ids = {n['user_id'] for n in notifications}
+    invalidate_unread_count(*user_ids)
+    if notifications:
+        invalidate_analysis()
+        outbox.wake()
+
+    processed_ids = sorted(row[0] for row in processed)
+    return jsonify({
+        'success': True,
+        'action': action,
+        'requested': len(ids),
+        'updated': len(processed_ids),
+        'updated_ids': processed_ids,
+        'skipped_ids': sorted(set(ids) - set(processed_ids)),
+        'notifications': len(notifications),
+        'users_notified': len(user_ids)
+    })
@@ -0,0 +1,539 @@
+# /app/migrations.py
+# Bộ migrate schema đơn giản theo phiên bản: mỗi migration là một hàm, chạy một lần
+# theo thứ tự version và được ghi lại trong bảng schema_migration.
+# create_app() tự chạy upgrade() khi khởi động (AUTO_MIGRATE = True), kể cả với file
+# instance/attendance.db cũ chưa có các bảng/index mới.
+
+import os
+import socket
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import (inspect, text, MetaData, Table, Column, Index, UniqueConstraint, ForeignKey,
+                        Integer, String, Float, Boolean, Date, DateTime, Time, Text)
+from sqlalchemy.exc import IntegrityError, OperationalError
+from .models import (db, User, Contract, Attendance, AttendanceDaily, Bonus, Deduction, Payroll,
+                     Notification, LeaveRequest, Schedule, OutboxMessage, SchemaMigration, SchemaMigrationLock)
+from .database import sqlite_settings, refresh_read_snapshot
+from .attendance.rollup import rebuild_daily_rollup
+
+
+# ============================================
+# ===          CÁC MIGRATION               ===
+# ============================================
+# Mỗi migration tự khai báo schema CỐ ĐỊNH của các đối tượng nó tạo (bảng / index / cột) bằng
+# MetaData riêng, không đọc từ app/models.py: model thay đổi về sau không làm đổi migration đã phát hành.
+# Bảng khác chỉ được khai báo lại các cột cần cho index / khóa ngoại.
+
+def _create(*objects):
+    """Tạo bảng / index nếu chưa có (CSDL cũ có thể đã có sẵn từ db.create_all trước đây)."""
+    for obj in objects:
+        obj.create(db.engine, checkfirst=True)
+
+
+def _stub(meta: MetaData, name: str, *columns: str) -> Table:
+    """Khai báo tối thiểu một bảng đã có: chỉ các cột cần để tạo index / khóa ngoại (kiểu cột không ảnh hưởng DDL của index)."""
+    return Table(name, meta, Column('id', Integer, primary_key=True),
+                 *(Column(column, Integer) for column in columns if column != 'id'))
+
+
+def _create_base_tables():
+    """v1: các bảng gốc của ứng dụng + bảng tổng hợp chấm công theo ngày + bảng job nền."""
+    meta = MetaData()
+    tables = [
+        Table('user', meta,
+              Column('id', Integer, primary_key=True),
+              Column('username', String(80), unique=True, nullable=False),
+              Column('password', String(256), nullable=False),
+              Column('role', String(20)),
+              Column('email', String(120), unique=True, nullable=True),
+              Column('full_name', String(100)),
+              Column('gender', String(20)),
+              Column('avatar_image', String(200), nullable=False),
+              Column('created_at', DateTime),
+              Column('fcm_token', String(200))),
+        Table('contract', meta,
+              Column('id', Integer, primary_key=True),
+              Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+              Column('start_date', Date, nullable=False),
+              Column('end_date', Date),
+              Column('pay_rate', Float, nullable=False),
+              Column('pay_unit', String(20))),
+        Table('shift', meta,
+              Column('id', Integer, primary_key=True),
+              Column('name', String(100), nullable=False),
+              Column('start_time', Time, nullable=False),
+              Column('end_time', Time, nullable=False)),
+        Table('schedule', meta,
+              Column('id', Integer, primary_key=True),
+              Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+              Column('shift_id', Integer, ForeignKey('shift.id'), nullable=False),
+              Column('date', Date, nullable=False),
+              UniqueConstraint('user_id', 'date', name='_user_date_uc')),
+        Table('attendance', meta,
+              Column('id', Integer, primary_key=True),
+              Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+              Column('check_in', DateTime),
+              Column('check_out', DateTime),
+              Column('date', Date),
+              Column('image_path', String(200)),
+              Column('gps_lat', Float),
+              Column('gps_lng', Float),
+              Column('schedule_id', Integer, ForeignKey('schedule.id'), nullable=True)),
+        Table('bonus', meta,
+              Column('id', Integer, primary_key=True),
+              Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+              Column('month', Integer, nullable=False),
+              Column('year', Integer, nullable=False),
+              Column('amount', Float),
+              Column('reason', String(100))),
+        Table('deduction', meta,
+              Column('id', Integer, primary_key=True),
+              Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+              Column('month', Integer, nullable=False),
+              Column('year', Integer, nullable=False),
+              Column('amount', Float, nullable=False),
+              Column('reason', String(100))),
+        Table('payroll', meta,
+              Column('id', Integer, primary_key=True),
+              Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+              Column('month', Integer, nullable=False),
+              Column('year', Integer, nullable=False),
+              Column('gross_salary', Float),
+              Column('total_bonus', Float),
+              Column('total_deduction', Float),
+              Column('net_salary', Float),
+              UniqueConstraint('user_id', 'month', 'year', name='_user_month_year_uc')),
+        Table('salary_settings', meta,
+              Column('id', Integer, primary_key=True),
+              Column('standard_work_hours_per_day', Float),
+              Column('standard_work_days_per_month', Integer),
+              Column('late_penalty_amount', Float)),
+        Table('leave_request', meta,
+              Column('id', Integer, primary_key=True),
+              Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+              Column('request_type', String(20), nullable=False),
+              Column('start_date', Date),
+              Column('end_date', Date),
+              Column('request_date', Date),
+              Column('request_time', Time),
+              Column('reason', String(200), nullable=False),
+              Column('status', String(20))),
+        Table('notification', meta,
+              Column('id', Integer, primary_key=True),
+              Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+              Column('message', String(255), nullable=False),
+              Column('is_read', Boolean, nullable=False),
+              Column('timestamp', DateTime),
+              Column('leave_request_id', Integer, ForeignKey('leave_request.id'), nullable=True)),
+        Table('attendance_daily', meta,
+              Column('id', Integer, primary_key=True),
+              Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+              Column('date', Date, nullable=False),
+              Column('worked_seconds', Float, nullable=False),
+              Column('completed_punches', Integer, nullable=False),
+              Column('first_check_in', DateTime),
+              Column('last_check_out', DateTime),
+              Column('late_minutes', Integer, nullable=False),
+              Column('schedule_id', Integer, ForeignKey('schedule.id'), nullable=True),
+              UniqueConstraint('user_id', 'date', name='_daily_user_date_uc')),
+        Table('background_job', meta,
+              Column('id', String(32), primary_key=True),
+              Column('job_type', String(50), nullable=False),
+              Column('status', String(20), nullable=False),
+              Column('progress', Float, nullable=False),
+              Column('message', String(255)),
+              Column('params', Text),
+              Column('result_path', String(255)),
+              Column('result_name', String(200)),
+              Column('result_mimetype', String(100)),
+              Column('created_by', Integer, ForeignKey('user.id'), nullable=True),
+              Column('created_at', DateTime),
+              Column('started_at', DateTime),
+              Column('finished_at', DateTime)),
+    ]
+    _create(*tables)
+
+
+def _add_hot_path_indexes():
+    """v2: index ghép / index một phần cho các điều kiện lọc được dùng nhiều nhất."""
+    meta = MetaData()
+    attendance = _stub(meta, 'attendance', 'user_id', 'date', 'check_in', 'check_out')
+    contract = _stub(meta, 'contract', 'user_id', 'start_date')
+    bonus = _stub(meta, 'bonus', 'year', 'month', 'user_id')
+    deduction = _stub(meta, 'deduction', 'year', 'month', 'user_id')
+    payroll = _stub(meta, 'payroll', 'year', 'month')
+    notification = _stub(meta, 'notification', 'user_id', 'is_read')
+    leave_request = _stub(meta, 'leave_request', 'status')
+    schedule = _stub(meta, 'schedule', 'date')
+    attendance_daily = _stub(meta, 'attendance_daily', 'date')
+    _create(
+        Index('ix_attendance_user_date', attendance.c.user_id, attendance.c.date),
+        Index('ix_attendance_date', attendance.c.date),
+        Index('ix_attendance_open_shift', attendance.c.user_id, attendance.c.check_in,
+              sqlite_where=text('check_out IS NULL'), postgresql_where=text('check_out IS NULL')),
+        Index('ix_contract_user_start', contract.c.user_id, contract.c.start_date),
+        Index('ix_bonus_period_user', bonus.c.year, bonus.c.month, bonus.c.user_id),
+        Index('ix_deduction_period_user', deduction.c.year, deduction.c.month, deduction.c.user_id),
+        Index('ix_payroll_period', payroll.c.year, payroll.c.month),
+        Index('ix_notification_user_read', notification.c.user_id, notification.c.is_read),
+        Index('ix_leave_request_status', leave_request.c.status),
+        Index('ix_schedule_date', schedule.c.date),
+        Index('ix_attendance_daily_date', attendance_daily.c.date),
+    )
+
+
+def _add_notification_keyset_index():
+    """v3: phân trang thông báo theo (user_id, timestamp, id)."""
+    notification = _stub(MetaData(), 'notification', 'user_id', 'timestamp')
+    _create(Index('ix_notification_user_time', notification.c.user_id, notification.c.timestamp, notification.c.id))
+
+
+def _create_notification_archive():
+    """v4: bảng lưu trữ thông báo cũ đã đọc."""
+    meta = MetaData()
+    _stub(meta, 'user')
+    archive = Table('notification_archive', meta,
+                    Column('id', Integer, primary_key=True),
+                    Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+                    Column('message', String(255), nullable=False),
+                    Column('timestamp', DateTime),
+                    Column('leave_request_id', Integer, nullable=True),
+                    Column('archived_at', DateTime))
+    _create(archive, Index('ix_notification_archive_user_time', archive.c.user_id, archive.c.timestamp))
+
+
+def _add_notification_read_time_index():
+    """v5: index một phần cho job lưu trữ (thông báo đã đọc theo thời gian)."""
+    notification = _stub(MetaData(), 'notification', 'timestamp')
+    _create(Index('ix_notification_read_time', notification.c.timestamp,
+                  sqlite_where=text('is_read = 1'), postgresql_where=text('is_read')))
+
+
+def _create_outbox():
+    """v6: hàng đợi gửi email / push."""
+    meta = MetaData()
+    _stub(meta, 'user')
+    outbox = Table('outbox_message', meta,
+                   Column('id', Integer, primary_key=True),
+                   Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+                   Column('channel', String(20), nullable=False),
+                   Column('recipient', String(200), nullable=False),
+                   Column('subject', String(200)),
+                   Column('body', Text, nullable=False),
+                   Column('status', String(20), nullable=False),
+                   Column('attempts', Integer, nullable=False),
+                   Column('next_attempt_at', DateTime, nullable=False),
+                   Column('claim_token', String(32)),
+                   Column('last_error', String(255)),
+                   Column('created_at', DateTime),
+                   Column('sent_at', DateTime))
+    _create(outbox, Index('ix_outbox_status_next', outbox.c.status, outbox.c.next_attempt_at))
+
+
+def _add_leave_request_keyset_index():
+    """v7: phân trang đơn từ của nhân viên theo (user_id, id)."""
+    leave_request = _stub(MetaData(), 'leave_request', 'user_id')
+    _create(Index('ix_leave_request_user_id', leave_request.c.user_id, leave_request.c.id))
+
+
+def find_duplicate_open_shifts() -> List[Tuple[int, int]]:
+    """(user_id, số ca) của các nhân viên đang có nhiều hơn một ca chưa check-out."""
+    return db.session.query(Attendance.user_id, db.func.count(Attendance.id)).filter(
+        Attendance.check_out.is_(None)
+    ).group_by(Attendance.user_id).having(db.func.count(Attendance.id) > 1).all()
+
+
+def _open_shift_guard() -> Optional[Index]:
+    """Index unique một phần (mỗi nhân viên tối đa một ca chưa check-out); None nếu CSDL không hỗ trợ index một phần."""
+    if db.engine.dialect.name not in ('sqlite', 'postgresql'):
+        return None
+    attendance = _stub(MetaData(), 'attendance', 'user_id', 'check_out')
+    return Index('uq_attendance_open_shift', attendance.c.user_id, unique=True,
+                 sqlite_where=text('check_out IS NULL'), postgresql_where=text('check_out IS NULL'))
+
+
+def create_open_shift_guard() -> bool:
+    """Tạo index chặn ca mở trùng nếu dữ liệu cho phép. True nếu index đã có / vừa tạo."""
+    guard = _open_shift_guard()
+    if guard is None:
+        return False
+    if find_duplicate_open_shifts():
+        return False
+    _create(guard)
+    return True
+
+
+def _add_open_shift_guard():
+    """
+    v8: unique một phần - một ca đang mở mỗi nhân viên. Dữ liệu cũ đang vi phạm thì KHÔNG chặn khởi động:
+    chỉ cảnh báo, index được tạo sau khi xử lý bằng "flask schema open-shifts".
+    """
+    if not create_open_shift_guard() and _open_shift_guard() is not None:
+        current_app.logger.warning('Có nhân viên nhiều hơn một ca chưa check-out, chưa tạo uq_attendance_open_shift. '
+                                   'Chạy "flask schema open-shifts" để xem và xử lý.')
+
+
+def _add_shift_required_staff():
+    """v9: cột Shift.required_staff (số người cần cho mỗi ca)."""
+    columns = {column['name'] for column in inspect(db.engine).get_columns('shift')}
+    if 'required_staff' not in columns:
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql('ALTER TABLE shift ADD COLUMN required_staff INTEGER NOT NULL DEFAULT 0')
+
+
+def _backfill_daily_rollup():
+    """
+    v10: dựng bảng attendance_daily từ toàn bộ Attendance. v1 chỉ tạo bảng rỗng, trong khi tính lương,
+    biểu đồ giờ làm và báo cáo chi tiết chỉ đọc bảng này -> các tháng trước khi nâng cấp sẽ ra 0.
+    Chỉ thêm các (nhân viên, ngày) còn thiếu, không xóa: chạy lại được, và không đụng tới các dòng
+    mà check-in / check-out của worker khác vừa ghi trong lúc migrate.
+    """
+    rebuild_daily_rollup(replace=False)
+
+
+def _add_job_lease_columns():
+    """v11: cột lease của job nền (tiến trình giữ job + heartbeat)."""
+    columns = {column['name'] for column in inspect(db.engine).get_columns('background_job')}
+    with db.engine.begin() as conn:
+        if 'worker_id' not in columns:
+            conn.exec_driver_sql('ALTER TABLE background_job ADD COLUMN worker_id VARCHAR(64)')
+        if 'heartbeat_at' not in columns:
+            conn.exec_driver_sql('ALTER TABLE background_job ADD COLUMN heartbeat_at DATETIME')
+
+
+def _drop_attendance_open_shift_index():
+    """v12: bỏ ix_attendance_open_shift (v2) - trùng với uq_attendance_open_shift (v8)."""
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql('DROP INDEX IF EXISTS ix_attendance_open_shift')
+
+
+def _add_archive_notification_id():
+    """
+    v13: notification_archive có khóa chính riêng, id gốc chuyển sang cột notification_id (không unique).
+    Dòng cũ đã lưu id gốc ở cột id nên chép sang notification_id.
+    """
+    columns = {column['name'] for column in inspect(db.engine).get_columns('notification_archive')}
+    with db.engine.begin() as conn:
+        if 'notification_id' not in columns:
+            conn.exec_driver_sql('ALTER TABLE notification_archive ADD COLUMN notification_id INTEGER')
+        conn.exec_driver_sql('UPDATE notification_archive SET notification_id = id WHERE notification_id IS NULL')
+
+
+# (version, mô tả, hàm thực hiện) - chỉ THÊM vào cuối, không sửa migration đã phát hành
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, 'Tạo các bảng còn thiếu', _create_base_tables),
+    (2, 'Thêm index cho các truy vấn thường dùng', _add_hot_path_indexes),
+    (3, 'Index phân trang thông báo theo (timestamp, id)', _add_notification_keyset_index),
+    (4, 'Bảng lưu trữ thông báo cũ + index cho job lưu trữ', _create_notification_archive),
+    (5, 'Index thông báo đã đọc theo thời gian', _add_notification_read_time_index),
+    (6, 'Bảng outbox gửi email / push', _create_outbox),
+    (7, 'Index phân trang đơn từ của nhân viên theo (user_id, id)', _add_leave_request_keyset_index),
+    (8, 'Unique một phần: một ca đang mở mỗi nhân viên', _add_open_shift_guard),
+    (9, 'Cột số nhân viên cần cho mỗi ca (Shift.required_staff)', _add_shift_required_staff),
+    (10, 'Dựng bảng tổng hợp chấm công theo ngày từ dữ liệu cũ', _backfill_daily_rollup),
+    (11, 'Lease (worker_id, heartbeat_at) cho job nền', _add_job_lease_columns),
+    (12, 'Bỏ index ca mở trùng với uq_attendance_open_shift', _drop_attendance_open_shift_index),
+    (13, 'Khóa chính riêng cho bảng lưu trữ thông báo (id gốc -> notification_id)', _add_archive_notification_id),
+]
+
+
+# Khóa migration giữ lâu hơn số giây này coi như của tiến trình đã chết và bị thu hồi
+# (phải dài hơn migration chậm nhất, vd. backfill v10 trên CSDL lớn)
+MIGRATION_LOCK_STALE_SECONDS = 1800
+MIGRATION_LOCK_POLL_SECONDS = 0.5
+
+
+def current_version() -> int:
+    SchemaMigration.__table__.create(db.engine, checkfirst=True)
+    return db.session.query(db.func.max(SchemaMigration.version)).scalar() or 0
+
+
+@contextmanager
+def _migration_lock():
+    """
+    Khóa loại trừ giữa các tiến trình (nhiều worker cùng khởi động): INSERT dòng id = 1 vào
+    schema_migration_lock, tiến trình khác gặp IntegrityError (hoặc SQLite đang khóa ghi) thì chờ.
+    Dùng một dòng khóa thay vì BEGIN IMMEDIATE vì mỗi migration tự mở kết nối / transaction riêng.
+    """
+    SchemaMigrationLock.__table__.create(db.engine, checkfirst=True)
+    table = SchemaMigrationLock.__table__
+    owner = f'{socket.gethostname()}:{os.getpid()}'
+    waiting = False
+    while True:
+        try:
+            with db.engine.begin() as conn:
+                stale_before = datetime.utcnow() - timedelta(seconds=MIGRATION_LOCK_STALE_SECONDS)
+                conn.execute(table.delete().where(table.c.acquired_at < stale_before))
+                conn.execute(table.insert().values(id=1, owner=owner, acquired_at=datetime.utcnow()))
+            break
+        except (IntegrityError, OperationalError):
+            if not waiting:
+                waiting = True
+                current_app.logger.info('Đang chờ tiến trình khác chạy xong migration schema...')
+            time.sleep(MIGRATION_LOCK_POLL_SECONDS)
+    try:
+        yield
+    finally:
+        with db.engine.begin() as conn:
+            conn.execute(table.delete().where(table.c.id == 1, table.c.owner == owner))
+
+
+def upgrade() -> List[int]:
+    """
+    Áp dụng các migration chưa chạy. Trả về danh sách version vừa áp dụng.
+    Schema đã mới nhất thì không lấy khóa; ngược lại đọc lại version SAU khi có khóa, nên mỗi
+    migration chỉ chạy ở một tiến trình.
+    """
+    if current_version() >= MIGRATIONS[-1][0]:
+        return []
+    applied = []
+    with _migration_lock():
+        version = current_version()
+        for migration_version, description, func in MIGRATIONS:
+            if migration_version <= version:
+                continue
+            func()
+            db.session.add(SchemaMigration(version=migration_version, description=description))
+            db.session.commit()
+            applied.append(migration_version)
+    return applied
+
+
+# ============================================
+# ===   KIỂM TRA QUERY PLAN (DÙNG INDEX)   ===
+# ============================================
+
+def _hot_queries():
+    """Các truy vấn nóng cần dùng index: (tên, câu SELECT)."""
+    today = date.today()
+    month_start = today.replace(day=1)
+    return [
+        ('Ca chưa check-out của nhân viên', Attendance.query.filter_by(user_id=1, check_out=None)),
+        ('Chấm công hôm nay của nhân viên', Attendance.query.filter_by(user_id=1, date=today)),
+        ('Chấm công trong tháng của nhân viên', Attendance.query.filter(
+            Attendance.user_id == 1, Attendance.date.between(month_start, today))),
+        ('Chấm công của cả công ty theo ngày', Attendance.query.filter(Attendance.date.between(month_start, today))),
+        ('Tổng hợp chấm công theo tháng', AttendanceDaily.query.filter(AttendanceDaily.date.between(month_start, today))),
+        ('Đếm thông báo chưa đọc', Notification.query.filter_by(user_id=1, is_read=False)),
+        ('Thông báo đã đọc cần lưu trữ', Notification.query.filter(
+            Notification.is_read == True, Notification.timestamp < month_start).limit(500)),
+        ('Trang thông báo (keyset)', Notification.query.filter_by(user_id=1).order_by(
+            Notification.timestamp.desc(), Notification.id.desc()).limit(21)),
+        ('Outbox chờ gửi', OutboxMessage.query.filter(
+            OutboxMessage.status == 'pending', OutboxMessage.next_attempt_at <= today).limit(100)),
+        ('Đơn từ theo trạng thái', LeaveRequest.query.filter_by(status='pending')),
+        ('Trang quản lý đơn từ (keyset)', LeaveRequest.query.filter(
+            LeaveRequest.status == 'pending', LeaveRequest.id < 1000).order_by(LeaveRequest.id.desc()).limit(51)),
+        ('Trang đơn từ của nhân viên (keyset)', LeaveRequest.query.filter(
+            LeaveRequest.user_id == 1, LeaveRequest.id < 1000).order_by(LeaveRequest.id.desc()).limit(51)),
+        ('Hợp đồng mới nhất của nhân viên', Contract.query.filter(
+            Contract.user_id == 1, Contract.start_date <= today).order_by(Contract.start_date.desc())),
+        ('Thưởng của nhân viên trong tháng', Bonus.query.filter_by(user_id=1, month=today.month, year=today.year)),
+        ('Khấu trừ của nhân viên trong tháng', Deduction.query.filter_by(user_id=1, month=today.month, year=today.year)),
+        ('Thưởng cả tháng (tính lương hàng loạt)', Bonus.query.filter_by(month=today.month, year=today.year)),
+        ('Bảng lương của tháng', Payroll.query.filter_by(month=today.month, year=today.year)),
+        ('Lịch làm việc theo khoảng ngày', Schedule.query.filter(Schedule.date.between(month_start, today))),
+    ]
+
+
+def _explain(query) -> str:
+    """Trả về query plan (dạng text) của một truy vấn."""
+    dialect = db.engine.dialect.name
+    sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    if dialect == 'sqlite':
+        rows = db.session.execute(db.text('EXPLAIN QUERY PLAN ' + sql)).all()
+        return ' | '.join(row[-1] for row in rows)
+    rows = db.session.execute(db.text('EXPLAIN ' + sql)).all()
+    return ' | '.join(str(row[0]) for row in rows)
+
+
+def _uses_index(plan: str) -> bool:
+    plan = plan.upper()
+    return 'USING INDEX' in plan or 'USING COVERING INDEX' in plan or 'INDEX SCAN' in plan \
+        or 'INDEX ONLY SCAN' in plan or 'BITMAP INDEX' in plan or 'USING INTEGER PRIMARY KEY' in plan
+
+
+def check_query_plans() -> List[Tuple[str, bool, str]]:
+    """Chạy EXPLAIN cho từng truy vấn nóng: trả về (tên, có dùng index, plan)."""
+    results = []
+    for name, query in _hot_queries():
+        plan = _explain(query)
+        results.append((name, _uses_index(plan), plan))
+    return results
+
+
+# ============================================
+# ===             LỆNH CLI                 ===
+# ============================================
+
+schema_cli = AppGroup('schema', help='Quản lý phiên bản schema CSDL.')
+
+
+@schema_cli.command('upgrade')
+def upgrade_command():
+    """Áp dụng các migration còn thiếu: flask schema upgrade"""
+    applied = upgrade()
+    if applied:
+        # Bản sao chỉ đọc (nếu có) phải có schema mới
+        refresh_read_snapshot(current_app, db.engine)
+    click.echo(f'Đã áp dụng migration: {applied}' if applied else 'Schema đã ở phiên bản mới nhất.')
+
+
+@schema_cli.command('status')
+def status_command():
+    """Xem phiên bản schema hiện tại: flask schema status"""
+    version = current_version()
+    for migration_version, description, _ in MIGRATIONS:
+        mark = 'x' if migration_version <= version else ' '
+        click.echo(f'[{mark}] {migration_version:>3}  {description}')
+
+
+@schema_cli.command('check-plans')
+def check_plans_command():
+    """Kiểm tra mọi truy vấn nóng đều dùng index: flask schema check-plans"""
+    failed = 0
+    for name, uses_index, plan in check_query_plans():
+        click.echo(f"{'OK  ' if uses_index else 'FAIL'} {name}: {plan}")
+        failed += 0 if uses_index else 1
+    if failed:
+        raise click.ClickException(f'{failed} truy vấn không dùng index.')
+
+
+@schema_cli.command('open-shifts')
+def open_shifts_command():
+    """Kiểm tra ca chưa check-out bị trùng và tạo index chặn trùng khi dữ liệu đã sạch: flask schema open-shifts"""
+    if _open_shift_guard() is None:
+        raise click.ClickException(f'CSDL {db.engine.dialect.name} không hỗ trợ index một phần, không tạo index chặn trùng.')
+    duplicates = find_duplicate_open_shifts()
+    if duplicates:
+        for user_id, count in duplicates:
+            click.echo(f'Nhân viên #{user_id}: {count} ca chưa check-out')
+        raise click.ClickException('Hãy đóng các ca thừa (trang lịch sử chấm công) rồi chạy lại lệnh này.')
+    create_open_shift_guard()
+    click.echo('Không có ca mở trùng, index uq_attendance_open_shift đã sẵn sàng.')
+
+
+@schema_cli.command('db-settings')
+def db_settings_command():
+    """Xem profile, pool và PRAGMA đang áp dụng cho kết nối CSDL: flask schema db-settings"""
+    click.echo(f"Profile: {current_app.config.get('DB_PROFILE', 'production')}")
+    click.echo(f'Pool: {db.engine.pool.status()}')
+    if db.engine.dialect.name == 'sqlite':
+        for name, value in sqlite_settings(db.engine).items():
+            click.echo(f'  {name} = {value}')
+    read_engine = current_app.extensions.get('read_engine')
+    click.echo(f'CSDL đọc: {read_engine.url if read_engine is not None else "(không có, đọc CSDL chính)"}')
+
+
+@schema_cli.command('snapshot')
+def snapshot_command():
+    """Chụp lại bản sao chỉ đọc (READ_SNAPSHOT_PATH) cho các view @read_only: flask schema snapshot"""
+    path = refresh_read_snapshot(current_app, db.engine)
+    if path is None:
+        raise click.ClickException('Chưa cấu hình READ_SNAPSHOT_PATH (hoặc CSDL chính không phải file SQLite).')
+    click.echo(f'Đã chụp bản sao chỉ đọc: {path}')
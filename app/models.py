@@ -1,7 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timezone
+from .database import RoutingSession
 
-db = SQLAlchemy()
+# RoutingSession: truy vấn đọc trong các view / hàm @read_only có thể đi tới CSDL đọc (xem app/database.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -23,6 +25,9 @@ class User(db.Model):
     deductions = db.relationship('Deduction', backref='user', lazy=True, cascade="all, delete-orphan")
     notifications = db.relationship('Notification', backref='user', lazy=True, cascade="all, delete-orphan", order_by="Notification.timestamp.desc()")
     leave_requests = db.relationship('LeaveRequest', backref='user', lazy=True, cascade="all, delete-orphan")
+    daily_attendances = db.relationship('AttendanceDaily', backref='user', lazy=True, cascade="all, delete-orphan")
+    archived_notifications = db.relationship('NotificationArchive', lazy=True, cascade="all, delete-orphan")
+    outbox_messages = db.relationship('OutboxMessage', lazy=True, cascade="all, delete-orphan")
 
 
 # Bảng Hợp đồng
@@ -34,6 +39,9 @@ class Contract(db.Model):
     pay_rate = db.Column(db.Float, nullable=False) # 6,000,000 hoặc 20,000
     pay_unit = db.Column(db.String(20), default='month') # 'month' hoặc 'hour'
 
+    # Tìm hợp đồng mới nhất của nhân viên: WHERE user_id = ? AND start_date <= ? ORDER BY start_date DESC
+    __table_args__ = (db.Index('ix_contract_user_start', 'user_id', 'start_date'),)
+
 # Bảng Chấm công
 class Attendance(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -46,6 +54,17 @@ class Attendance(db.Model):
     gps_lng = db.Column(db.Float)
     schedule_id = db.Column(db.Integer, db.ForeignKey('schedule.id'), nullable=True)  # Thêm khóa ngoại tới Schedule
 
+    __table_args__ = (
+        db.Index('ix_attendance_user_date', 'user_id', 'date'),
+        db.Index('ix_attendance_date', 'date'),
+        # Unique một phần: mỗi nhân viên chỉ có tối đa MỘT ca đang mở (chặn check-in trùng khi bấm đồng thời),
+        # đồng thời là index tìm ca "treo" khi check-in/check-out. Chỉ tạo trên CSDL hỗ trợ index một phần:
+        # ở dialect khác nó sẽ thành unique(user_id) -> mỗi nhân viên chỉ được một dòng chấm công.
+        db.Index('uq_attendance_open_shift', 'user_id', unique=True,
+                 sqlite_where=db.text('check_out IS NULL'),
+                 postgresql_where=db.text('check_out IS NULL')).ddl_if(dialect=('sqlite', 'postgresql')),
+    )
+
 # Bảng Thưởng
 class Bonus(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -55,6 +74,8 @@ class Bonus(db.Model):
     amount = db.Column(db.Float, default=0)
     reason = db.Column(db.String(100))
 
+    __table_args__ = (db.Index('ix_bonus_period_user', 'year', 'month', 'user_id'),)
+
 
 # các khoản khấu trừ
 class Deduction(db.Model):
@@ -65,6 +86,8 @@ class Deduction(db.Model):
     amount = db.Column(db.Float, nullable=False)
     reason = db.Column(db.String(100))
 
+    __table_args__ = (db.Index('ix_deduction_period_user', 'year', 'month', 'user_id'),)
+
 # Bảng lưu kết quả lương hàng tháng
 class Payroll(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -75,7 +98,10 @@ class Payroll(db.Model):
     total_bonus = db.Column(db.Float)
     total_deduction = db.Column(db.Float)
     net_salary = db.Column(db.Float)
-    __table_args__ = (db.UniqueConstraint('user_id', 'month', 'year', name='_user_month_year_uc'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'month', 'year', name='_user_month_year_uc'),
+        db.Index('ix_payroll_period', 'year', 'month'),
+    )
 
 class SalarySettings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -92,10 +118,34 @@ class Notification(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     leave_request_id = db.Column(db.Integer, db.ForeignKey('leave_request.id'), nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_notification_user_read', 'user_id', 'is_read'),
+        db.Index('ix_notification_user_time', 'user_id', 'timestamp', 'id'),  # Phân trang keyset
+        # Index một phần cho job lưu trữ: chỉ các thông báo đã đọc, theo thời gian
+        db.Index('ix_notification_read_time', 'timestamp',
+                 sqlite_where=db.text('is_read = 1'),
+                 postgresql_where=db.text('is_read')),
+    )
+
     def __repr__(self):
         return f'<Notification {self.id} for user {self.user_id}>'
 
 
+# Bảng lưu trữ thông báo cũ đã đọc (được chuyển từ Notification bởi job lưu trữ, xem app/notification/retention.py)
+class NotificationArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    # id của Notification gốc. Không unique: notification.id không AUTOINCREMENT nên SQLite có thể
+    # cấp lại id của dòng lớn nhất đã bị xóa (đã chuyển sang đây) cho thông báo mới
+    notification_id = db.Column(db.Integer)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    message = db.Column(db.String(255), nullable=False)
+    timestamp = db.Column(db.DateTime)
+    leave_request_id = db.Column(db.Integer, nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.Index('ix_notification_archive_user_time', 'user_id', 'timestamp'),)
+
+
 class LeaveRequest(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -112,6 +162,12 @@ class LeaveRequest(db.Model):
 
     status = db.Column(db.String(20), default='pending') # 'pending', 'approved', 'rejected'
 
+    __table_args__ = (
+        db.Index('ix_leave_request_status', 'status'),
+        # Phân trang keyset theo id giảm dần cho trang "đơn của tôi"
+        db.Index('ix_leave_request_user_id', 'user_id', 'id'),
+    )
+
     # (Thêm mối quan hệ với Notification nếu bạn có)
     notifications = db.relationship('Notification', backref='leave_request', lazy=True)
 
@@ -125,6 +181,8 @@ class Shift(db.Model):
     name = db.Column(db.String(100), nullable=False)  # Tên ca, ví dụ: "Ca Sáng Part-time", "Ca Tối", "Hành chính Full-time"
     start_time = db.Column(db.Time, nullable=False)  # Giờ bắt đầu, ví dụ: 08:00:00
     end_time = db.Column(db.Time, nullable=False)    # Giờ kết thúc, ví dụ: 12:00:00
+    # Số nhân viên cần có mặt mỗi ngày cho ca này (0 = không yêu cầu), dùng cho phân tích độ phủ / xếp lịch tự động
+    required_staff = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # Mối quan hệ: Một Shift có nhiều Schedule
     schedules = db.relationship('Schedule', backref='shift', lazy=True, cascade="all, delete-orphan")
@@ -143,7 +201,88 @@ class Schedule(db.Model):
     attendances = db.relationship('Attendance', backref='schedule', lazy=True)
 
     # Đảm bảo không trùng lặp: một user không thể có 2 schedule trong cùng ngày
-    __table_args__ = (db.UniqueConstraint('user_id', 'date', name='_user_date_uc'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'date', name='_user_date_uc'),
+        db.Index('ix_schedule_date', 'date'),
+    )
 
     def __repr__(self):
         return f'<Schedule User {self.user_id} - Shift {self.shift_id} on {self.date}>'
+
+# Bảng tổng hợp chấm công theo ngày (mỗi nhân viên một dòng/ngày)
+# Được cập nhật cùng transaction với check-in / check-out / sửa chấm công,
+# để dashboard, tính lương và báo cáo không phải quét lại bảng Attendance.
+class AttendanceDaily(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    worked_seconds = db.Column(db.Float, nullable=False, default=0)  # Tổng giây của các lượt đã check-out
+    completed_punches = db.Column(db.Integer, nullable=False, default=0)  # Số lượt có đủ check-in và check-out
+    first_check_in = db.Column(db.DateTime)
+    last_check_out = db.Column(db.DateTime)
+    late_minutes = db.Column(db.Integer, nullable=False, default=0)
+    schedule_id = db.Column(db.Integer, db.ForeignKey('schedule.id'), nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'date', name='_daily_user_date_uc'),
+        db.Index('ix_attendance_daily_date', 'date'),
+    )
+
+    def __repr__(self):
+        return f'<AttendanceDaily User {self.user_id} on {self.date}: {self.worked_seconds}s>'
+
+# Bảng công việc chạy nền (tính lương, xuất báo cáo...) - dùng để theo dõi tiến độ
+class BackgroundJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    job_type = db.Column(db.String(50), nullable=False)  # 'payroll', 'detailed_report'...
+    status = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'running', 'done', 'failed'
+    progress = db.Column(db.Float, nullable=False, default=0)  # 0 -> 1
+    message = db.Column(db.String(255))
+    params = db.Column(db.Text)  # JSON tham số đầu vào
+    result_path = db.Column(db.String(255))  # Đường dẫn file kết quả (nếu có)
+    result_name = db.Column(db.String(200))
+    result_mimetype = db.Column(db.String(100))
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    # Lease: tiến trình đang giữ job và lần cuối nó báo còn sống (job quá hạn lease mới bị coi là gián đoạn)
+    worker_id = db.Column(db.String(64))
+    heartbeat_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<BackgroundJob {self.id} {self.job_type} {self.status}>'
+
+# Hàng đợi gửi email / push (outbox): ghi cùng transaction với dữ liệu nghiệp vụ,
+# được gửi sau bởi OutboxDispatcher chạy nền (xem app/notification/outbox.py)
+class OutboxMessage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    channel = db.Column(db.String(20), nullable=False)  # 'email', 'push'
+    recipient = db.Column(db.String(200), nullable=False)  # Địa chỉ email hoặc FCM token
+    subject = db.Column(db.String(200))
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # 'pending', 'sent', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claim_token = db.Column(db.String(32))  # Lô đang giữ message (tránh 2 worker gửi trùng)
+    last_error = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (db.Index('ix_outbox_status_next', 'status', 'next_attempt_at'),)
+
+    def __repr__(self):
+        return f'<OutboxMessage {self.id} {self.channel} {self.status}>'
+
+# Bảng ghi lại các phiên bản schema đã áp dụng (xem app/migrations.py)
+class SchemaMigration(db.Model):
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Khóa migration: tối đa MỘT dòng (id = 1) - tiến trình đang chạy upgrade() (xem app/migrations.py)
+class SchemaMigrationLock(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    owner = db.Column(db.String(100), nullable=False)  # hostname:pid
+    acquired_at = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,46 @@
+# /app/notification/cache.py
+# Cache số thông báo chưa đọc theo từng user (TTL, trong tiến trình),
+# để thanh điều hướng không phải chạy COUNT ở mỗi lần render trang.
+
+import threading
+from cachetools import TTLCache
+from flask import current_app
+from ..models import Notification
+
+_unread_counts = None
+_lock = threading.Lock()
+
+
+def _cache() -> TTLCache:
+    global _unread_counts
+    if _unread_counts is None:
+        with _lock:
+            if _unread_counts is None:
+                _unread_counts = TTLCache(
+                    maxsize=current_app.config.get('UNREAD_CACHE_SIZE', 10000),
+                    ttl=current_app.config.get('UNREAD_CACHE_TTL', 30)
+                )
+    return _unread_counts
+
+
+def get_unread_count(user_id: int) -> int:
+    """
+    Số thông báo chưa đọc của user. Đọc từ cache nếu còn hạn, ngược lại đếm trong CSDL.
+    Với nhiều worker, worker khác có thể thấy số cũ tối đa UNREAD_CACHE_TTL giây.
+    """
+    cache = _cache()
+    with _lock:
+        count = cache.get(user_id)
+    if count is None:
+        count = Notification.query.filter_by(user_id=user_id, is_read=False).count()
+        with _lock:
+            cache[user_id] = count
+    return count
+
+
+def invalidate_unread_count(*user_ids: int):
+    """Xóa số đã cache của các user (gọi khi tạo thông báo mới hoặc đánh dấu đã đọc)."""
+    cache = _cache()
+    with _lock:
+        for user_id in user_ids:
+            cache.pop(user_id, None)
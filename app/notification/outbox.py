@@ -0,0 +1,227 @@
+# /app/notification/outbox.py
+# Gửi email / push bất đồng bộ theo mẫu "transactional outbox":
+#   1. Route nghiệp vụ chỉ thêm dòng OutboxMessage vào CÙNG transaction (không gọi SMTP/FCM)
+#   2. OutboxDispatcher (thread nền) lấy từng lô message đến hạn, gửi qua transport của kênh,
+#      ghi kết quả; message lỗi được thử lại với thời gian chờ tăng dần.
+# Nhờ vậy duyệt hàng trăm đơn liên tiếp chỉ tốn thời gian ghi CSDL.
+
+import threading
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from ..models import db, User, OutboxMessage
+from .transports import Transport, FakeTransport, MailTransport, FcmTransport
+
+
+# ============================================
+# ===        GHI MESSAGE VÀO OUTBOX         ===
+# ============================================
+
+def enqueue_for_user(user, subject: str, body: str) -> List[OutboxMessage]:
+    """
+    Thêm message email / push cho user vào session hiện tại (KHÔNG commit).
+    Chỉ tạo message cho kênh mà user có địa chỉ nhận (email, fcm_token).
+    Sau khi commit, gọi outbox.wake() để dispatcher gửi ngay thay vì chờ chu kỳ kế tiếp.
+    """
+    messages = []
+    if user.email:
+        messages.append(OutboxMessage(user_id=user.id, channel='email', recipient=user.email,
+                                      subject=subject, body=body))
+    if user.fcm_token:
+        messages.append(OutboxMessage(user_id=user.id, channel='push', recipient=user.fcm_token,
+                                      subject=subject, body=body))
+    db.session.add_all(messages)
+    return messages
+
+
+def enqueue_bulk(items: Iterable[Tuple[int, str, str]]) -> int:
+    """
+    Bản hàng loạt của enqueue_for_user cho các (user_id, subject, body):
+    đọc email / fcm_token của tất cả user bằng MỘT truy vấn rồi insert executemany (KHÔNG commit).
+    Trả về số message đã thêm.
+    """
+    items = list(items)
+    if not items:
+        return 0
+    addresses = {
+        user_id: (email, fcm_token)
+        for user_id, email, fcm_token in db.session.query(User.id, User.email, User.fcm_token).filter(
+            User.id.in_({user_id for user_id, _, _ in items}))
+    }
+
+    rows = []
+    now = datetime.utcnow()
+    for user_id, subject, body in items:
+        email, fcm_token = addresses.get(user_id, (None, None))
+        for channel, recipient in (('email', email), ('push', fcm_token)):
+            if recipient:
+                rows.append({'user_id': user_id, 'channel': channel, 'recipient': recipient, 'subject': subject,
+                             'body': body, 'status': 'pending', 'attempts': 0, 'next_attempt_at': now,
+                             'created_at': now})
+    if rows:
+        db.session.execute(db.insert(OutboxMessage), rows)
+    return len(rows)
+
+
+# ============================================
+# ===            DISPATCHER                ===
+# ============================================
+
+class OutboxDispatcher:
+    """
+    Thread nền gửi các message trong bảng OutboxMessage theo lô.
+
+    Khởi tạo giống các extension khác: outbox = OutboxDispatcher(); outbox.init_app(app)
+    Cấu hình:
+      - OUTBOX_TRANSPORT: 'auto' (mặc định: kênh nào đã cấu hình thông tin đăng nhập thì gửi thật - email cần
+        MAIL_USERNAME + MAIL_PASSWORD, push cần FCM_CREDENTIALS_FILE - kênh còn lại dùng transport giả),
+        'live' (luôn gửi thật qua Flask-Mail + FCM) hoặc 'fake' (chỉ lưu trong bộ nhớ, cho dev/test)
+      - OUTBOX_POLL_INTERVAL: số giây giữa 2 lần quét (0 = không chạy thread, gửi bằng "flask notification dispatch-outbox")
+      - OUTBOX_BATCH_SIZE: số message tối đa mỗi lô
+      - OUTBOX_MAX_ATTEMPTS: số lần thử tối đa trước khi đánh dấu 'failed'
+      - OUTBOX_RETRY_DELAY: số giây chờ trước lần thử lại đầu tiên (nhân đôi sau mỗi lần lỗi)
+    """
+
+    # Thời gian giữ một lô đã nhận: nếu tiến trình chết giữa chừng, lô được gửi lại sau khoảng này
+    CLAIM_LEASE = timedelta(minutes=5)
+
+    def __init__(self, app=None):
+        self.app = None
+        self.transports: Dict[str, Transport] = {}
+        self._wakeup = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('OUTBOX_TRANSPORT', 'auto')
+        app.config.setdefault('OUTBOX_POLL_INTERVAL', 5)
+        app.config.setdefault('OUTBOX_BATCH_SIZE', 100)
+        app.config.setdefault('OUTBOX_MAX_ATTEMPTS', 5)
+        app.config.setdefault('OUTBOX_RETRY_DELAY', 30)
+
+        self.transports = {}
+        mode = app.config['OUTBOX_TRANSPORT']
+        email_live = mode == 'live' or (mode == 'auto' and bool(app.config.get('MAIL_USERNAME')
+                                                                 and app.config.get('MAIL_PASSWORD')))
+        push_live = mode == 'live' or (mode == 'auto' and bool(app.config.get('FCM_CREDENTIALS_FILE')))
+        self.register_transport(MailTransport(app.extensions['mail']) if email_live else FakeTransport('email'))
+        self.register_transport(FcmTransport(app.config.get('FCM_CREDENTIALS_FILE')) if push_live
+                                else FakeTransport('push'))
+        app.extensions['outbox'] = self
+
+        if app.config['OUTBOX_POLL_INTERVAL'] > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='outbox', daemon=True)
+            self._thread.start()
+
+    def register_transport(self, transport: Transport):
+        """Đăng ký (hoặc thay thế) transport cho một kênh."""
+        self.transports[transport.channel] = transport
+
+    def wake(self):
+        """Báo cho thread nền gửi ngay (gọi sau khi commit các message mới)."""
+        self._wakeup.set()
+
+    def _loop(self):
+        while True:
+            self._wakeup.wait(self.app.config['OUTBOX_POLL_INTERVAL'])
+            self._wakeup.clear()
+            with self.app.app_context():
+                try:
+                    self.dispatch_pending()
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception('Lỗi khi gửi các message trong outbox')
+                finally:
+                    db.session.remove()
+
+    def dispatch_pending(self) -> int:
+        """Gửi tất cả message đến hạn (nhiều lô liên tiếp). Trả về số message đã xử lý."""
+        total = 0
+        while True:
+            processed = self.dispatch_once()
+            total += processed
+            if processed < current_app.config['OUTBOX_BATCH_SIZE']:
+                return total
+
+    def _claim_batch(self, now: datetime) -> List[OutboxMessage]:
+        """
+        Nhận một lô message đến hạn bằng UPDATE có điều kiện, để nhiều worker không gửi trùng.
+        SELECT trước: khi outbox trống (trường hợp thường gặp) không chạy UPDATE / commit nên không giữ khóa ghi.
+        """
+        due_ids = db.session.scalars(db.select(OutboxMessage.id).where(
+            OutboxMessage.status == 'pending',
+            OutboxMessage.next_attempt_at <= now
+        ).order_by(OutboxMessage.next_attempt_at, OutboxMessage.id).limit(current_app.config['OUTBOX_BATCH_SIZE'])).all()
+        if not due_ids:
+            db.session.rollback()
+            return []
+
+        token = uuid.uuid4().hex
+        db.session.execute(
+            db.update(OutboxMessage).where(
+                OutboxMessage.id.in_(due_ids),
+                OutboxMessage.status == 'pending',
+                OutboxMessage.next_attempt_at <= now
+            ).values(claim_token=token, next_attempt_at=now + self.CLAIM_LEASE),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        return OutboxMessage.query.filter_by(claim_token=token).order_by(OutboxMessage.id).all()
+
+    def dispatch_once(self) -> int:
+        """Gửi MỘT lô message đến hạn. Trả về số message trong lô."""
+        config = current_app.config
+        now = datetime.utcnow()
+        messages = self._claim_batch(now)
+        if not messages:
+            return 0
+
+        by_channel = defaultdict(list)
+        for message in messages:
+            by_channel[message.channel].append(message)
+
+        updates = []
+        for channel, channel_messages in by_channel.items():
+            transport = self.transports.get(channel)
+            if transport is None:
+                errors = [f'Không có transport cho kênh {channel}'] * len(channel_messages)
+            else:
+                errors = transport.send_batch(channel_messages)
+
+            for message, error in zip(channel_messages, errors):
+                attempts = message.attempts + 1
+                values = {'id': message.id, 'attempts': attempts, 'claim_token': None}
+                if error is None:
+                    values.update(status='sent', sent_at=datetime.utcnow(), last_error=None)
+                elif attempts >= config['OUTBOX_MAX_ATTEMPTS']:
+                    values.update(status='failed', last_error=error[:255])
+                else:
+                    delay = config['OUTBOX_RETRY_DELAY'] * 2 ** (attempts - 1)
+                    values.update(status='pending', last_error=error[:255],
+                                  next_attempt_at=datetime.utcnow() + timedelta(seconds=delay))
+                updates.append(values)
+
+        # Cập nhật kết quả cả lô bằng một executemany theo khóa chính
+        db.session.execute(db.update(OutboxMessage), updates)
+        db.session.commit()
+        return len(messages)
+
+
+# ============================================
+# ===             LỆNH CLI                 ===
+# ============================================
+
+@click.command('dispatch-outbox')
+@with_appcontext
+def dispatch_outbox_command():
+    """Gửi ngay các email / push đang chờ: flask notification dispatch-outbox"""
+    processed = current_app.extensions['outbox'].dispatch_pending()
+    pending = OutboxMessage.query.filter_by(status='pending').count()
+    failed = OutboxMessage.query.filter_by(status='failed').count()
+    click.echo(f'Đã xử lý {processed} message. Còn chờ thử lại: {pending}, thất bại hẳn: {failed}.')
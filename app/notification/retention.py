@@ -0,0 +1,145 @@
+# /app/notification/retention.py
+# Job lưu trữ thông báo: chuyển các thông báo ĐÃ ĐỌC cũ sang bảng notification_archive
+# theo từng lô nhỏ. Mỗi lô là một transaction ngắn (INSERT ... SELECT + DELETE theo id)
+# nên khóa ghi của SQLite chỉ bị giữ trong vài mili giây, request khác không bị chặn lâu.
+
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from ..models import db, Notification, NotificationArchive
+
+
+# ============================================
+# ===      ĐO DUNG LƯỢNG (CHỈ SQLITE)      ===
+# ============================================
+
+def _notification_bytes() -> Optional[int]:
+    """
+    Số byte mà bảng notification và các index của nó đang chiếm.
+    Dùng bảng ảo dbstat của SQLite; trả về None nếu không hỗ trợ (CSDL khác, hoặc SQLite biên dịch không có dbstat).
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return None
+    names = [Notification.__tablename__] + [index.name for index in Notification.__table__.indexes]
+    try:
+        return db.session.execute(
+            db.text('SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name IN :names')
+            .bindparams(db.bindparam('names', expanding=True)),
+            {'names': names}
+        ).scalar()
+    except Exception:
+        db.session.rollback()
+        return None
+    finally:
+        # Kết thúc transaction đọc để không giữ snapshot giữa các lô
+        db.session.commit()
+
+
+def _freelist_bytes() -> Optional[int]:
+    """Số byte trang trống trong file SQLite (có thể tái sử dụng, hoặc thu hồi bằng VACUUM)."""
+    if db.engine.dialect.name != 'sqlite':
+        return None
+    page_size = db.session.execute(db.text('PRAGMA page_size')).scalar()
+    freelist = db.session.execute(db.text('PRAGMA freelist_count')).scalar()
+    db.session.commit()
+    return page_size * freelist
+
+
+# ============================================
+# ===        CHUYỂN THÔNG BÁO THEO LÔ       ===
+# ============================================
+
+def _archive_batch(cutoff: datetime, batch_size: int) -> int:
+    """Chuyển tối đa batch_size thông báo đã đọc cũ hơn cutoff trong MỘT transaction ngắn."""
+    # Dùng `== True` (không phải IS) để SQLite khớp điều kiện của index một phần ix_notification_read_time
+    ids = db.session.execute(
+        db.select(Notification.id).where(
+            Notification.is_read == True,  # noqa: E712
+            Notification.timestamp < cutoff
+        ).order_by(Notification.timestamp).limit(batch_size)
+    ).scalars().all()
+    if not ids:
+        db.session.commit()
+        return 0
+
+    # Bảng lưu trữ có khóa chính riêng: id gốc (có thể bị SQLite cấp lại) chỉ lưu ở cột notification_id
+    columns = ('user_id', 'message', 'timestamp', 'leave_request_id')
+    db.session.execute(
+        db.insert(NotificationArchive).from_select(
+            ('notification_id',) + columns + ('archived_at',),
+            db.select(Notification.id, *(getattr(Notification, c) for c in columns), db.literal(datetime.utcnow()))
+            .where(Notification.id.in_(ids))
+        )
+    )
+    db.session.execute(db.delete(Notification).where(Notification.id.in_(ids)))
+    db.session.commit()
+    return len(ids)
+
+
+def archive_read_notifications(older_than_days: Optional[int] = None, batch_size: Optional[int] = None,
+                               pause: float = 0.0, max_batches: Optional[int] = None) -> Dict:
+    """
+    Chuyển thông báo đã đọc cũ hơn `older_than_days` ngày sang bảng lưu trữ.
+    `pause`: số giây nghỉ giữa các lô để nhường khóa ghi cho request khác.
+    Trả về số liệu: số dòng đã chuyển, số lô, số byte bảng notification giảm được.
+    Thông báo chưa đọc không bao giờ bị chuyển nên không cần làm mới cache số chưa đọc.
+    """
+    config = current_app.config
+    if older_than_days is None:
+        older_than_days = config.get('NOTIFICATION_RETENTION_DAYS', 90)
+    if batch_size is None:
+        batch_size = config.get('NOTIFICATION_ARCHIVE_BATCH', 500)
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    started = time.perf_counter()
+    bytes_before = _notification_bytes()
+    rows_moved = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = _archive_batch(cutoff, batch_size)
+        if not moved:
+            break
+        rows_moved += moved
+        batches += 1
+        if moved < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    bytes_after = _notification_bytes()
+
+    bytes_reclaimed = None
+    if bytes_before is not None and bytes_after is not None:
+        bytes_reclaimed = max(bytes_before - bytes_after, 0)
+    return {
+        'cutoff': cutoff,
+        'rows_moved': rows_moved,
+        'batches': batches,
+        'bytes_reclaimed': bytes_reclaimed,
+        'freelist_bytes': _freelist_bytes(),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+# ============================================
+# ===             LỆNH CLI                 ===
+# ============================================
+
+@click.command('archive')
+@click.option('--days', type=int, default=None,
+              help='Chuyển thông báo đã đọc cũ hơn số ngày này (mặc định: NOTIFICATION_RETENTION_DAYS).')
+@click.option('--batch-size', type=int, default=None,
+              help='Số dòng mỗi lô (mặc định: NOTIFICATION_ARCHIVE_BATCH).')
+@click.option('--pause', type=float, default=0.0, help='Số giây nghỉ giữa các lô.')
+@click.option('--max-batches', type=int, default=None, help='Dừng sau số lô này.')
+@with_appcontext
+def archive_notifications_command(days, batch_size, pause, max_batches):
+    """Lưu trữ thông báo đã đọc cũ: flask notification archive --days 90"""
+    stats = archive_read_notifications(days, batch_size, pause, max_batches)
+    click.echo(f"Đã chuyển {stats['rows_moved']} thông báo (trước {stats['cutoff']:%Y-%m-%d %H:%M}) "
+               f"trong {stats['batches']} lô, {stats['seconds']}s.")
+    if stats['bytes_reclaimed'] is not None:
+        click.echo(f"Bảng notification giảm {stats['bytes_reclaimed']:,} byte; "
+                   f"trang trống trong file CSDL: {stats['freelist_bytes']:,} byte (chạy VACUUM để thu hồi).")
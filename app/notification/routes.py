@@ -1,22 +1,47 @@
 # /app/notification/routes.py (File mới)
 
-from flask import (Blueprint, render_template, session, redirect, url_for)
+from flask import (Blueprint, render_template, session, redirect, url_for, request)
 from ..models import db, Notification
 from ..decorators import login_required 
+from .cache import invalidate_unread_count
+from ..pagination import keyset_paginate
+from .retention import archive_notifications_command
+from .outbox import dispatch_outbox_command
 
 notification_bp = Blueprint('notification', __name__, url_prefix='/notifications')
+notification_bp.cli.add_command(archive_notifications_command)
+notification_bp.cli.add_command(dispatch_outbox_command)
+
+NOTIFICATIONS_PER_PAGE = 20
 
 @notification_bp.route('/')
 @login_required
 def list_notifications():
-    notifications = Notification.query.filter_by(user_id=session['user_id']).order_by(Notification.timestamp.desc()).all()
-    
-    # Đánh dấu tất cả là "đã đọc"
-    for notif in notifications:
-        notif.is_read = True
-    
-    db.session.commit()
-    
-    return render_template('notification/list.html', notifications=notifications)
+    """Danh sách thông báo, phân trang keyset theo (timestamp, id) giảm dần."""
+    user_id = session['user_id']
+    cursor = request.args.get('cursor')
 
+    # Lấy các cột cần hiển thị (không phải đối tượng ORM): commit bên dưới sẽ expire mọi đối tượng đã nạp,
+    # template đọc lại từng thuộc tính sẽ sinh thêm một SELECT cho mỗi thông báo.
+    # is_read là trạng thái TRƯỚC khi đánh dấu đã đọc
+    page = keyset_paginate(
+        db.session.query(Notification.id, Notification.message, Notification.timestamp,
+                         Notification.is_read).filter(Notification.user_id == user_id),
+        columns=(Notification.timestamp, Notification.id),
+        descending=(True, True),
+        cursor=cursor,
+        per_page=NOTIFICATIONS_PER_PAGE,
+        key=lambda notif: (notif.timestamp, notif.id)
+    )
 
+    # Đánh dấu tất cả là "đã đọc" bằng MỘT câu UPDATE (dùng ix_notification_user_read).
+    # Không dựa vào số đếm trong cache: cache là của riêng tiến trình, có thể còn 0 cũ trong khi worker khác vừa thêm thông báo.
+    marked = Notification.query.filter_by(user_id=user_id, is_read=False).update(
+        {'is_read': True}, synchronize_session=False
+    )
+    db.session.commit()
+    if marked:
+        invalidate_unread_count(user_id)
+    
+    return render_template('notification/list.html', notifications=page.items,
+                           next_cursor=page.next_cursor, is_first_page=not cursor)
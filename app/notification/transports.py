@@ -0,0 +1,115 @@
+# /app/notification/transports.py
+# Các kênh gửi thông báo ra ngoài (email, push) cho OutboxDispatcher.
+# Mỗi transport nhận MỘT LÔ message cùng kênh và trả về lỗi tương ứng từng message
+# (None = gửi thành công), để dispatcher chỉ thử lại những message bị lỗi.
+
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence
+from flask_mail import Message
+
+
+class Transport(ABC):
+    """Giao diện chung. Lớp con đặt `channel` và cài đặt send_batch() (thiếu thì lỗi ngay khi khởi tạo)."""
+
+    channel: str = ''
+
+    @abstractmethod
+    def send_batch(self, messages: Sequence) -> List[Optional[str]]:
+        """Gửi cả lô; trả về lỗi của từng message theo thứ tự (None = thành công)."""
+
+
+class FakeTransport(Transport):
+    """
+    Transport giả cho môi trường dev/test: không gửi gì ra ngoài, chỉ lưu lại trong bộ nhớ.
+    fail_recipients: các recipient luôn bị báo lỗi (để thử cơ chế retry).
+    """
+
+    def __init__(self, channel: str, fail_recipients: Sequence[str] = ()):
+        self.channel = channel
+        self.fail_recipients = set(fail_recipients)
+        self.sent = []  # (recipient, subject, body)
+        self.batches = 0
+
+    def send_batch(self, messages):
+        self.batches += 1
+        errors = []
+        for message in messages:
+            if message.recipient in self.fail_recipients:
+                errors.append('Lỗi giả lập')
+                continue
+            self.sent.append((message.recipient, message.subject, message.body))
+            errors.append(None)
+        return errors
+
+
+class MailTransport(Transport):
+    """Gửi email qua Flask-Mail, dùng chung MỘT kết nối SMTP cho cả lô."""
+
+    channel = 'email'
+
+    def __init__(self, mail):
+        self.mail = mail
+
+    def send_batch(self, messages):
+        errors = []
+        try:
+            with self.mail.connect() as conn:
+                for message in messages:
+                    try:
+                        conn.send(Message(subject=message.subject or '', recipients=[message.recipient],
+                                          body=message.body))
+                        errors.append(None)
+                    except Exception as e:
+                        errors.append(str(e))
+        except Exception as e:
+            # Không kết nối được SMTP: cả phần còn lại của lô đều lỗi
+            errors.extend([str(e)] * (len(messages) - len(errors)))
+        return errors
+
+
+class FcmTransport(Transport):
+    """
+    Gửi push qua Firebase Cloud Messaging (firebase_admin.messaging.send_each, tối đa 500 message/lần).
+    credentials_file: file JSON service account (None = Application Default Credentials / GOOGLE_APPLICATION_CREDENTIALS).
+    """
+
+    channel = 'push'
+    APP_NAME = 'outbox'
+
+    def __init__(self, credentials_file: Optional[str] = None):
+        self.credentials_file = credentials_file
+        self._app = None
+        self._lock = threading.Lock()
+
+    def _firebase_app(self):
+        """Khởi tạo firebase_admin app riêng của outbox một lần cho mỗi tiến trình."""
+        if self._app is None:
+            with self._lock:
+                if self._app is None:
+                    import firebase_admin
+                    from firebase_admin import credentials
+                    try:
+                        self._app = firebase_admin.get_app(self.APP_NAME)
+                    except ValueError:
+                        credential = credentials.Certificate(self.credentials_file) if self.credentials_file else None
+                        self._app = firebase_admin.initialize_app(credential, name=self.APP_NAME)
+        return self._app
+
+    def send_batch(self, messages):
+        try:
+            from firebase_admin import messaging
+            app = self._firebase_app()
+            fcm_messages = [
+                messaging.Message(token=message.recipient,
+                                  notification=messaging.Notification(title=message.subject, body=message.body))
+                for message in messages
+            ]
+            errors = []
+            for start in range(0, len(fcm_messages), 500):
+                response = messaging.send_each(fcm_messages[start:start + 500], app=app)
+                errors.extend(None if r.success else str(r.exception) for r in response.responses)
+            return errors
+        except Exception as e:
+            # Chưa cài / chưa khởi tạo firebase_admin, hoặc lỗi mạng: thử lại cả lô sau
+            return [str(e)] * len(messages)
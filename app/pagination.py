@@ -0,0 +1,92 @@
+# /app/pagination.py
+# Phân trang keyset (cursor): thay vì OFFSET, trang sau được lọc bằng giá trị khóa sắp xếp
+# của dòng cuối trang trước, nên thời gian truy vấn không phụ thuộc trang thứ mấy.
+
+import base64
+import json
+from datetime import date, datetime
+from typing import List, Optional, Sequence
+from sqlalchemy import and_, or_
+
+
+class KeysetPage:
+    """Một trang kết quả: items, cursor của trang tiếp theo (None nếu là trang cuối)."""
+
+    def __init__(self, items: list, next_cursor: Optional[str]):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+
+def _to_json(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _from_json(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+    return value
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Mã hóa giá trị khóa sắp xếp thành chuỗi an toàn cho URL."""
+    raw = json.dumps([_to_json(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[list]:
+    """Giải mã cursor; trả về None nếu rỗng hoặc không hợp lệ (coi như trang đầu)."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = [_from_json(v) for v in json.loads(raw)]
+    except (ValueError, TypeError):
+        return None
+    return values if len(values) == size else None
+
+
+def after_cursor(columns: Sequence, values: Sequence, descending: Sequence[bool]):
+    """
+    Điều kiện "đứng sau cursor" theo thứ tự sắp xếp nhiều cột (mỗi cột tăng hoặc giảm):
+    (c1 > v1) OR (c1 = v1 AND c2 > v2) OR ...
+    """
+    clauses = []
+    for i, (column, value, desc) in enumerate(zip(columns, values, descending)):
+        equal_prefix = [columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal_prefix, column < value if desc else column > value))
+    if len(clauses) == 1:
+        return clauses[0]
+    # Thêm điều kiện thừa trên cột đầu (c1 <= v1 / c1 >= v1) để CSDL quét index theo đúng thứ tự
+    # từ vị trí cursor, thay vì tách OR thành nhiều lần tìm rồi sắp xếp lại toàn bộ phần còn lại
+    first_bound = columns[0] <= values[0] if descending[0] else columns[0] >= values[0]
+    return and_(first_bound, or_(*clauses))
+
+
+def keyset_paginate(query, columns: Sequence, descending: Sequence[bool], cursor: Optional[str],
+                    per_page: int, key=None) -> KeysetPage:
+    """
+    Lấy một trang của query theo keyset trên các cột `columns`.
+    `key(item)` trả về giá trị các cột khóa của một dòng (để tạo cursor trang sau).
+    """
+    values = decode_cursor(cursor, len(columns))
+    if values is not None:
+        query = query.filter(after_cursor(columns, values, descending))
+    order = [column.desc() if desc else column.asc() for column, desc in zip(columns, descending)]
+    items: List = query.order_by(*order).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        next_cursor = encode_cursor(key(items[-1]))
+    return KeysetPage(items, next_cursor)
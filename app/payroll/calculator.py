@@ -4,9 +4,11 @@ import csv
 import io
 from datetime import datetime, date
 from calendar import monthrange
-from typing import List, Tuple, Dict, Optional 
-import zipfile
-from ..models import db, User, Contract, Attendance, SalarySettings, Bonus, Deduction, Payroll
+from typing import List, Tuple, Dict, Optional, Callable, Iterator
+from .zipstream import stream_zip
+from ..models import (db, User, Contract, Attendance, AttendanceDaily, SalarySettings, Bonus, Deduction, Payroll,
+                      LeaveRequest)
+from ..decorators import read_only
 import pytz
 
 
@@ -35,44 +37,74 @@ def _get_employee_contract(employee_id: int, month: int, year: int) -> Optional[
     ).order_by(Contract.start_date.desc()).first()
     return contract
 
-def _get_employee_attendance(employee_id: int, month: int, year: int) -> List[Attendance]:
-    """Lấy tất cả bản ghi chấm công của nhân viên trong tháng."""
+def _get_employee_attendance(employee_id: int, month: int, year: int) -> List[AttendanceDaily]:
+    """Lấy các dòng tổng hợp chấm công theo ngày của nhân viên trong tháng."""
     _, num_days_in_month = monthrange(year, month)
     month_start = date(year, month, 1)
     month_end = date(year, month, num_days_in_month)
     
-    attendances = Attendance.query.filter(
-        Attendance.user_id == employee_id,
-        Attendance.date.between(month_start, month_end)
-    ).all()
-    return attendances
-
-def _calculate_attendance_metrics(attendances: List[Attendance]) -> Tuple[int, float]:
-    """Tính số ngày làm và tổng giờ làm từ danh sách chấm công."""
+    daily_rows = AttendanceDaily.query.filter(
+        AttendanceDaily.user_id == employee_id,
+        AttendanceDaily.date.between(month_start, month_end)
+    ).order_by(AttendanceDaily.date).all()
+    return daily_rows
+
+def _calculate_attendance_metrics(daily_rows: List[AttendanceDaily]) -> Tuple[int, float]:
+    """Tính số ngày làm (số lượt có đủ check-in/check-out) và tổng giờ làm từ bảng tổng hợp."""
     actual_work_days = 0
     total_work_hours = 0
-    for att in attendances:
-        if att.check_in and att.check_out:
-            actual_work_days += 1
-            duration = att.check_out - att.check_in
-            total_work_hours += duration.total_seconds() / 3600
+    for daily in daily_rows:
+        if daily.completed_punches:
+            actual_work_days += daily.completed_punches
+            total_work_hours += daily.worked_seconds / 3600
     return actual_work_days, total_work_hours
 
+def _compute_gross_salary(pay_rate: float, pay_unit: str, actual_work_days: int, total_work_hours: float, standard_days: Optional[int]) -> float:
+    """Công thức tính lương tổng (gross), không in log - dùng chung cho cả chế độ tính hàng loạt."""
+    gross_salary = 0.0 # Khởi tạo là float
+    if pay_unit == 'month':
+        if standard_days is not None and standard_days > 0: # Kiểm tra None
+            gross_salary = pay_rate * (actual_work_days / standard_days)
+    elif pay_unit == 'hour':
+        gross_salary = pay_rate * total_work_hours
+    return gross_salary
+
 def _calculate_gross_salary(contract: Contract, actual_work_days: int, total_work_hours: float, settings: SalarySettings) -> float:
     """Tính lương tổng (gross) dựa trên hợp đồng và số liệu chấm công."""
-    gross_salary = 0.0 # Khởi tạo là float
+    standard_days = settings.standard_work_days_per_month
+    gross_salary = _compute_gross_salary(contract.pay_rate, contract.pay_unit, actual_work_days, total_work_hours, standard_days)
     if contract.pay_unit == 'month':
-        standard_days = settings.standard_work_days_per_month
-        if standard_days is not None and standard_days > 0: # Kiểm tra None
-            gross_salary = contract.pay_rate * (actual_work_days / standard_days)
         # In thông tin debug (giữ nguyên từ code gốc)
         print(f"    -> Lương Full-time: {contract.pay_rate} * ({actual_work_days}/{standard_days}) = {gross_salary}")
     elif contract.pay_unit == 'hour':
-        gross_salary = contract.pay_rate * total_work_hours
         # In thông tin debug (giữ nguyên từ code gốc)
         print(f"    -> Lương Part-time: {contract.pay_rate} * {total_work_hours} = {gross_salary}")
     return gross_salary
 
+def _late_day_filters(month: int, year: int) -> tuple:
+    """
+    Điều kiện lọc các ngày đi trễ trong tháng trên bảng tổng hợp: late_minutes (tính lúc check-in
+    theo giờ bắt đầu ca) > 0 và không có đơn xin đi trễ ('late') đã duyệt cho đúng ngày đó.
+    """
+    _, num_days_in_month = monthrange(year, month)
+    excused = db.select(LeaveRequest.id).where(
+        LeaveRequest.user_id == AttendanceDaily.user_id,
+        LeaveRequest.request_type == 'late',
+        LeaveRequest.status == 'approved',
+        LeaveRequest.request_date == AttendanceDaily.date
+    ).exists()
+    return (
+        AttendanceDaily.date.between(date(year, month, 1), date(year, month, num_days_in_month)),
+        AttendanceDaily.late_minutes > 0,
+        ~excused
+    )
+
+def _get_employee_late_days(employee_id: int, month: int, year: int) -> int:
+    """Số ngày đi trễ (không có đơn được duyệt) của nhân viên trong tháng."""
+    return db.session.query(db.func.count(AttendanceDaily.id)).filter(
+        AttendanceDaily.user_id == employee_id, *_late_day_filters(month, year)
+    ).scalar() or 0
+
 def _get_adjustments(employee_id: int, month: int, year: int) -> Tuple[float, float]:
     """Lấy tổng thưởng và tổng khấu trừ trong tháng."""
     total_bonus = db.session.query(db.func.sum(Bonus.amount)).filter_by(user_id=employee_id, month=month, year=year).scalar() or 0.0
@@ -100,15 +132,160 @@ def _save_payroll_record(employee_id: int, month: int, year: int, data: Dict):
     print(f"    -> Lương cuối cùng: {payroll_record.net_salary}. Đang chuẩn bị lưu...")
 
 
+# ============================================
+# === CÁC HÀM HỖ TRỢ TÍNH LƯƠNG HÀNG LOẠT  ===
+# ============================================
+# Mỗi hàm dưới đây lấy dữ liệu của TẤT CẢ nhân viên trong một truy vấn,
+# nên số truy vấn không phụ thuộc vào số lượng nhân viên.
+
+def _get_contracts_for_month(month: int, year: int) -> Dict[int, Contract]:
+    """Hợp đồng hợp lệ (mới nhất, bắt đầu trước ngày 1 của tháng) của từng nhân viên."""
+    first_day_of_month = date(year, month, 1)
+    ranked = db.session.query(
+        Contract.id,
+        db.func.row_number().over(
+            partition_by=Contract.user_id,
+            order_by=(Contract.start_date.desc(), Contract.id.desc())
+        ).label('rank')
+    ).filter(
+        Contract.start_date <= first_day_of_month
+    ).subquery()
+
+    contracts = Contract.query.join(ranked, Contract.id == ranked.c.id).filter(ranked.c.rank == 1).all()
+    return {contract.user_id: contract for contract in contracts}
+
+def _get_attendance_metrics_for_month(month: int, year: int) -> Dict[int, Tuple[int, float]]:
+    """Số ngày làm và tổng giờ làm của từng nhân viên, đọc từ bảng tổng hợp trong một truy vấn."""
+    _, num_days_in_month = monthrange(year, month)
+    month_start = date(year, month, 1)
+    month_end = date(year, month, num_days_in_month)
+
+    daily_rows = db.session.query(
+        AttendanceDaily.user_id, AttendanceDaily.completed_punches, AttendanceDaily.worked_seconds
+    ).filter(
+        AttendanceDaily.date.between(month_start, month_end)
+    ).order_by(AttendanceDaily.user_id, AttendanceDaily.date).all()
+
+    rows_by_user: Dict[int, List] = {}
+    for row in daily_rows:
+        rows_by_user.setdefault(row.user_id, []).append(row)
+    # Dùng lại đúng hàm của chế độ từng nhân viên để kết quả khớp tuyệt đối
+    return {user_id: _calculate_attendance_metrics(rows) for user_id, rows in rows_by_user.items()}
+
+def _get_adjustments_for_month(month: int, year: int) -> Tuple[Dict[int, float], Dict[int, float]]:
+    """Tổng thưởng và tổng khấu trừ của từng nhân viên trong tháng (mỗi loại một truy vấn GROUP BY)."""
+    bonuses = dict(db.session.query(
+        Bonus.user_id, db.func.sum(Bonus.amount)
+    ).filter_by(month=month, year=year).group_by(Bonus.user_id).all())
+    deductions = dict(db.session.query(
+        Deduction.user_id, db.func.sum(Deduction.amount)
+    ).filter_by(month=month, year=year).group_by(Deduction.user_id).all())
+    return bonuses, deductions
+
+def _get_late_days_for_month(month: int, year: int) -> Dict[int, int]:
+    """Số ngày đi trễ của từng nhân viên trong tháng (một truy vấn GROUP BY trên bảng tổng hợp)."""
+    return dict(db.session.query(
+        AttendanceDaily.user_id, db.func.count(AttendanceDaily.id)
+    ).filter(*_late_day_filters(month, year)).group_by(AttendanceDaily.user_id).all())
+
+def _bulk_upsert_payroll_records(month: int, year: int, records: List[Dict]):
+    """Ghi (thêm mới hoặc cập nhật) tất cả bản ghi lương của tháng trong một câu lệnh."""
+    if not records:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(Payroll)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'month', 'year'],
+            set_={'gross_salary': stmt.excluded.gross_salary, 'net_salary': stmt.excluded.net_salary}
+        )
+        db.session.execute(stmt, records)
+        return
+
+    # CSDL khác: một truy vấn lấy id đã có, rồi một lệnh UPDATE hàng loạt + một lệnh INSERT hàng loạt
+    existing_ids = dict(db.session.query(Payroll.user_id, Payroll.id).filter_by(month=month, year=year).all())
+    updates = [dict(record, id=existing_ids[record['user_id']]) for record in records if record['user_id'] in existing_ids]
+    inserts = [record for record in records if record['user_id'] not in existing_ids]
+    if updates:
+        db.session.execute(db.update(Payroll), updates)
+    if inserts:
+        db.session.execute(db.insert(Payroll), inserts)
+
+def _calculate_and_store_salaries_bulk(month: int, year: int, settings: SalarySettings,
+                                      progress: Optional[Callable] = None):
+    """
+    Chế độ tính lương hàng loạt: tải hợp đồng, chấm công, thưởng, khấu trừ của cả tháng
+    bằng vài truy vấn gộp, tính lương trong bộ nhớ rồi ghi tất cả Payroll bằng một câu lệnh.
+    Kết quả giống hệt chế độ xử lý từng nhân viên.
+    """
+    employee_ids = [user_id for (user_id,) in db.session.query(User.id).filter(User.role != 'admin').all()]
+    if not employee_ids:
+        print("🟡 Không tìm thấy nhân viên nào để tính lương.")
+        return
+
+    contracts = _get_contracts_for_month(month, year)
+    attendance_metrics = _get_attendance_metrics_for_month(month, year)
+    bonuses, deductions = _get_adjustments_for_month(month, year)
+    late_days = _get_late_days_for_month(month, year)
+    standard_days = settings.standard_work_days_per_month
+    late_penalty_amount = settings.late_penalty_amount or 0
+    if progress:
+        progress(0.5, 'Đã tải dữ liệu, đang tính lương...')
+
+    records = []
+    skipped = 0
+    for employee_id in employee_ids:
+        contract = contracts.get(employee_id)
+        if not contract:
+            skipped += 1
+            continue
+
+        actual_work_days, total_work_hours = attendance_metrics.get(employee_id, (0, 0))
+        gross_salary = _compute_gross_salary(contract.pay_rate, contract.pay_unit, actual_work_days, total_work_hours, standard_days)
+        total_bonus = bonuses.get(employee_id) or 0.0
+        total_deduction = deductions.get(employee_id) or 0.0
+        late_penalty = late_days.get(employee_id, 0) * late_penalty_amount
+        net_salary = gross_salary + total_bonus - total_deduction - late_penalty
+
+        records.append({
+            'user_id': employee_id,
+            'month': month,
+            'year': year,
+            'gross_salary': round(gross_salary, 2),
+            'net_salary': round(net_salary, 2)
+        })
+
+    _bulk_upsert_payroll_records(month, year, records)
+    print(f"    -> Đã tính {len(records)} bản ghi lương, bỏ qua {skipped} nhân viên không có hợp đồng hợp lệ.")
+
+
 # ============================================
 # ===     HÀM TÍNH LƯƠNG CHÍNH            ===
 # ============================================
 
-def calculate_and_store_salaries(month: int, year: int):
+def calculate_and_store_salaries(month: int, year: int, bulk: bool = True, progress: Optional[Callable] = None):
     """
     Hàm chính (đã refactor) để điều phối việc tính lương và lưu vào bảng Payroll.
+    Mặc định dùng chế độ hàng loạt (bulk=True); bulk=False xử lý và in log từng nhân viên.
+    progress(fraction, message) là hàm báo tiến độ tùy chọn (dùng khi chạy nền).
     """
     print(f"🚀 BẮT ĐẦU TÍNH LƯƠNG CHO THÁNG {month}/{year}")
+    if bulk:
+        settings = _get_salary_settings()
+        try:
+            _calculate_and_store_salaries_bulk(month, year, settings, progress)
+            db.session.commit()
+            print("\n✅ HOÀN TẤT: Đã tính và lưu lương cho tất cả nhân viên.")
+        except Exception as e:
+            db.session.rollback()
+            print(f"\n❌ LỖI KHI COMMIT DATABASE: {e}")
+            raise e
+        return
+
     settings = _get_salary_settings()
     employees = _get_active_employees()
 
@@ -116,7 +293,9 @@ def calculate_and_store_salaries(month: int, year: int):
          print("🟡 Không tìm thấy nhân viên nào để tính lương.")
          return # Thoát sớm nếu không có nhân viên
 
-    for employee in employees:
+    for index, employee in enumerate(employees):
+        if progress:
+            progress(index / len(employees), f'Đang xử lý {employee.username}...')
         print(f"\n--- Đang xử lý cho: {employee.username} ---")
 
         contract = _get_employee_contract(employee.id, month, year)
@@ -131,8 +310,13 @@ def calculate_and_store_salaries(month: int, year: int):
         gross_salary = _calculate_gross_salary(contract, actual_work_days, total_work_hours, settings)
         
         total_bonus, total_deduction = _get_adjustments(employee.id, month, year)
-        
-        net_salary = gross_salary + total_bonus - total_deduction
+
+        late_days = _get_employee_late_days(employee.id, month, year)
+        late_penalty = late_days * (settings.late_penalty_amount or 0)
+        if late_days:
+            print(f"    -> Đi trễ: {late_days} ngày, phạt {late_penalty}")
+
+        net_salary = gross_salary + total_bonus - total_deduction - late_penalty
 
         # Chuẩn bị dữ liệu để lưu
         payroll_data = {
@@ -141,6 +325,7 @@ def calculate_and_store_salaries(month: int, year: int):
             'gross_salary': gross_salary,
             'total_bonus': total_bonus,
             'total_deduction': total_deduction,
+            'late_penalty': late_penalty,
             'net_salary': net_salary
         }
         
@@ -162,109 +347,116 @@ def calculate_and_store_salaries(month: int, year: int):
 # === CÁC HÀM XUẤT BÁO CÁO (GIỮ NGUYÊN)   ===
 # ============================================
 
-def generate_salary_report(month: int, year: int):
-    """Tạo báo cáo lương tóm tắt (Giữ nguyên)."""
-    # ... (code cũ của bạn hoàn toàn giữ nguyên)
-    output = io.StringIO()
-    writer = csv.writer(output)
+class _EchoWriter:
+    """File giả cho csv.writer: trả lại luôn dòng vừa ghi thay vì lưu vào bộ nhớ."""
+    def write(self, value):
+        return value
+
+@read_only
+def generate_salary_report(month: int, year: int, batch_size: int = 500) -> Iterator[bytes]:
+    """
+    Tạo báo cáo lương tóm tắt dưới dạng generator các dòng CSV (đã encode utf-8),
+    để route có thể stream ngay cho client mà không giữ cả file trong bộ nhớ.
+    Đọc từ CSDL đọc (@read_only) nếu có cấu hình.
+    """
+    writer = csv.writer(_EchoWriter())
     header = ['ID Nhân viên', 'Tên Nhân viên', 'Lương Tổng', 'Tổng Thưởng', 'Tổng Khấu Trừ', 'Lương Thực Nhận']
-    writer.writerow(header)
-    payrolls = db.session.query(Payroll, User.username).join(User, Payroll.user_id == User.id).filter( # Sửa join condition
+    yield writer.writerow(header).encode('utf-8')
+
+    # Chỉ lấy các cột cần thiết và đọc theo từng lô (yield_per) thay vì .all()
+    payrolls = db.session.query(
+        Payroll.user_id, User.username, Payroll.gross_salary, Payroll.net_salary
+    ).join(User, Payroll.user_id == User.id).filter( # Sửa join condition
         Payroll.month == month,
         Payroll.year == year
-    ).all()
-    for payroll, username in payrolls:
-        writer.writerow([
-            payroll.user_id, username,
-            payroll.gross_salary, getattr(payroll, 'bonus_amount', 0), # Sử dụng bonus_amount nếu có
-            getattr(payroll, 'deduction_amount', 0), # Sử dụng deduction_amount nếu có
-            payroll.net_salary
-        ])
-    mem = io.BytesIO()
-    mem.write(output.getvalue().encode('utf-8'))
-    mem.seek(0)
-    output.close()
-    return mem
+    ).execution_options(yield_per=batch_size)
+    for user_id, username, gross_salary, net_salary in payrolls:
+        yield writer.writerow([
+            user_id, username,
+            gross_salary,
+            0, # Thưởng chưa được lưu riêng trong bảng Payroll
+            0, # Khấu trừ chưa được lưu riêng trong bảng Payroll
+            net_salary
+        ]).encode('utf-8')
 
 
 # ================================================================
 # === HÀM XUẤT BÁO CÁO CHI TIẾT ===
 # ================================================================
 
-def generate_detailed_report(month: int, year: int) -> io.BytesIO:
+@read_only
+def _detailed_report_members(month: int, year: int, progress: Optional[Callable] = None,
+                             batch_size: int = 1000) -> Iterator[Tuple[str, bytes]]:
     """
-    Tạo báo cáo chấm công chi tiết cho TỪNG NHÂN VIÊN,
-    nén thành file ZIP và trả về dưới dạng BytesIO trong bộ nhớ.
+    Đọc chấm công của cả tháng bằng MỘT truy vấn (sắp xếp theo nhân viên, ngày)
+    và lần lượt trả về (tên file CSV, nội dung CSV) của từng nhân viên.
     """
     vn_tz = pytz.timezone('Asia/Ho_Chi_Minh')
-    
-    # --- Bước 1: Lấy danh sách nhân viên đã có chấm công trong tháng ---
     month_start = date(year, month, 1)
     _, num_days_in_month = monthrange(year, month)
     month_end = date(year, month, num_days_in_month)
 
-    # Lấy ID và Tên của những nhân viên có bản ghi Attendance trong tháng
-    employees_in_month = db.session.query(
-        User.id, User.username
-    ).join(
-        Attendance, User.id == Attendance.user_id
-    ).filter(
-        Attendance.date.between(month_start, month_end),
+    filters = (
+        AttendanceDaily.date.between(month_start, month_end),
         User.role != 'admin' # Chỉ lấy nhân viên
-    ).distinct().order_by(User.username).all()
-
-    if not employees_in_month:
-        # Nếu không có ai chấm công, trả về BytesIO rỗng hoặc báo lỗi tùy bạn
-        return io.BytesIO() 
-
-    # --- Bước 2: Tạo file ZIP trong bộ nhớ ---
-    zip_buffer = io.BytesIO()
-    # Mở file zip để ghi ('w'), sử dụng nén DEFLATED
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-
-        # --- Bước 3: Lặp qua từng nhân viên ---
-        for user_id, username in employees_in_month:
-            
-            # Tạo file CSV riêng cho nhân viên này trong bộ nhớ
-            output = io.StringIO()
-            writer = csv.writer(output)
-
-            # Viết header
-            header = ['Ngày', 'Check In', 'Check Out', 'Tổng Giờ Làm']
-            writer.writerow(header)
-
-            # Lấy dữ liệu chấm công CHỈ CỦA NHÂN VIÊN NÀY
-            attendances = Attendance.query.filter(
-                Attendance.user_id == user_id,
-                Attendance.date.between(month_start, month_end)
-            ).order_by(Attendance.date).all()
-
-            # Viết dữ liệu chấm công vào CSV
-            for attendance in attendances:
-                check_in_str = attendance.check_in.astimezone(vn_tz).strftime('%H:%M:%S') if attendance.check_in else ''
-                check_out_str = attendance.check_out.astimezone(vn_tz).strftime('%H:%M:%S') if attendance.check_out else ''
-                work_hours = ''
-                if attendance.check_in and attendance.check_out:
-                    duration = attendance.check_out - attendance.check_in
-                    work_hours = round(duration.total_seconds() / 3600, 2)
-
-                writer.writerow([
-                    attendance.date.strftime('%Y-%m-%d'),
-                    check_in_str,
-                    check_out_str,
-                    work_hours
-                ])
-            
-            # --- Bước 4: Thêm file CSV của nhân viên vào ZIP ---
-            # Tạo tên file CSV (loại bỏ ký tự không hợp lệ nếu cần)
-            safe_username = "".join(c if c.isalnum() else "_" for c in username)
-            csv_filename = f'ChamCong_{safe_username}_{month}-{year}.csv'
-            
-            # Ghi nội dung CSV (đã encode utf-8) vào file trong ZIP
-            zip_file.writestr(csv_filename, output.getvalue().encode('utf-8'))
-            
-            output.close() # Đóng StringIO
-
-    # --- Bước 5: Chuẩn bị file ZIP để gửi đi ---
-    zip_buffer.seek(0) # Đưa con trỏ về đầu file ZIP
-    return zip_buffer # Trả về đối tượng BytesIO chứa file ZIP
\ No newline at end of file
+    )
+    total_employees = 0
+    if progress:
+        total_employees = db.session.query(db.func.count(db.func.distinct(AttendanceDaily.user_id))).join(
+            User, User.id == AttendanceDaily.user_id
+        ).filter(*filters).scalar() or 0
+
+    rows = db.session.query(
+        AttendanceDaily.user_id, User.username, AttendanceDaily.date,
+        AttendanceDaily.first_check_in, AttendanceDaily.last_check_out,
+        AttendanceDaily.completed_punches, AttendanceDaily.worked_seconds
+    ).join(
+        User, User.id == AttendanceDaily.user_id
+    ).filter(*filters).order_by(
+        User.username, AttendanceDaily.date
+    ).execution_options(yield_per=batch_size)
+
+    writer = csv.writer(_EchoWriter())
+    header = ['Ngày', 'Check In', 'Check Out', 'Tổng Giờ Làm']
+    current_user_id, current_username, lines = None, None, []
+    done = 0
+
+    def finish_member():
+        # Tạo tên file CSV (loại bỏ ký tự không hợp lệ nếu cần)
+        safe_username = "".join(c if c.isalnum() else "_" for c in current_username)
+        csv_filename = f'ChamCong_{safe_username}_{month}-{year}.csv'
+        return csv_filename, ''.join(lines).encode('utf-8')
+
+    for user_id, username, day, first_check_in, last_check_out, completed_punches, worked_seconds in rows:
+        if user_id != current_user_id:
+            if current_user_id is not None:
+                yield finish_member()
+                done += 1
+                if progress and total_employees:
+                    progress(done / total_employees, f'Đã xuất dữ liệu của {current_username}')
+            current_user_id, current_username, lines = user_id, username, [writer.writerow(header)]
+
+        check_in_str = first_check_in.astimezone(vn_tz).strftime('%H:%M:%S') if first_check_in else ''
+        check_out_str = last_check_out.astimezone(vn_tz).strftime('%H:%M:%S') if last_check_out else ''
+        work_hours = ''
+        if completed_punches:
+            work_hours = round(worked_seconds / 3600, 2)
+        lines.append(writer.writerow([day.strftime('%Y-%m-%d'), check_in_str, check_out_str, work_hours]))
+
+    if current_user_id is not None:
+        yield finish_member()
+
+
+def iter_detailed_report(month: int, year: int, workers: int = 0,
+                         progress: Optional[Callable] = None) -> Iterator[bytes]:
+    """
+    Tạo báo cáo chấm công chi tiết cho TỪNG NHÂN VIÊN dưới dạng ZIP,
+    yield từng chunk đã nén ngay khi mỗi file CSV được tạo xong (không giữ cả file ZIP trong bộ nhớ).
+    workers > 1: nén các file CSV song song bằng thread pool.
+    """
+    return stream_zip(_detailed_report_members(month, year, progress), workers=workers)
+
+
+def generate_detailed_report(month: int, year: int, progress: Optional[Callable] = None) -> io.BytesIO:
+    """Giữ lại để tương thích: gom toàn bộ file ZIP vào BytesIO (chỉ nên dùng cho báo cáo nhỏ)."""
+    return io.BytesIO(b''.join(iter_detailed_report(month, year, progress=progress)))
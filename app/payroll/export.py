@@ -0,0 +1,131 @@
+# /app/payroll/export.py
+
+import os
+from calendar import monthrange
+from datetime import date
+from typing import Dict
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import with_appcontext
+from ..models import db, User, Attendance, Payroll, Bonus, Deduction
+
+
+# ============================================
+# === XUẤT DỮ LIỆU THÁNG DẠNG CỘT (NUMPY) ===
+# ============================================
+# Mỗi tháng được ghi MỘT lần thành các file .npy theo cột:
+#   {EXPORT_FOLDER}/{năm}-{tháng}/{bảng}.{cột}.npy   -> đọc memory-mapped bằng load_month_export()
+#   {EXPORT_FOLDER}/{năm}-{tháng}.npz               -> file gộp để tải về (np.load(...)['bảng.cột'])
+# Công cụ phân tích đọc trực tiếp các file này, không cần truy vấn CSDL đang chạy.
+
+def _export_folder() -> str:
+    folder = current_app.config.get('EXPORT_FOLDER') or os.path.join(current_app.instance_path, 'exports')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def month_export_paths(month: int, year: int):
+    """Trả về (thư mục chứa các file .npy, đường dẫn file .npz) của một tháng."""
+    name = f'{year}-{month:02d}'
+    folder = _export_folder()
+    return os.path.join(folder, name), os.path.join(folder, f'{name}.npz')
+
+
+def _int_column(values, missing: int = -1) -> np.ndarray:
+    return np.array([missing if v is None else v for v in values], dtype=np.int64)
+
+
+def _float_column(values) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def _str_column(values) -> np.ndarray:
+    return np.array(['' if v is None else v for v in values], dtype=np.str_)
+
+
+def _collect_month_columns(month: int, year: int) -> Dict[str, np.ndarray]:
+    """Đọc Attendance, Payroll, Bonus, Deduction của tháng thành các mảng numpy theo cột."""
+    _, num_days_in_month = monthrange(year, month)
+    month_start = date(year, month, 1)
+    month_end = date(year, month, num_days_in_month)
+    columns = {}
+
+    attendances = db.session.query(
+        Attendance.id, Attendance.user_id, Attendance.date, Attendance.check_in,
+        Attendance.check_out, Attendance.schedule_id
+    ).filter(Attendance.date.between(month_start, month_end)).order_by(Attendance.user_id, Attendance.date).all()
+    att_ids, att_users, att_dates, check_ins, check_outs, schedule_ids = zip(*attendances) if attendances else ([],) * 6
+    columns['attendance.id'] = _int_column(att_ids)
+    columns['attendance.user_id'] = _int_column(att_users)
+    columns['attendance.date'] = np.array(att_dates, dtype='datetime64[D]')
+    # Giờ Việt Nam, không kèm múi giờ (đúng như giá trị lưu trong CSDL); NaT nếu chưa check-out
+    columns['attendance.check_in'] = np.array([v and v.replace(tzinfo=None) for v in check_ins], dtype='datetime64[s]')
+    columns['attendance.check_out'] = np.array([v and v.replace(tzinfo=None) for v in check_outs], dtype='datetime64[s]')
+    columns['attendance.schedule_id'] = _int_column(schedule_ids)
+
+    payrolls = db.session.query(
+        Payroll.user_id, Payroll.gross_salary, Payroll.total_bonus, Payroll.total_deduction, Payroll.net_salary
+    ).filter_by(month=month, year=year).order_by(Payroll.user_id).all()
+    pay_users, gross, bonus_totals, deduction_totals, net = zip(*payrolls) if payrolls else ([],) * 5
+    columns['payroll.user_id'] = _int_column(pay_users)
+    columns['payroll.gross_salary'] = _float_column(gross)
+    columns['payroll.total_bonus'] = _float_column(bonus_totals)
+    columns['payroll.total_deduction'] = _float_column(deduction_totals)
+    columns['payroll.net_salary'] = _float_column(net)
+
+    for model, table in ((Bonus, 'bonus'), (Deduction, 'deduction')):
+        rows = db.session.query(model.id, model.user_id, model.amount, model.reason).filter_by(
+            month=month, year=year).order_by(model.user_id, model.id).all()
+        ids, users, amounts, reasons = zip(*rows) if rows else ([],) * 4
+        columns[f'{table}.id'] = _int_column(ids)
+        columns[f'{table}.user_id'] = _int_column(users)
+        columns[f'{table}.amount'] = _float_column(amounts)
+        columns[f'{table}.reason'] = _str_column(reasons)
+
+    # Bảng tra cứu tên nhân viên cho các user_id xuất hiện ở trên
+    user_ids = set(columns['attendance.user_id'].tolist()) | set(columns['payroll.user_id'].tolist())
+    users = db.session.query(User.id, User.username).filter(User.id.in_(user_ids)).order_by(User.id).all() if user_ids else []
+    ids, usernames = zip(*users) if users else ([],) * 2
+    columns['user.id'] = _int_column(ids)
+    columns['user.username'] = _str_column(usernames)
+    return columns
+
+
+def export_month(month: int, year: int) -> str:
+    """Ghi (hoặc ghi đè) bản xuất dạng cột của tháng. Trả về đường dẫn file .npz."""
+    folder, bundle_path = month_export_paths(month, year)
+    os.makedirs(folder, exist_ok=True)
+    columns = _collect_month_columns(month, year)
+
+    for key, array in columns.items():
+        tmp_path = os.path.join(folder, f'.{key}.tmp.npy')
+        np.save(tmp_path, array)
+        os.replace(tmp_path, os.path.join(folder, f'{key}.npy'))
+
+    tmp_bundle = bundle_path + '.tmp.npz'
+    np.savez(tmp_bundle, **columns)
+    os.replace(tmp_bundle, bundle_path)
+    return bundle_path
+
+
+def load_month_export(month: int, year: int) -> Dict[str, np.ndarray]:
+    """Đọc bản xuất của tháng ở chế độ memory-mapped: {'bảng.cột': mảng numpy chỉ đọc}."""
+    folder, _ = month_export_paths(month, year)
+    if not os.path.isdir(folder):
+        raise FileNotFoundError(f'Chưa có bản xuất dữ liệu cho tháng {month}/{year}.')
+    return {
+        filename[:-len('.npy')]: np.load(os.path.join(folder, filename), mmap_mode='r')
+        for filename in sorted(os.listdir(folder))
+        if filename.endswith('.npy') and not filename.startswith('.')
+    }
+
+
+@click.command('export-month')
+@click.option('--month', type=int, required=True)
+@click.option('--year', type=int, required=True)
+@with_appcontext
+def export_month_command(month, year):
+    """Xuất dữ liệu chấm công/lương của tháng dạng cột: flask payroll export-month --month 10 --year 2025"""
+    path = export_month(month, year)
+    click.echo(f'Đã xuất dữ liệu tháng {month}/{year}: {path}')
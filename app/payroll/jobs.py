@@ -0,0 +1,27 @@
+# /app/payroll/jobs.py
+# Các công việc chạy nền của module lương (được gọi bởi job_runner)
+
+from flask import current_app
+from .calculator import calculate_and_store_salaries, iter_detailed_report
+from .export import export_month
+from ..database import refresh_read_snapshot
+from ..models import db
+from ..jobs.runner import JobArtifact
+
+
+def payroll_job(progress, month: int, year: int):
+    """Tính và lưu bảng lương của tháng, sau đó ghi lại bản xuất dạng cột cho phân tích."""
+    calculate_and_store_salaries(month, year, progress=progress)
+    progress(0.9, 'Đang ghi bản xuất dữ liệu dạng cột...')
+    export_month(month, year)
+    # Báo cáo lương đọc từ bản sao chỉ đọc (nếu có cấu hình): chụp lại để báo cáo thấy bảng lương vừa tính
+    refresh_read_snapshot(current_app, db.engine)
+
+
+def detailed_report_job(progress, month: int, year: int) -> JobArtifact:
+    """Tạo file ZIP báo cáo chấm công chi tiết (ghi dần từng chunk ra file kết quả)."""
+    # Báo cáo đọc từ bản sao chỉ đọc (nếu có cấu hình): chụp lại để có cả chấm công mới nhất của tháng
+    refresh_read_snapshot(current_app, db.engine)
+    chunks = iter_detailed_report(month, year, workers=current_app.config.get('REPORT_ZIP_WORKERS', 0),
+                                  progress=progress)
+    return JobArtifact(chunks, f'BaoCaoChamCongChiTiet_{month}-{year}.zip', 'application/zip')
@@ -1,7 +1,9 @@
 # /app/payroll/routes.py
 
+import os
 from flask import (Blueprint, render_template, request, redirect, url_for, 
-                   session, flash, send_file)
+                   session, flash, jsonify, Response, stream_with_context, current_app,
+                   send_file, abort)
 from datetime import datetime, timedelta
 import pytz
 from functools import wraps
@@ -9,10 +11,29 @@ from functools import wraps
 # Import các thành phần cần thiết
 from ..models import db, User, SalarySettings, Bonus, Payroll 
 from ..decorators import admin_required 
-from ..payroll.calculator import calculate_and_store_salaries, generate_salary_report, generate_detailed_report
+from ..payroll.calculator import generate_salary_report, iter_detailed_report
+from ..payroll.jobs import payroll_job, detailed_report_job
+from ..payroll.export import export_month, month_export_paths, export_month_command
+from .. import job_runner
 
 # KHỞI TẠO BLUEPRINT
 payroll_bp = Blueprint('payroll', __name__, url_prefix='/payroll')
+payroll_bp.cli.add_command(export_month_command)
+
+
+def _job_response(job_id, month, year, message):
+    """
+    Trả về job id ngay sau khi đưa việc vào hàng đợi:
+    JSON (202) nếu client gọi bằng API, ngược lại quay về trang lương để theo dõi tiến độ.
+    """
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({
+            'job_id': job_id,
+            'status_url': url_for('jobs.job_status', job_id=job_id),
+            'download_url': url_for('jobs.job_download', job_id=job_id)
+        }), 202
+    flash(message, 'info')
+    return redirect(url_for('payroll.salary_page', month=month, year=year, job_id=job_id))
 
 
 # CÁC ROUTE XỬ LÝ LƯƠNG
@@ -55,14 +76,9 @@ def salary_page():
         db.session.commit()
         flash('Đã cập nhật thưởng thành công!', 'success')
         
-        # Chạy hàm tính lương
-        try:
-            calculate_and_store_salaries(month, year)
-            flash('Đã tính và lưu lại bảng lương!', 'info')
-        except Exception as e:
-            flash(f'Có lỗi xảy ra khi tính lương: {e}', 'danger')
-
-        return redirect(url_for('payroll.salary_page', month=month, year=year))
+        # Đưa việc tính lương vào hàng đợi chạy nền, không chặn request
+        job_id = job_runner.submit('payroll', payroll_job, {'month': month, 'year': year}, session.get('user_id'))
+        return _job_response(job_id, month, year, 'Đang tính lương ở chế độ nền, bảng lương sẽ tự cập nhật khi hoàn tất.')
 
     # === LOGIC MỚI ĐỂ HIỂN THỊ DANH SÁCH NHÂN VIÊN ===
     # 1. Lấy tất cả nhân viên
@@ -91,7 +107,8 @@ def salary_page():
                            settings=settings, 
                            month_str=month_str, 
                            current_month=month, 
-                           current_year=year)
+                           current_year=year,
+                           job_id=request.args.get('job_id'))
 
 @payroll_bp.route('/report/summary')
 @admin_required
@@ -101,30 +118,52 @@ def salary_report_summary():
     year = int(request.args.get('year', datetime.now(vn_tz).year))
     month = int(request.args.get('month', datetime.now(vn_tz).month))
 
-    csv_output = generate_salary_report(month, year)
-    
     download_name = f'Bao_cao_luong_tom_tat_{month}-{year}.csv'
-    return send_file(csv_output, mimetype='text/csv', as_attachment=True, download_name=download_name)
+
+    # Stream từng dòng CSV cho client ngay khi đọc được từ CSDL
+    return Response(
+        stream_with_context(generate_salary_report(month, year)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={download_name}'}
+    )
 
 
 @payroll_bp.route('/report/detailed')
 @admin_required
 def salary_report_detailed():
-    """Tải về báo cáo chấm công chi tiết (file ZIP).""" # 
+    """
+    Tạo báo cáo chấm công chi tiết (file ZIP) ở chế độ nền, tải về khi hoàn tất.
+    ?stream=1: nén và gửi thẳng từng chunk ZIP cho client thay vì tạo job.
+    """
     vn_tz = pytz.timezone('Asia/Ho_Chi_Minh')
     year = int(request.args.get('year', datetime.now(vn_tz).year))
     month = int(request.args.get('month', datetime.now(vn_tz).month))
 
-    # Hàm này giờ trả về file ZIP dưới dạng BytesIO
-    zip_output_buffer = generate_detailed_report(month, year) 
-    
-    # Tạo tên file ZIP
-    download_name = f'BaoCaoChamCongChiTiet_{month}-{year}.zip' # <-- Đuôi .zip
-    
-    # Gửi file ZIP đi
-    return send_file(
-        zip_output_buffer, 
-        mimetype='application/zip', # <-- Sửa mimetype thành zip
-        as_attachment=True, 
-        download_name=download_name
-    )
\ No newline at end of file
+    if request.args.get('stream', type=int):
+        download_name = f'BaoCaoChamCongChiTiet_{month}-{year}.zip'
+        chunks = iter_detailed_report(month, year, workers=current_app.config.get('REPORT_ZIP_WORKERS', 0))
+        return Response(
+            stream_with_context(chunks),
+            mimetype='application/zip',
+            headers={'Content-Disposition': f'attachment; filename={download_name}'}
+        )
+
+    job_id = job_runner.submit('detailed_report', detailed_report_job, {'month': month, 'year': year}, session.get('user_id'))
+    return _job_response(job_id, month, year, 'Đang tạo báo cáo chi tiết, file sẽ được tải về khi hoàn tất.')
+
+
+@payroll_bp.route('/export/<int:year>/<int:month>')
+@admin_required
+def monthly_export(year, month):
+    """
+    Tải về dữ liệu chấm công/lương của tháng dạng cột (numpy .npz) cho phân tích.
+    File được ghi một lần khi tính lương tháng; chỉ tạo ở đây nếu chưa có.
+    """
+    # Tháng / năm ngoài khoảng hợp lệ: 404 thay vì để date(...) trong export_month báo lỗi 500
+    if not 1 <= month <= 12 or not 2000 <= year <= 2100:
+        abort(404)
+    _, bundle_path = month_export_paths(month, year)
+    if not os.path.exists(bundle_path):
+        export_month(month, year)
+    return send_file(bundle_path, mimetype='application/octet-stream', as_attachment=True,
+                     download_name=f'DuLieuPhanTich_{year}-{month:02d}.npz')
\ No newline at end of file
@@ -0,0 +1,90 @@
+# /app/payroll/zipstream.py
+
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Tuple
+
+# Cấu trúc bản ghi ZIP (PKWARE APPNOTE), chỉ hỗ trợ DEFLATE, không ZIP64
+_LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+_CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+_END_RECORD = struct.Struct('<IHHHHIIH')
+_UTF8_FLAG = 0x0800
+_DEFLATED = 8
+_VERSION = 20
+
+
+def _compress(data: bytes) -> Tuple[bytes, int, int]:
+    """Nén raw DEFLATE một file, trả về (dữ liệu nén, crc32, kích thước gốc). zlib nhả GIL nên chạy song song được."""
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(), zlib.crc32(data), len(data)
+
+
+class ZipStreamWriter:
+    """
+    Ghi file ZIP tuần tự thành từng chunk bytes mà không cần seek,
+    nên có thể gửi thẳng cho client hoặc ghi ra file ngay khi từng file con nén xong.
+    """
+
+    def __init__(self):
+        self._offset = 0
+        self._entries = []
+        now = time.localtime()
+        self._dos_time = (now.tm_hour << 11) | (now.tm_min << 5) | (now.tm_sec // 2)
+        self._dos_date = ((now.tm_year - 1980) << 9) | (now.tm_mon << 5) | now.tm_mday
+
+    def add(self, name: str, compressed: bytes, crc: int, size: int) -> bytes:
+        """Trả về local header + dữ liệu nén của một file con."""
+        encoded_name = name.encode('utf-8')
+        header = _LOCAL_HEADER.pack(0x04034b50, _VERSION, _UTF8_FLAG, _DEFLATED, self._dos_time, self._dos_date,
+                                    crc, len(compressed), size, len(encoded_name), 0)
+        self._entries.append((encoded_name, crc, len(compressed), size, self._offset))
+        chunk = header + encoded_name + compressed
+        self._offset += len(chunk)
+        return chunk
+
+    def close(self) -> bytes:
+        """Trả về central directory + end record (phần cuối của file ZIP)."""
+        central = []
+        for encoded_name, crc, compressed_size, size, offset in self._entries:
+            central.append(_CENTRAL_HEADER.pack(0x02014b50, _VERSION, _VERSION, _UTF8_FLAG, _DEFLATED,
+                                                self._dos_time, self._dos_date, crc, compressed_size, size,
+                                                len(encoded_name), 0, 0, 0, 0, 0o600 << 16, offset))
+            central.append(encoded_name)
+        directory = b''.join(central)
+        end = _END_RECORD.pack(0x06054b50, 0, 0, len(self._entries), len(self._entries),
+                               len(directory), self._offset, 0)
+        return directory + end
+
+
+def stream_zip(members: Iterable[Tuple[str, bytes]], workers: int = 0) -> Iterator[bytes]:
+    """
+    Nén các file con (tên, nội dung) thành ZIP và yield từng chunk theo đúng thứ tự.
+    workers > 1: nén song song bằng thread pool, chỉ giữ tối đa 2*workers file đang chờ trong bộ nhớ.
+    Không có file con nào -> không yield gì (giống báo cáo rỗng trước đây).
+    """
+    writer = ZipStreamWriter()
+    has_entries = False
+
+    if workers and workers > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='zip') as executor:
+            pending = deque()
+            for name, data in members:
+                pending.append((name, executor.submit(_compress, data)))
+                if len(pending) >= workers * 2:
+                    pending_name, future = pending.popleft()
+                    has_entries = True
+                    yield writer.add(pending_name, *future.result())
+            while pending:
+                pending_name, future = pending.popleft()
+                has_entries = True
+                yield writer.add(pending_name, *future.result())
+    else:
+        for name, data in members:
+            has_entries = True
+            yield writer.add(name, *_compress(data))
+
+    if has_entries:
+        yield writer.close()
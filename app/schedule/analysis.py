@@ -0,0 +1,204 @@
+# /app/schedule/analysis.py
+# Phân tích lịch làm việc trong một khoảng ngày:
+#   - độ phủ: số người xếp / số người thực có mặt (trừ người nghỉ phép đã duyệt) cho từng (ngày, ca)
+#     so với Shift.required_staff -> danh sách ca thiếu người
+#   - xung đột nghỉ phép: lịch rơi vào khoảng nghỉ phép đã duyệt
+#   - ca chồng giờ: ca qua đêm của hôm trước đè lên ca hôm sau của cùng nhân viên
+# Dùng quét khoảng (sweep) trên danh sách đã sắp xếp theo (nhân viên, thời gian) thay vì vòng lặp lồng nhau.
+# Kết quả được cache theo khoảng ngày trong từng tiến trình, xóa khi lịch / ca / đơn từ thay đổi
+# (invalidate_analysis, chỉ ở worker hiện tại; worker khác trễ tối đa SCHEDULE_ANALYSIS_TTL giây).
+
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+from cachetools import TTLCache
+from flask import current_app
+from ..models import db, User, Shift, Schedule, LeaveRequest
+
+# Khoảng ngày tối đa cho một lần phân tích
+ANALYSIS_MAX_DAYS = 93
+
+_results = None
+_generation = 0  # Tăng mỗi lần invalidate: kết quả tính xong sau khi dữ liệu đổi sẽ không được lưu vào cache
+_lock = threading.Lock()
+
+
+def _cache() -> TTLCache:
+    global _results
+    if _results is None:
+        with _lock:
+            if _results is None:
+                _results = TTLCache(maxsize=64, ttl=current_app.config.get('SCHEDULE_ANALYSIS_TTL', 30))
+    return _results
+
+
+def invalidate_analysis():
+    """
+    Gọi sau khi lịch, ca làm việc hoặc đơn nghỉ phép thay đổi (mọi khoảng ngày đã cache đều có thể bị ảnh hưởng).
+    Chỉ xóa cache của tiến trình hiện tại.
+    """
+    global _generation
+    with _lock:
+        _generation += 1
+        if _results is not None:
+            _results.clear()
+
+
+# ============================================
+# ===          ĐỌC DỮ LIỆU (3 TRUY VẤN)     ===
+# ============================================
+
+def _load_shifts():
+    return db.session.query(Shift.id, Shift.name, Shift.start_time, Shift.end_time,
+                            Shift.required_staff).order_by(Shift.start_time).all()
+
+
+def _load_schedules(start_date: date, end_date: date):
+    """(user_id, date, shift_id, username) sắp theo (nhân viên, ngày); lấy thêm hôm trước để bắt ca qua đêm."""
+    return db.session.query(
+        Schedule.user_id, Schedule.date, Schedule.shift_id, User.username
+    ).join(User, User.id == Schedule.user_id).filter(
+        Schedule.date.between(start_date - timedelta(days=1), end_date)
+    ).order_by(Schedule.user_id, Schedule.date).all()
+
+
+def _load_leaves(start_date: date, end_date: date):
+    """Các đơn nghỉ phép ĐÃ DUYỆT giao với khoảng ngày: (id, user_id, start_date, end_date) sắp theo (nhân viên, ngày bắt đầu)."""
+    return db.session.query(
+        LeaveRequest.id, LeaveRequest.user_id, LeaveRequest.start_date, LeaveRequest.end_date
+    ).filter(
+        LeaveRequest.request_type == 'leave',
+        LeaveRequest.status == 'approved',
+        LeaveRequest.start_date <= end_date,
+        db.func.coalesce(LeaveRequest.end_date, LeaveRequest.start_date) >= start_date
+    ).order_by(LeaveRequest.user_id, LeaveRequest.start_date).all()
+
+
+# ============================================
+# ===              QUÉT KHOẢNG              ===
+# ============================================
+
+def _leave_conflicts(schedules, leaves) -> List[dict]:
+    """
+    Hai con trỏ trên hai danh sách đã sắp theo (user_id, ngày): mỗi lịch chỉ so với các đơn nghỉ
+    của cùng nhân viên còn chưa kết thúc, O(lịch + đơn) thay vì O(lịch × đơn).
+    """
+    conflicts = []
+    i = 0
+    active = []  # Các đơn nghỉ của nhân viên hiện tại đã bắt đầu và chưa kết thúc
+    current_user = None
+    for user_id, day, shift_id, username in schedules:
+        if user_id != current_user:
+            current_user, active = user_id, []
+            while i < len(leaves) and leaves[i].user_id < user_id:
+                i += 1
+        # Nạp các đơn của nhân viên này đã bắt đầu tới ngày `day`
+        while i < len(leaves) and leaves[i].user_id == user_id and leaves[i].start_date <= day:
+            active.append(leaves[i])
+            i += 1
+        # Bỏ các đơn đã kết thúc trước ngày `day` (lịch được duyệt theo ngày tăng dần)
+        active = [leave for leave in active if (leave.end_date or leave.start_date) >= day]
+        if active:
+            conflicts.append({'user_id': user_id, 'username': username, 'date': day.isoformat(),
+                              'shift_id': shift_id, 'leave_request_id': active[0].id})
+    return conflicts
+
+
+def _shift_interval(day: date, shift) -> tuple:
+    """[bắt đầu, kết thúc) của ca trong ngày; ca có giờ kết thúc <= giờ bắt đầu là ca qua đêm."""
+    start = datetime.combine(day, shift.start_time)
+    end = datetime.combine(day, shift.end_time)
+    if end <= start:
+        end += timedelta(days=1)
+    return start, end
+
+
+def _overlaps(schedules, shifts_by_id) -> List[dict]:
+    """Quét các khoảng thời gian ca của từng nhân viên theo thứ tự bắt đầu, báo các cặp liền kề bị chồng giờ."""
+    overlaps = []
+    previous = None  # (user_id, day, shift_id, end)
+    for user_id, day, shift_id, username in schedules:
+        shift = shifts_by_id.get(shift_id)
+        if shift is None:
+            continue
+        start, end = _shift_interval(day, shift)
+        if previous and previous[0] == user_id and start < previous[3]:
+            overlaps.append({'user_id': user_id, 'username': username,
+                             'first': {'date': previous[1].isoformat(), 'shift_id': previous[2]},
+                             'second': {'date': day.isoformat(), 'shift_id': shift_id}})
+        if previous is None or previous[0] != user_id or end > previous[3]:
+            previous = (user_id, day, shift_id, end)
+    return overlaps
+
+
+def _coverage(start_date: date, end_date: date, shifts, schedules, leave_days) -> List[dict]:
+    """Số người xếp và số người có mặt (không nghỉ phép) cho mọi (ngày, ca) trong khoảng."""
+    scheduled: Dict[tuple, int] = {}
+    available: Dict[tuple, int] = {}
+    for user_id, day, shift_id, _ in schedules:
+        if day < start_date:
+            continue
+        key = (day, shift_id)
+        scheduled[key] = scheduled.get(key, 0) + 1
+        if (user_id, day) not in leave_days:
+            available[key] = available.get(key, 0) + 1
+
+    rows = []
+    for offset in range((end_date - start_date).days + 1):
+        day = start_date + timedelta(days=offset)
+        for shift in shifts:
+            key = (day, shift.id)
+            required = shift.required_staff or 0
+            rows.append({'date': day.isoformat(), 'shift_id': shift.id, 'shift_name': shift.name,
+                         'required': required, 'scheduled': scheduled.get(key, 0),
+                         'available': available.get(key, 0),
+                         'short': max(0, required - available.get(key, 0))})
+    return rows
+
+
+# ============================================
+# ===               PHÂN TÍCH               ===
+# ============================================
+
+def _analyze(start_date: date, end_date: date) -> dict:
+    shifts = _load_shifts()
+    schedules = _load_schedules(start_date, end_date)
+    leaves = _load_leaves(start_date, end_date)
+
+    in_range = [row for row in schedules if row.date >= start_date]
+    conflicts = _leave_conflicts(in_range, leaves)
+    leave_days = {(c['user_id'], date.fromisoformat(c['date'])) for c in conflicts}
+    coverage = _coverage(start_date, end_date, shifts, schedules, leave_days)
+
+    return {
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'coverage': coverage,
+        'understaffed': [row for row in coverage if row['short'] > 0],
+        'leave_conflicts': conflicts,
+        'overlaps': _overlaps(schedules, {shift.id: shift for shift in shifts}),
+        'computed_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z'
+    }
+
+
+def analyze_schedule(start_date: date, end_date: date) -> dict:
+    """
+    Độ phủ, ca thiếu người, xung đột nghỉ phép và ca chồng giờ trong [start_date, end_date].
+    Kết quả được cache theo khoảng ngày cho tới khi invalidate_analysis() (hoặc hết SCHEDULE_ANALYSIS_TTL giây).
+    """
+    if end_date < start_date:
+        raise ValueError('Ngày kết thúc phải sau ngày bắt đầu.')
+    if (end_date - start_date).days + 1 > ANALYSIS_MAX_DAYS:
+        raise ValueError(f'Chỉ phân tích tối đa {ANALYSIS_MAX_DAYS} ngày mỗi lần.')
+
+    cache = _cache()
+    key = (start_date, end_date)
+    with _lock:
+        result = cache.get(key)
+        generation = _generation
+    if result is None:
+        result = _analyze(start_date, end_date)
+        with _lock:
+            if generation == _generation:
+                cache[key] = result
+    return result
@@ -0,0 +1,176 @@
+# /app/schedule/bulk.py
+# Xếp lịch hàng loạt: dựng tập phân công mong muốn {(user_id, ngày): shift_id hoặc None = bỏ lịch}
+# từ danh sách phân công hoặc mẫu tuần lặp lại, so với các dòng Schedule hiện có,
+# rồi ghi phần khác biệt bằng vài câu lệnh hàng loạt trong MỘT transaction.
+
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from ..models import db, User, Shift, Schedule
+
+# Số ô (nhân viên × ngày) tối đa cho một lần xếp lịch hàng loạt
+BULK_SCHEDULE_LIMIT = 100000
+# Khoảng ngày tối đa khi trải mẫu tuần
+TEMPLATE_MAX_DAYS = 366
+# Số phần tử tối đa trong một mệnh đề IN (giới hạn tham số của SQLite)
+_CHUNK = 500
+
+Assignments = Dict[Tuple[int, date], Optional[int]]
+
+
+class ScheduleDiff:
+    """Khác biệt giữa lịch mong muốn và CSDL: các dòng cần thêm, đổi ca, xóa và số ô giữ nguyên."""
+
+    def __init__(self):
+        self.inserts: List[dict] = []   # {'user_id', 'shift_id', 'date'}
+        self.updates: List[dict] = []   # {'id', 'shift_id', 'old_shift_id', 'user_id', 'date'}
+        self.deletes: List[dict] = []   # {'id', 'old_shift_id', 'user_id', 'date'}
+        self.unchanged = 0
+
+    def summary(self) -> dict:
+        return {'inserted': len(self.inserts), 'updated': len(self.updates),
+                'deleted': len(self.deletes), 'unchanged': self.unchanged}
+
+    def changes(self, limit: Optional[int] = None) -> List[dict]:
+        """Danh sách thay đổi dạng JSON (để xem trước), tối đa `limit` dòng."""
+        rows = ([{'action': 'insert', 'user_id': r['user_id'], 'date': r['date'].isoformat(),
+                  'shift_id': r['shift_id']} for r in self.inserts] +
+                [{'action': 'update', 'user_id': r['user_id'], 'date': r['date'].isoformat(),
+                  'shift_id': r['shift_id'], 'old_shift_id': r['old_shift_id']} for r in self.updates] +
+                [{'action': 'delete', 'user_id': r['user_id'], 'date': r['date'].isoformat(),
+                  'old_shift_id': r['old_shift_id']} for r in self.deletes])
+        return rows if limit is None else rows[:limit]
+
+
+# ============================================
+# ===     DỰNG TẬP PHÂN CÔNG MONG MUỐN      ===
+# ============================================
+
+def _parse_date(value) -> date:
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value or '', '%Y-%m-%d').date()
+
+
+def _parse_shift(value) -> Optional[int]:
+    return int(value) if value not in (None, '', 0, '0') else None
+
+
+def parse_assignments(items: Iterable[dict]) -> Assignments:
+    """[{'user_id', 'date', 'shift_id'}] -> {(user_id, ngày): shift_id}; shift_id rỗng = bỏ lịch ngày đó."""
+    desired = {}
+    for item in items:
+        desired[(int(item['user_id']), _parse_date(item['date']))] = _parse_shift(item.get('shift_id'))
+    return desired
+
+
+def expand_weekly_template(start_date: date, end_date: date, entries: Iterable[dict],
+                           replace: bool = False) -> Assignments:
+    """
+    Trải mẫu tuần lên khoảng [start_date, end_date].
+    entries: [{'user_id': 5, 'days': {'0': 1, '2': 2, '5': null}}] với khóa là thứ trong tuần (0 = thứ Hai),
+    hoặc {'user_id': 5, 'weeks': [{...tuần 1...}, {...tuần 2...}]} để xoay vòng nhiều tuần kể từ tuần của start_date.
+    Ngày không có trong mẫu: giữ nguyên lịch cũ, hoặc bỏ lịch nếu replace=True.
+    Giới hạn được kiểm tra TRƯỚC khi trải mẫu (mỗi mẫu sinh tối đa num_days ô).
+    """
+    if end_date < start_date:
+        raise ValueError('Ngày kết thúc phải sau ngày bắt đầu.')
+    num_days = (end_date - start_date).days + 1
+    if num_days > TEMPLATE_MAX_DAYS:
+        raise ValueError(f'Chỉ trải mẫu tuần tối đa {TEMPLATE_MAX_DAYS} ngày mỗi lần.')
+    entries = list(entries)
+    if num_days * len(entries) > BULK_SCHEDULE_LIMIT:
+        raise ValueError(f'Tối đa {BULK_SCHEDULE_LIMIT} ô lịch mỗi lần '
+                         f'(yêu cầu có tới {num_days * len(entries)}: {len(entries)} mẫu × {num_days} ngày).')
+    first_monday = start_date - timedelta(days=start_date.weekday())
+
+    desired = {}
+    for entry in entries:
+        user_id = int(entry['user_id'])
+        weeks = entry.get('weeks') or [entry.get('days') or {}]
+        weeks = [{int(weekday): _parse_shift(shift_id) for weekday, shift_id in week.items()} for week in weeks]
+        for offset in range(num_days):
+            day = start_date + timedelta(days=offset)
+            week = weeks[((day - first_monday).days // 7) % len(weeks)]
+            if day.weekday() in week:
+                desired[(user_id, day)] = week[day.weekday()]
+            elif replace:
+                desired[(user_id, day)] = None
+    return desired
+
+
+def validate_assignments(desired: Assignments):
+    """Kiểm tra giới hạn số ô, nhân viên và ca tồn tại (mỗi loại MỘT truy vấn). Ném ValueError nếu sai."""
+    if len(desired) > BULK_SCHEDULE_LIMIT:
+        raise ValueError(f'Tối đa {BULK_SCHEDULE_LIMIT} ô lịch mỗi lần (yêu cầu có {len(desired)}).')
+
+    user_ids = {user_id for user_id, _ in desired}
+    known_users = set()
+    for chunk in _chunks(sorted(user_ids)):
+        known_users.update(db.session.scalars(db.select(User.id).where(User.id.in_(chunk))))
+    missing_users = user_ids - known_users
+    if missing_users:
+        raise ValueError(f'Không tìm thấy nhân viên: {sorted(missing_users)[:20]}')
+
+    shift_ids = {shift_id for shift_id in desired.values() if shift_id is not None}
+    known_shifts = set(db.session.scalars(db.select(Shift.id))) if shift_ids else set()
+    missing_shifts = shift_ids - known_shifts
+    if missing_shifts:
+        raise ValueError(f'Không tìm thấy ca làm việc: {sorted(missing_shifts)}')
+
+
+# ============================================
+# ===          SO SÁNH VÀ GHI LỊCH          ===
+# ============================================
+
+def _chunks(values: List, size: int = _CHUNK):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def load_existing(user_ids: Iterable[int], start_date: date, end_date: date) -> Dict[Tuple[int, date], Tuple[int, int]]:
+    """{(user_id, ngày): (schedule_id, shift_id)} của các nhân viên trong khoảng ngày (chỉ đọc các cột cần thiết)."""
+    existing = {}
+    for chunk in _chunks(sorted(set(user_ids))):
+        rows = db.session.query(Schedule.id, Schedule.user_id, Schedule.date, Schedule.shift_id).filter(
+            Schedule.user_id.in_(chunk),
+            Schedule.date.between(start_date, end_date)
+        )
+        for schedule_id, user_id, day, shift_id in rows:
+            existing[(user_id, day)] = (schedule_id, shift_id)
+    return existing
+
+
+def diff_schedules(desired: Assignments) -> ScheduleDiff:
+    """So tập phân công mong muốn với các dòng Schedule hiện có (đọc bằng một truy vấn theo khoảng ngày)."""
+    diff = ScheduleDiff()
+    if not desired:
+        return diff
+    days = [day for _, day in desired]
+    existing = load_existing((user_id for user_id, _ in desired), min(days), max(days))
+
+    for (user_id, day), shift_id in sorted(desired.items()):
+        current = existing.get((user_id, day))
+        if current is None:
+            if shift_id is not None:
+                diff.inserts.append({'user_id': user_id, 'shift_id': shift_id, 'date': day})
+            else:
+                diff.unchanged += 1
+        elif shift_id is None:
+            diff.deletes.append({'id': current[0], 'old_shift_id': current[1], 'user_id': user_id, 'date': day})
+        elif shift_id != current[1]:
+            diff.updates.append({'id': current[0], 'shift_id': shift_id, 'old_shift_id': current[1],
+                                 'user_id': user_id, 'date': day})
+        else:
+            diff.unchanged += 1
+    return diff
+
+
+def apply_schedule_diff(diff: ScheduleDiff):
+    """Ghi khác biệt bằng insert / update executemany và DELETE ... IN (KHÔNG commit)."""
+    if diff.inserts:
+        db.session.execute(db.insert(Schedule), diff.inserts)
+    if diff.updates:
+        db.session.execute(db.update(Schedule), [{'id': r['id'], 'shift_id': r['shift_id']} for r in diff.updates])
+    for chunk in _chunks([r['id'] for r in diff.deletes]):
+        db.session.execute(db.delete(Schedule).where(Schedule.id.in_(chunk)),
+                           execution_options={'synchronize_session': False})
@@ -0,0 +1,364 @@
+# /app/schedule/generator.py
+# Tự động xếp lịch cho một khoảng ngày:
+#   1. Tham lam theo từng (ngày, ca): chọn những nhân viên rảnh có "độ tải" thấp nhất cho tới khi đủ Shift.required_staff.
+#      Rảnh = trong thời hạn hợp đồng, không nghỉ phép đã duyệt, chưa có ca trong ngày, chưa vượt giới hạn ca / tuần
+#      và số ngày làm liên tiếp, đủ thời gian nghỉ sau ca hôm trước. Điều kiện được tính trên mảng NumPy cho cả nhân viên.
+#   2. Tìm kiếm cục bộ: chuyển ca từ người nhiều ca nhất sang người ít ca nhất (cùng loại hợp đồng) để cân bằng.
+# Kết quả là tập phân công mong muốn, so với lịch hiện có bằng bulk.diff_schedules (xem trước / dry-run) trước khi ghi.
+
+import time as _time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+import click
+import numpy as np
+from flask.cli import AppGroup
+from ..models import db, User, Contract, Shift, Schedule, LeaveRequest
+from .bulk import diff_schedules, apply_schedule_diff, ScheduleDiff
+from .analysis import invalidate_analysis
+
+# Khoảng ngày tối đa cho một lần xếp lịch tự động
+GENERATOR_MAX_DAYS = 62
+
+
+class GeneratorOptions:
+    """
+    Giới hạn công bằng cho bộ xếp lịch:
+      - max_per_week: số ca tối đa mỗi tuần theo loại hợp đồng ('month' = toàn thời gian, 'hour' = theo giờ)
+      - target_per_week: số ca mong muốn mỗi tuần (dùng để tính độ tải: người còn xa mục tiêu được ưu tiên)
+      - max_consecutive_days: số ngày làm liên tiếp tối đa
+      - min_rest_hours: số giờ nghỉ tối thiểu giữa hai ca liên tiếp
+      - keep_existing: giữ nguyên các lịch đã có, chỉ xếp thêm cho đủ người (False = xếp lại toàn bộ khoảng ngày)
+      - local_search_rounds: số lượt chuyển ca để cân bằng (0 = chỉ dùng kết quả tham lam)
+    """
+
+    def __init__(self, max_per_week: Optional[Dict[str, int]] = None, target_per_week: Optional[Dict[str, int]] = None,
+                 max_consecutive_days: int = 6, min_rest_hours: float = 11, keep_existing: bool = True,
+                 local_search_rounds: int = 2000, seed: int = 0):
+        self.max_per_week = {'month': 6, 'hour': 4, **(max_per_week or {})}
+        self.target_per_week = {'month': 5, 'hour': 3, **(target_per_week or {})}
+        self.max_consecutive_days = max_consecutive_days
+        self.min_rest_hours = min_rest_hours
+        self.keep_existing = keep_existing
+        self.local_search_rounds = local_search_rounds
+        self.seed = seed
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'GeneratorOptions':
+        return cls(
+            max_per_week={k: int(v) for k, v in (data.get('max_per_week') or {}).items()},
+            target_per_week={k: int(v) for k, v in (data.get('target_per_week') or {}).items()},
+            max_consecutive_days=int(data.get('max_consecutive_days', 6)),
+            min_rest_hours=float(data.get('min_rest_hours', 11)),
+            keep_existing=bool(data.get('keep_existing', True)),
+            local_search_rounds=int(data.get('local_search_rounds', 2000)),
+            seed=int(data.get('seed', 0))
+        )
+
+
+class GeneratedPlan:
+    """Kết quả xếp lịch: tập phân công mong muốn, các ô chưa đủ người và thống kê độ tải."""
+
+    def __init__(self, desired, unfilled: List[dict], stats: dict):
+        self.desired = desired          # {(user_id, ngày): shift_id hoặc None}
+        self.unfilled = unfilled        # [{'date', 'shift_id', 'required', 'assigned'}]
+        self.stats = stats
+        self._diff = None
+
+    def diff(self) -> ScheduleDiff:
+        if self._diff is None:
+            self._diff = diff_schedules(self.desired)
+        return self._diff
+
+
+# ============================================
+# ===           ĐỌC DỮ LIỆU ĐẦU VÀO         ===
+# ============================================
+
+def _load_staff(start_date: date, end_date: date):
+    """
+    Nhân viên có hợp đồng giao với khoảng ngày: (user_ids, pay_units, contract_start, contract_end).
+    Mỗi nhân viên lấy hợp đồng bắt đầu muộn nhất (giống cách tính lương).
+    """
+    rows = db.session.query(
+        Contract.user_id, Contract.pay_unit, Contract.start_date, Contract.end_date
+    ).join(User, User.id == Contract.user_id).filter(
+        User.role == 'employee',
+        Contract.start_date <= end_date,
+        db.or_(Contract.end_date.is_(None), Contract.end_date >= start_date)
+    ).order_by(Contract.user_id, Contract.start_date).all()
+    latest = {}
+    for user_id, pay_unit, contract_start, contract_end in rows:
+        latest[user_id] = (pay_unit or 'month', contract_start, contract_end)
+    user_ids = sorted(latest)
+    return user_ids, [latest[u][0] for u in user_ids], [latest[u][1] for u in user_ids], [latest[u][2] for u in user_ids]
+
+
+def _availability(user_index: Dict[int, int], contract_starts, contract_ends, start_date: date, num_days: int):
+    """Mảng bool [nhân viên, ngày]: True nếu trong hạn hợp đồng và không nghỉ phép đã duyệt."""
+    day_numbers = np.arange(num_days)
+    first = np.array([(s - start_date).days for s in contract_starts])
+    last = np.array([(e - start_date).days if e else num_days for e in contract_ends])
+    available = (day_numbers[None, :] >= first[:, None]) & (day_numbers[None, :] <= last[:, None])
+
+    end_date = start_date + timedelta(days=num_days - 1)
+    leaves = db.session.query(LeaveRequest.user_id, LeaveRequest.start_date, LeaveRequest.end_date).filter(
+        LeaveRequest.request_type == 'leave',
+        LeaveRequest.status == 'approved',
+        LeaveRequest.start_date <= end_date,
+        db.func.coalesce(LeaveRequest.end_date, LeaveRequest.start_date) >= start_date
+    )
+    for user_id, leave_start, leave_end in leaves:
+        i = user_index.get(user_id)
+        if i is None:
+            continue
+        lo = max(0, (leave_start - start_date).days)
+        hi = min(num_days - 1, ((leave_end or leave_start) - start_date).days)
+        available[i, lo:hi + 1] = False
+    return available
+
+
+def _rest_matrix(shifts, min_rest_hours: float) -> np.ndarray:
+    """compatible[a, b]: làm ca a hôm trước rồi ca b hôm sau có đủ giờ nghỉ không (hàng cuối = hôm trước không làm)."""
+    n = len(shifts)
+    compatible = np.ones((n + 1, n), dtype=bool)
+    base = date(2000, 1, 1)
+    for a, prev in enumerate(shifts):
+        prev_start = datetime.combine(base, prev.start_time)
+        prev_end = datetime.combine(base, prev.end_time)
+        if prev_end <= prev_start:
+            prev_end += timedelta(days=1)
+        for b, nxt in enumerate(shifts):
+            next_start = datetime.combine(base + timedelta(days=1), nxt.start_time)
+            compatible[a, b] = (next_start - prev_end).total_seconds() >= min_rest_hours * 3600
+    return compatible
+
+
+# ============================================
+# ===              XẾP LỊCH                 ===
+# ============================================
+
+def generate_schedule(start_date: date, end_date: date, options: Optional[GeneratorOptions] = None) -> GeneratedPlan:
+    """Xếp lịch cho [start_date, end_date]. Không ghi CSDL: dùng plan.diff() để xem trước, apply_plan() để ghi."""
+    options = options or GeneratorOptions()
+    if end_date < start_date:
+        raise ValueError('Ngày kết thúc phải sau ngày bắt đầu.')
+    num_days = (end_date - start_date).days + 1
+    if num_days > GENERATOR_MAX_DAYS:
+        raise ValueError(f'Chỉ xếp lịch tối đa {GENERATOR_MAX_DAYS} ngày mỗi lần.')
+    started = _time.perf_counter()
+
+    shifts = db.session.query(Shift.id, Shift.start_time, Shift.end_time, Shift.required_staff).order_by(
+        Shift.start_time).all()
+    user_ids, pay_units, contract_starts, contract_ends = _load_staff(start_date, end_date)
+    user_index = {user_id: i for i, user_id in enumerate(user_ids)}
+    shift_index = {shift.id: j for j, shift in enumerate(shifts)}
+    n_staff, n_shifts = len(user_ids), len(shifts)
+
+    # Lịch hiện có: `history` ngày trước start_date (giờ nghỉ, chuỗi ngày làm liên tiếp và phần đầu tuần
+    # nằm trước khoảng xếp lịch) và các lịch được giữ nguyên
+    history = max(options.max_consecutive_days, 6)
+    existing = db.session.query(Schedule.user_id, Schedule.date, Schedule.shift_id).filter(
+        Schedule.date.between(start_date - timedelta(days=history), end_date)
+    ).all()
+
+    # assignment[i, d] = chỉ số ca (-1 = không làm); cột d là ngày start_date + (d - history),
+    # các cột trước `history` là lịch đã có trước khoảng xếp lịch
+    columns = history + num_days
+    assignment = np.full((n_staff, columns), -1, dtype=np.int32)
+    fixed = np.zeros((n_staff, columns), dtype=bool)
+    for user_id, day, shift_id in existing:
+        i, j = user_index.get(user_id), shift_index.get(shift_id)
+        if i is None or j is None:
+            continue
+        d = (day - start_date).days + history
+        if d < history or options.keep_existing:
+            assignment[i, d] = j
+            fixed[i, d] = True
+
+    available = _availability(user_index, contract_starts, contract_ends, start_date, num_days)
+    compatible = _rest_matrix(shifts, options.min_rest_hours)
+    is_hourly = np.array([unit == 'hour' for unit in pay_units], dtype=bool)
+    max_week = np.where(is_hourly, options.max_per_week['hour'], options.max_per_week['month'])
+    target = np.where(is_hourly, options.target_per_week['hour'], options.target_per_week['month']).astype(float)
+    expected = np.maximum(target * num_days / 7, 1)  # Số ca mong muốn trong cả khoảng
+    required = np.array([shift.required_staff or 0 for shift in shifts])
+
+    rng = np.random.default_rng(options.seed)
+    jitter = rng.random(n_staff) * 1e-3   # Phá thế hòa ngẫu nhiên nhưng tái lập được
+    load = np.zeros(n_staff)              # Số ca đã xếp trong khoảng
+    # Số ngày làm liên tiếp tính tới hôm trước start_date
+    consecutive = np.zeros(n_staff, dtype=np.int32)
+    for d in range(history):
+        consecutive = np.where(assignment[:, d] >= 0, consecutive + 1, 0)
+    # ahead[i, d]: số ngày làm liên tiếp ngay sau ngày d. Khi vòng tham lam tới ngày d, các ngày sau
+    # chỉ chứa lịch giữ nguyên nên tính một lần từ trước
+    ahead = np.zeros((n_staff, columns), dtype=np.int32)
+    for d in range(columns - 2, -1, -1):
+        ahead[:, d] = np.where(assignment[:, d + 1] >= 0, ahead[:, d + 1] + 1, 0)
+    week_count = np.zeros(n_staff, dtype=np.int32)
+    unfilled = []
+
+    for d in range(history, columns):
+        day = start_date + timedelta(days=d - history)
+        if day.weekday() == 0 or d == history:
+            # Đầu tuần mới (hoặc ngày đầu): đếm số ca của CẢ tuần - lịch trước khoảng xếp lịch
+            # và lịch giữ nguyên ở các ngày sau trong tuần đều tính vào giới hạn
+            week_start = d - day.weekday()
+            week_count = (assignment[:, week_start:week_start + 7] >= 0).sum(axis=1).astype(np.int32)
+        working_today = assignment[:, d] >= 0
+        staffed = np.bincount(assignment[working_today, d], minlength=n_shifts) if n_shifts else np.array([])
+        previous_shift = np.where(assignment[:, d - 1] >= 0, assignment[:, d - 1], n_shifts)
+        next_shift = assignment[:, d + 1] if d + 1 < columns else np.full(n_staff, -1, dtype=np.int32)
+        run_ok = consecutive + 1 + ahead[:, d] <= options.max_consecutive_days
+
+        for j in range(n_shifts):
+            need = required[j] - staffed[j]
+            if need <= 0:
+                continue
+            # Đủ giờ nghỉ trước ca j (sau ca hôm trước) và sau ca j (trước ca giữ nguyên của hôm sau)
+            rest_ok = compatible[previous_shift, j] & ((next_shift < 0) | compatible[j, next_shift])
+            candidates = np.flatnonzero(
+                available[:, d - history] & ~working_today & (week_count < max_week) & run_ok & rest_ok
+            )
+            if len(candidates) > need:
+                # Độ tải = số ca đã xếp / mục tiêu theo loại hợp đồng: chọn `need` người có độ tải thấp nhất
+                score = load[candidates] / expected[candidates] + jitter[candidates]
+                candidates = candidates[np.argpartition(score, need - 1)[:need]]
+            assignment[candidates, d] = j
+            working_today[candidates] = True
+            load[candidates] += 1
+            week_count[candidates] += 1
+            if len(candidates) < need:
+                unfilled.append({'date': day.isoformat(), 'shift_id': shifts[j].id,
+                                 'required': int(required[j]), 'assigned': int(staffed[j] + len(candidates))})
+        load[fixed[:, d]] += 1
+        consecutive = np.where(working_today, consecutive + 1, 0)
+
+    moves = _balance(assignment, fixed, available, compatible, is_hourly, max_week, options, start_date, n_shifts,
+                     history)
+
+    # Tập phân công mong muốn cho diff: ô được xếp -> ca; ô trống -> None nếu xếp lại toàn bộ
+    desired = {}
+    for i, user_id in enumerate(user_ids):
+        for d in range(history, columns):
+            j = assignment[i, d]
+            if j >= 0:
+                desired[(user_id, start_date + timedelta(days=d - history))] = shifts[j].id
+            elif not options.keep_existing:
+                desired[(user_id, start_date + timedelta(days=d - history))] = None
+
+    counts = (assignment[:, history:] >= 0).sum(axis=1)
+    stats = {
+        'employees': n_staff,
+        'days': num_days,
+        'assigned_shifts': int(counts.sum()),
+        'unfilled_slots': len(unfilled),
+        'shifts_per_employee': {
+            unit: {'min': int(counts[mask].min()), 'max': int(counts[mask].max()), 'mean': round(float(counts[mask].mean()), 2)}
+            for unit, mask in (('month', ~is_hourly), ('hour', is_hourly)) if mask.any()
+        },
+        'balance_moves': moves,
+        'seconds': round(_time.perf_counter() - started, 3)
+    }
+    return GeneratedPlan(desired, unfilled, stats)
+
+
+def _balance(assignment, fixed, available, compatible, is_hourly, max_week, options, start_date, n_shifts,
+             history) -> int:
+    """
+    Tìm kiếm cục bộ: lặp lại việc chuyển một ca (không cố định) từ người nhiều ca nhất sang người ít ca nhất
+    cùng loại hợp đồng, nếu người nhận rảnh hôm đó và vẫn thỏa giới hạn tuần / ngày liên tiếp / giờ nghỉ.
+    Trả về số lần chuyển.
+    """
+    counts = (assignment[:, history:] >= 0).sum(axis=1)
+    week_of = np.array([(start_date + timedelta(days=d - history)
+                         - (start_date - timedelta(days=start_date.weekday()))).days // 7
+                        for d in range(assignment.shape[1])])
+    moves = 0
+    for group in (np.flatnonzero(~is_hourly), np.flatnonzero(is_hourly)):
+        if len(group) < 2:
+            continue
+        stuck = set()
+        for _ in range(options.local_search_rounds):
+            order = group[np.argsort(counts[group], kind='stable')]
+            giver = next((g for g in order[::-1] if g not in stuck), None)
+            if giver is None:
+                break
+            receivers = [r for r in order if counts[giver] - counts[r] >= 2]
+            if not receivers:
+                break
+            if not _move_one(giver, receivers, assignment, fixed, available, compatible, max_week,
+                             week_of, options.max_consecutive_days, n_shifts, history):
+                stuck.add(giver)
+                continue
+            counts = (assignment[:, history:] >= 0).sum(axis=1)
+            moves += 1
+    return moves
+
+
+def _move_one(giver, receivers, assignment, fixed, available, compatible, max_week, week_of,
+              max_consecutive, n_shifts, history) -> bool:
+    """Chuyển một ca của giver cho người đầu tiên trong receivers nhận được. True nếu chuyển thành công."""
+    last = assignment.shape[1] - 1
+    for d in np.flatnonzero((assignment[giver, history:] >= 0) & ~fixed[giver, history:]) + history:
+        j = assignment[giver, d]
+        for r in receivers[:50]:
+            if assignment[r, d] >= 0 or not available[r, d - history]:
+                continue
+            if (assignment[r, week_of == week_of[d]] >= 0).sum() >= max_week[r]:
+                continue
+            prev_shift = assignment[r, d - 1] if assignment[r, d - 1] >= 0 else n_shifts
+            if not compatible[prev_shift, j]:
+                continue
+            if d < last and assignment[r, d + 1] >= 0 and not compatible[j, assignment[r, d + 1]]:
+                continue
+            # Số ngày làm liên tiếp nếu nhận thêm ngày d
+            run = 1
+            k = d - 1
+            while k >= 0 and assignment[r, k] >= 0:
+                run, k = run + 1, k - 1
+            k = d + 1
+            while k <= last and assignment[r, k] >= 0:
+                run, k = run + 1, k + 1
+            if run > max_consecutive:
+                continue
+            assignment[r, d] = j
+            assignment[giver, d] = -1
+            return True
+    return False
+
+
+def apply_plan(plan: GeneratedPlan) -> ScheduleDiff:
+    """Ghi phần khác biệt của kế hoạch vào bảng Schedule (KHÔNG commit)."""
+    diff = plan.diff()
+    apply_schedule_diff(diff)
+    return diff
+
+
+# ============================================
+# ===             LỆNH CLI                 ===
+# ============================================
+
+schedule_cli = AppGroup('schedule', help='Xếp lịch làm việc.')
+
+
+@schedule_cli.command('generate')
+@click.option('--start', type=click.DateTime(formats=['%Y-%m-%d']), required=True, help='Ngày bắt đầu (YYYY-MM-DD).')
+@click.option('--end', type=click.DateTime(formats=['%Y-%m-%d']), required=True, help='Ngày kết thúc (YYYY-MM-DD).')
+@click.option('--replace', is_flag=True, help='Xếp lại toàn bộ khoảng ngày (mặc định: giữ lịch đã có, chỉ xếp thêm).')
+@click.option('--apply', 'apply_changes', is_flag=True, help='Ghi vào CSDL (mặc định chỉ xem trước).')
+def generate_schedule_command(start, end, replace, apply_changes):
+    """Tự động xếp lịch: flask schedule generate --start 2025-11-01 --end 2025-11-30 [--apply]"""
+    plan = generate_schedule(start.date(), end.date(), GeneratorOptions(keep_existing=not replace))
+    diff = plan.diff()
+    click.echo(f'Thống kê: {plan.stats}')
+    click.echo(f'Thay đổi: {diff.summary()}')
+    for slot in plan.unfilled[:20]:
+        click.echo(f"  Thiếu người: {slot['date']} ca #{slot['shift_id']} ({slot['assigned']}/{slot['required']})")
+    if apply_changes:
+        apply_schedule_diff(diff)
+        db.session.commit()
+        invalidate_analysis()
+        click.echo('Đã ghi lịch vào CSDL.')
+    else:
+        click.echo('Chế độ xem trước: chưa ghi gì (thêm --apply để ghi).')
@@ -0,0 +1,91 @@
+# /app/schedule/grid.py
+# Dựng bảng lịch (ngày × ca × nhân viên) cho trang xếp lịch và API JSON:
+# đọc lịch trong khoảng ngày cùng tên nhân viên bằng MỘT truy vấn (chỉ các cột cần thiết),
+# rồi đổ vào dict đánh chỉ mục theo (ngày, shift_id) thay vì dò tuyến tính danh sách nhân viên.
+
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from ..models import db, User, Shift, Schedule
+
+# Các độ rộng cửa sổ lịch được hỗ trợ (số ngày), mặc định 3 ngày như giao diện cũ
+CALENDAR_WINDOWS = (3, 7, 14, 31)
+DEFAULT_WINDOW = 3
+
+
+def parse_window(start_date_str: Optional[str], days_arg, today: date):
+    """(ngày bắt đầu, số ngày) từ query string; giá trị sai thì dùng hôm nay / cửa sổ mặc định."""
+    try:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else today
+    except ValueError:
+        start_date = today
+    try:
+        days = int(days_arg)
+    except (TypeError, ValueError):
+        days = DEFAULT_WINDOW
+    return start_date, days if days in CALENDAR_WINDOWS else DEFAULT_WINDOW
+
+
+def display_days_for(start_date: date, days: int) -> List[date]:
+    return [start_date + timedelta(days=i) for i in range(days)]
+
+
+def load_shifts():
+    """Các ca (chỉ cột cần hiển thị), sắp theo giờ bắt đầu."""
+    return db.session.query(Shift.id, Shift.name, Shift.start_time, Shift.end_time).order_by(Shift.start_time).all()
+
+
+def _schedule_rows(start_date: date, end_date: date):
+    """(date, shift_id, user_id, username) của các lịch trong khoảng, chỉ nhân viên (không tính admin)."""
+    return db.session.query(
+        Schedule.date, Schedule.shift_id, User.id, User.username
+    ).join(User, User.id == Schedule.user_id).filter(
+        Schedule.date.between(start_date, end_date),
+        User.role == 'employee'
+    ).order_by(Schedule.date, User.username)
+
+
+def build_calendar(display_days: List[date], shifts) -> Dict[date, Dict[int, list]]:
+    """schedules_data[ngày][shift_id] = [row(id, username), ...] cho template xếp lịch."""
+    schedules_data = {day: {shift.id: [] for shift in shifts} for day in display_days}
+    for row in _schedule_rows(display_days[0], display_days[-1]):
+        # Mỗi row có sẵn .id và .username như đối tượng User mà template đang dùng
+        cell = schedules_data.get(row.date, {}).get(row.shift_id)
+        if cell is not None:
+            cell.append(row)
+    return schedules_data
+
+
+def calendar_matrix(display_days: List[date], shifts) -> dict:
+    """
+    Dạng gọn cho API JSON: matrix[i][j] = [user_id, ...] của ngày days[i], ca shifts[j];
+    users chỉ gồm tên của các nhân viên có mặt trong cửa sổ.
+    """
+    shift_index = {shift.id: j for j, shift in enumerate(shifts)}
+    day_index = {day: i for i, day in enumerate(display_days)}
+    matrix = [[[] for _ in shifts] for _ in display_days]
+    users = {}
+    for day, shift_id, user_id, username in _schedule_rows(display_days[0], display_days[-1]):
+        j = shift_index.get(shift_id)
+        if j is None:
+            continue
+        matrix[day_index[day]][j].append(user_id)
+        users[user_id] = username
+    return {
+        'days': [day.isoformat() for day in display_days],
+        'shifts': [{'id': shift.id, 'name': shift.name, 'start_time': shift.start_time.strftime('%H:%M'),
+                    'end_time': shift.end_time.strftime('%H:%M')} for shift in shifts],
+        'users': {str(user_id): username for user_id, username in users.items()},
+        'matrix': matrix
+    }
+
+
+def build_personal_schedule(user_id: int, display_days: List[date]) -> Dict[date, Optional[object]]:
+    """{ngày: row(shift_name, start_time, end_time) hoặc None} — tra dict theo ngày thay vì next() mỗi ngày."""
+    rows = db.session.query(
+        Schedule.date, Shift.name.label('shift_name'), Shift.start_time, Shift.end_time
+    ).join(Shift, Shift.id == Schedule.shift_id).filter(
+        Schedule.user_id == user_id,
+        Schedule.date.between(display_days[0], display_days[-1])
+    )
+    by_day = {row.date: row for row in rows}
+    return {day: by_day.get(day) for day in display_days}
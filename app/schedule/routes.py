@@ -9,6 +9,13 @@ from ..models import db, User, Shift, Schedule
 # Import các hàm xử lý thời gian
 from datetime import datetime, timedelta, date, time
 from sqlalchemy import and_
+from ..attendance.cache import get_employee_options
+from .grid import (CALENDAR_WINDOWS, parse_window, display_days_for, load_shifts, build_calendar, calendar_matrix,
+                   build_personal_schedule)
+from .analysis import analyze_schedule, invalidate_analysis
+from .bulk import (parse_assignments, expand_weekly_template, validate_assignments,
+                   diff_schedules, apply_schedule_diff)
+from .generator import GeneratorOptions, generate_schedule, apply_plan
 
 schedule_bp = Blueprint('schedule', __name__, url_prefix='/schedule')
 
@@ -33,15 +40,17 @@ def add_shift():
         try:
             start_time = datetime.strptime(start_time_str, '%H:%M').time()
             end_time = datetime.strptime(end_time_str, '%H:%M').time()
+            required_staff = max(0, int(request.form.get('required_staff') or 0))
 
-            new_shift = Shift(name=name, start_time=start_time, end_time=end_time)
+            new_shift = Shift(name=name, start_time=start_time, end_time=end_time, required_staff=required_staff)
             db.session.add(new_shift)
             db.session.commit()
+            invalidate_analysis()
 
             flash('Thêm ca làm việc thành công!', 'success')
             return redirect(url_for('schedule.manage_shifts'))
         except ValueError:
-            flash('Định dạng thời gian không hợp lệ. Vui lòng sử dụng HH:MM.', 'danger')
+            flash('Định dạng thời gian không hợp lệ (HH:MM) hoặc số người cần không hợp lệ.', 'danger')
 
     return render_template('schedule/add_shift.html')
 
@@ -59,12 +68,15 @@ def edit_shift(shift_id):
         try:
             shift.start_time = datetime.strptime(start_time_str, '%H:%M').time()
             shift.end_time = datetime.strptime(end_time_str, '%H:%M').time()
+            shift.required_staff = max(0, int(request.form.get('required_staff') or 0))
 
             db.session.commit()
+            invalidate_analysis()
             flash('Cập nhật ca làm việc thành công!', 'success')
             return redirect(url_for('schedule.manage_shifts'))
         except ValueError:
-            flash('Định dạng thời gian không hợp lệ. Vui lòng sử dụng HH:MM.', 'danger')
+            db.session.rollback()
+            flash('Định dạng thời gian không hợp lệ (HH:MM) hoặc số người cần không hợp lệ.', 'danger')
 
     return render_template('schedule/edit_shift.html', shift=shift)
 
@@ -79,58 +91,48 @@ def delete_shift(shift_id):
     else:
         db.session.delete(shift)
         db.session.commit()
+        invalidate_analysis()
         flash('Xóa ca làm việc thành công!', 'success')
 
     return redirect(url_for('schedule.manage_shifts'))
 
-# --- 2. XẾP LỊCH CHO ADMIN (GIAO DIỆN 3 NGÀY) ---
+# --- 2. XẾP LỊCH CHO ADMIN (GIAO DIỆN 3 / 7 / 14 / 31 NGÀY) ---
 
 @schedule_bp.route('/calendar')
 @admin_required 
 def calendar():
     """
-    Trang xếp lịch chính cho Admin (dạng 3 ngày: Ngày -> Ca -> Nhân viên).
+    Trang xếp lịch chính cho Admin (Ngày -> Ca -> Nhân viên), ?days=3|7|14|31 (mặc định 3 ngày).
+    Lịch trong cửa sổ được đọc bằng một truy vấn và đổ vào dict theo (ngày, ca), xem grid.build_calendar.
     """
-    # Xử lý lấy ngày và phân trang 3 ngày
-    start_date_str = request.args.get('start_date')
-    if start_date_str:
-        try:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-        except ValueError:
-            start_date = datetime.now().date()
-    else:
-        start_date = datetime.now().date()
+    start_date, days = parse_window(request.args.get('start_date'), request.args.get('days'), datetime.now().date())
+    display_days = display_days_for(start_date, days)
 
-    display_days = [start_date + timedelta(days=i) for i in range(3)]
-    end_date = display_days[-1]
-
-    # Lấy dữ liệu
-    employees = User.query.filter_by(role='employee').all()
-    shifts = Shift.query.order_by(Shift.start_time).all()
-    schedules_in_period = Schedule.query.filter(
-        Schedule.date.between(start_date, end_date)
-    ).all()
-
-    # Xây dựng cấu trúc dữ liệu: schedules_data[ngày][shift_id] = [danh_sách_user]
-    schedules_data = {}
-    for day in display_days:
-        schedules_data[day] = {}
-        for shift in shifts:
-            schedules_data[day][shift.id] = [] # Khởi tạo
-
-    # Đổ nhân viên vào đúng ca, đúng ngày
-    for schedule in schedules_in_period:
-        user = next((emp for emp in employees if emp.id == schedule.user_id), None)
-        if user and schedule.date in schedules_data and schedule.shift_id in schedules_data[schedule.date]:
-            schedules_data[schedule.date][schedule.shift_id].append(user)
+    # Lấy dữ liệu (danh sách nhân viên cho ô chọn lấy từ cache, chỉ gồm id + username)
+    employees = get_employee_options()
+    shifts = load_shifts()
+    schedules_data = build_calendar(display_days, shifts)
 
     return render_template('schedule/calendar.html',
                            display_days=display_days,
                            shifts=shifts,
                            employees=employees,
-                           schedules_data=schedules_data
+                           schedules_data=schedules_data,
+                           window_days=days,
+                           window_options=CALENDAR_WINDOWS
                            )
 
+@schedule_bp.route('/calendar/data')
+@admin_required
+def calendar_data():
+    """
+    API JSON cho bảng lịch lớn (front end tự vẽ): ?start_date=YYYY-MM-DD&days=3|7|14|31
+    Trả về days, shifts, users {id: username} và matrix[ngày][ca] = [user_id, ...].
+    """
+    start_date, days = parse_window(request.args.get('start_date'), request.args.get('days'), datetime.now().date())
+    display_days = display_days_for(start_date, days)
+    return jsonify({'success': True, **calendar_matrix(display_days, load_shifts())})
+
 # --- 3. API CẬP NHẬT LỊCH (DÙNG CHUNG) ---
 
 @schedule_bp.route('/update_schedule', methods=['POST'])
@@ -158,12 +160,119 @@ def update_schedule():
                 db.session.delete(existing_schedule)
 
         db.session.commit()
+        invalidate_analysis()
         return jsonify({'success': True})
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)})
 
-# --- 4. TRANG XEM LỊCH CỦA NHÂN VIÊN (GIAO DIỆN 3 NGÀY) ---
+# Số thay đổi tối đa trả về khi xem trước (dry_run)
+BULK_PREVIEW_LIMIT = 200
+
+@schedule_bp.route('/bulk_update', methods=['POST'])
+@admin_required
+def bulk_update_schedule():
+    """
+    API xếp lịch hàng loạt (JSON), thay cho hàng nghìn lần gọi update_schedule:
+      - {"assignments": [{"user_id": 5, "date": "2025-11-03", "shift_id": 2}, ...]}  (shift_id null = bỏ lịch)
+      - {"template": {"start_date": ..., "end_date": ..., "entries": [...], "replace": false}}
+        mẫu tuần lặp lại trên khoảng ngày (xem bulk.expand_weekly_template)
+    So với lịch hiện có rồi thêm / đổi ca / xóa trong MỘT transaction.
+    "dry_run": true -> chỉ trả về các thay đổi sẽ thực hiện, không ghi.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        if data.get('template'):
+            template = data['template']
+            desired = expand_weekly_template(
+                datetime.strptime(template.get('start_date') or '', '%Y-%m-%d').date(),
+                datetime.strptime(template.get('end_date') or '', '%Y-%m-%d').date(),
+                template.get('entries') or [],
+                replace=bool(template.get('replace'))
+            )
+        else:
+            desired = parse_assignments(data.get('assignments') or [])
+        validate_assignments(desired)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': f'Dữ liệu không hợp lệ: {e}'}), 400
+
+    diff = diff_schedules(desired)
+    if data.get('dry_run'):
+        return jsonify({'success': True, 'dry_run': True, **diff.summary(),
+                        'changes': diff.changes(limit=BULK_PREVIEW_LIMIT)})
+
+    try:
+        apply_schedule_diff(diff)
+        db.session.commit()
+        invalidate_analysis()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+    return jsonify({'success': True, **diff.summary()})
+
+@schedule_bp.route('/generate', methods=['POST'])
+@admin_required
+def generate():
+    """
+    API tự động xếp lịch (JSON) theo Shift.required_staff, nghỉ phép đã duyệt và loại hợp đồng:
+      {"start_date": "2025-11-01", "end_date": "2025-11-30", "keep_existing": true,
+       "max_per_week": {"month": 6, "hour": 4}, "target_per_week": {...}, "max_consecutive_days": 6,
+       "min_rest_hours": 11, "dry_run": true}
+    Mặc định chỉ xem trước (dry_run = true): trả về các thay đổi, ô thiếu người và thống kê độ tải.
+    "dry_run": false -> ghi phần khác biệt trong MỘT transaction.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        start_date = datetime.strptime(data.get('start_date') or '', '%Y-%m-%d').date()
+        end_date = datetime.strptime(data.get('end_date') or '', '%Y-%m-%d').date()
+        plan = generate_schedule(start_date, end_date, GeneratorOptions.from_dict(data))
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        return jsonify({'success': False, 'message': f'Dữ liệu không hợp lệ: {e}'}), 400
+
+    diff = plan.diff()
+    if data.get('dry_run', True):
+        return jsonify({'success': True, 'dry_run': True, **diff.summary(), 'stats': plan.stats,
+                        'unfilled': plan.unfilled[:BULK_PREVIEW_LIMIT],
+                        'changes': diff.changes(limit=BULK_PREVIEW_LIMIT)})
+
+    try:
+        apply_plan(plan)
+        db.session.commit()
+        invalidate_analysis()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+    return jsonify({'success': True, **diff.summary(), 'stats': plan.stats, 'unfilled': plan.unfilled[:BULK_PREVIEW_LIMIT]})
+
+# --- 4. PHÂN TÍCH ĐỘ PHỦ / XUNG ĐỘT LỊCH ---
+
+@schedule_bp.route('/analysis')
+@admin_required
+def analysis():
+    """
+    Ca thiếu người, lịch trùng ngày nghỉ phép đã duyệt và ca chồng giờ trong khoảng ngày
+    (?start_date=&end_date=, mặc định 7 ngày từ hôm nay). ?format=json hoặc Accept: application/json -> JSON.
+    """
+    today = datetime.now().date()
+    wants_json = request.args.get('format') == 'json' or request.accept_mimetypes.best == 'application/json'
+    try:
+        start_date = datetime.strptime(request.args.get('start_date') or today.isoformat(), '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args.get('end_date') or (start_date + timedelta(days=6)).isoformat(),
+                                     '%Y-%m-%d').date()
+        result = analyze_schedule(start_date, end_date)
+    except ValueError as e:
+        if wants_json:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        flash(str(e), 'danger')
+        start_date = end_date = today
+        result = analyze_schedule(today, today)
+
+    if wants_json:
+        return jsonify({'success': True, **result})
+    return render_template('schedule/analysis.html', result=result, start_date=start_date, end_date=end_date,
+                           shift_names={row['shift_id']: row['shift_name'] for row in result['coverage']})
+
+# --- 5. TRANG XEM LỊCH CỦA NHÂN VIÊN (GIAO DIỆN 3 NGÀY) ---
 
 @schedule_bp.route('/my_schedule')
 def my_schedule():
@@ -172,32 +281,16 @@ def my_schedule():
         flash('Bạn cần đăng nhập để xem trang này.', 'danger')
         return redirect(url_for('auth.login'))
         
-    # Xử lý lấy ngày và phân trang 3 ngày
-    start_date_str = request.args.get('start_date')
-    if start_date_str:
-        try:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-        except ValueError:
-            start_date = datetime.now().date()
-    else:
-        start_date = datetime.now().date()
-
-    display_days = [start_date + timedelta(days=i) for i in range(3)]
-    end_date = display_days[-1]
+    # Xử lý lấy ngày và cửa sổ hiển thị (mặc định 3 ngày)
+    start_date, days = parse_window(request.args.get('start_date'), request.args.get('days'), datetime.now().date())
+    display_days = display_days_for(start_date, days)
 
-    # Lấy lịch của user hiện tại
-    schedules = Schedule.query.filter(
-        and_(Schedule.user_id == session['user_id'],
-             Schedule.date.between(start_date, end_date))
-    ).all()
-
-    # Tạo cấu trúc dữ liệu
-    week_schedule = {}
-    for day in display_days:
-        schedule = next((s for s in schedules if s.date == day), None)
-        week_schedule[day] = schedule
+    # Lịch của user hiện tại kèm tên / giờ ca (một truy vấn), tra theo ngày bằng dict
+    week_schedule = build_personal_schedule(session['user_id'], display_days)
 
     return render_template('schedule/my_schedule.html',
                            week_schedule=week_schedule,
-                           display_days=display_days
+                           display_days=display_days,
+                           window_days=days,
+                           window_options=CALENDAR_WINDOWS
                            )
\ No newline at end of file
@@ -4,6 +4,7 @@ from flask import (Blueprint, render_template, request, redirect, url_for,
 from werkzeug.utils import secure_filename # Rất quan trọng cho file upload
 from ..models import db, User
 from ..decorators import login_required
+from ..attendance.cache import invalidate_employee_options
 from .. import bcrypt # Import bcrypt từ app/__init__.py của bạn
 
 user_bp = Blueprint('user', __name__, url_prefix='/user')
@@ -52,6 +53,7 @@ def profile():
         # --- 4. Lưu tất cả thay đổi ---
         try:
             db.session.commit()
+            invalidate_employee_options()  # Tên hiển thị trong dropdown lọc có thể đã đổi
             session['avatar_image'] = user.avatar_image
             flash('Cập nhật thông tin thành công!', 'success')
         except Exception as e:
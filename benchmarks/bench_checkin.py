@@ -0,0 +1,81 @@
+# /benchmarks/bench_checkin.py
+# Mô phỏng giờ cao điểm 8:00: nhiều nhân viên check-in gần như cùng lúc (một số bấm 2 lần liên tiếp).
+# Báo cáo độ trễ p50/p99, số truy vấn mỗi lượt check-in và kiểm tra không có ca mở trùng.
+# Chạy: python benchmarks/bench_checkin.py [số nhân viên] [số thread]
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import pytz
+from common import make_app, seed_employees, count_queries
+
+EMPLOYEES = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+THREADS = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+DOUBLE_CLICK_EVERY = 10  # Cứ 10 nhân viên thì 1 người bấm check-in 2 lần
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    app = make_app()
+    today = datetime.now(pytz.timezone('Asia/Ho_Chi_Minh')).date()
+    with app.app_context():
+        from app.models import db, Attendance, Schedule, Shift
+        user_ids = seed_employees(EMPLOYEES, days=1)
+        # Xóa dữ liệu chấm công hôm nay do seed tạo ra, chỉ giữ lịch làm việc
+        Attendance.query.filter(Attendance.date == today).delete()
+        if not Schedule.query.filter_by(date=today).count():
+            shift_id = Shift.query.first().id
+            db.session.execute(db.insert(Schedule), [{'user_id': uid, 'shift_id': shift_id, 'date': today}
+                                                     for uid in user_ids])
+        db.session.commit()
+
+    # Số truy vấn cho một lượt check-in (đo riêng, không đồng thời)
+    probe_user = user_ids[0]
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session.update(user_id=probe_user, role='employee', username='probe')
+    with app.app_context():
+        from app.models import db
+        with count_queries(db.engine) as counter:
+            client.post('/check_in')
+    queries_per_check_in = counter['count']
+
+    requests = [uid for uid in user_ids[1:]]
+    requests += [uid for i, uid in enumerate(user_ids[1:]) if i % DOUBLE_CLICK_EVERY == 0]
+
+    def punch(user_id):
+        worker = app.test_client()
+        with worker.session_transaction() as session:
+            session.update(user_id=user_id, role='employee', username=f'bench_{user_id}')
+        started = time.perf_counter()
+        response = worker.post('/check_in')
+        return (time.perf_counter() - started) * 1000, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = list(pool.map(punch, requests))
+    elapsed = time.perf_counter() - started
+
+    latencies = [ms for ms, _ in results]
+    errors = sum(1 for _, status in results if status >= 500)
+    with app.app_context():
+        from app.models import db, Attendance
+        open_shifts = Attendance.query.filter(Attendance.date == today, Attendance.check_out.is_(None)).count()
+        duplicated = db.session.query(Attendance.user_id).filter(Attendance.check_out.is_(None)).group_by(
+            Attendance.user_id).having(db.func.count(Attendance.id) > 1).count()
+
+    print(f'{len(requests)} lượt check-in ({EMPLOYEES - 1} nhân viên, {THREADS} thread) trong {elapsed:.2f}s '
+          f'= {len(requests) / elapsed:.0f} lượt/s')
+    print(f'Truy vấn mỗi lượt check-in: {queries_per_check_in}')
+    print(f'p50 = {_percentile(latencies, 0.50):.1f} ms, p99 = {_percentile(latencies, 0.99):.1f} ms, '
+          f'max = {max(latencies):.1f} ms, lỗi 5xx = {errors}')
+    print(f'Ca đang mở hôm nay: {open_shifts} (mong đợi {EMPLOYEES}), nhân viên có ca mở trùng: {duplicated}')
+
+
+if __name__ == '__main__':
+    main()
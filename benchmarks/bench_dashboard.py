@@ -0,0 +1,29 @@
+# /benchmarks/bench_dashboard.py
+# Đo số truy vấn và độ trễ khi tính số liệu dashboard admin theo số lượng nhân viên.
+# Chạy: python benchmarks/bench_dashboard.py
+
+import time
+from datetime import date
+from common import make_app, seed_employees, count_queries
+
+HEADCOUNTS = [100, 500, 1000, 2000]
+
+
+def main():
+    from app.models import db
+    from app.attendance.metrics import compute_admin_dashboard_metrics
+
+    print(f"{'nhân viên':>10} | {'truy vấn':>8} | {'thời gian (ms)':>14}")
+    for headcount in HEADCOUNTS:
+        app = make_app()
+        with app.app_context():
+            seed_employees(headcount, days=45)
+            with count_queries(db.engine) as counter:
+                started = time.perf_counter()
+                compute_admin_dashboard_metrics(date.today(), headcount)
+                elapsed = (time.perf_counter() - started) * 1000
+        print(f"{headcount:>10} | {counter['count']:>8} | {elapsed:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# /benchmarks/bench_outbox.py
+# Duyệt liên tiếp nhiều đơn từ khi email/push gửi "ngay trong request" so với gửi nền qua outbox.
+# Transport giả có độ trễ cố định cho mỗi lần gửi để mô phỏng SMTP/FCM.
+# Chạy: python benchmarks/bench_outbox.py
+
+import time
+from statistics import median
+from common import make_app, seed_employees
+
+REQUESTS = 200
+SEND_LATENCY = 0.02  # Giây cho mỗi lần gọi transport
+
+
+def _slow_fake_transports(outbox):
+    from app.notification.transports import FakeTransport
+
+    class SlowFakeTransport(FakeTransport):
+        def send_batch(self, messages):
+            time.sleep(SEND_LATENCY * len(messages))
+            return super().send_batch(messages)
+
+    for channel in ('email', 'push'):
+        outbox.register_transport(SlowFakeTransport(channel))
+
+
+def _run(inline):
+    # inline: không có thread nền, gửi ngay sau mỗi request (tương đương gọi SMTP/FCM trong route)
+    app = make_app(OUTBOX_TRANSPORT='fake', OUTBOX_POLL_INTERVAL=0 if inline else 0.5)
+    outbox = app.extensions['outbox']
+    _slow_fake_transports(outbox)
+
+    with app.app_context():
+        from app.models import db, User, LeaveRequest
+        user_ids = seed_employees(20, days=1)
+        db.session.execute(db.update(User).where(User.id.in_(user_ids)).values(
+            email=User.username + '@example.com', fcm_token='token-' + User.username))
+        db.session.execute(db.insert(LeaveRequest), [
+            {'user_id': user_ids[i % len(user_ids)], 'request_type': 'late', 'request_date': None,
+             'reason': 'bench', 'status': 'pending'} for i in range(REQUESTS)
+        ])
+        admin = User(username='bench_admin', password='x', role='admin')
+        db.session.add(admin)
+        db.session.commit()
+        request_ids = [r.id for r in LeaveRequest.query.filter_by(status='pending').limit(REQUESTS)]
+        admin_id = admin.id
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session.update(user_id=admin_id, role='admin', username='bench_admin')
+
+    latencies = []
+    started = time.perf_counter()
+    for request_id in request_ids:
+        request_started = time.perf_counter()
+        client.post(f'/leave/process/{request_id}', data={'action': 'approved'})
+        if inline:
+            with app.app_context():
+                outbox.dispatch_pending()
+        latencies.append((time.perf_counter() - request_started) * 1000)
+    total = time.perf_counter() - started
+    return total, median(latencies), sorted(latencies)[int(len(latencies) * 0.99) - 1]
+
+
+def main():
+    print(f'{REQUESTS} lần duyệt đơn, mỗi lần gửi email + push (trễ {SEND_LATENCY * 1000:.0f} ms/lần gửi)')
+    print(f"{'chế độ':>16} | {'tổng (s)':>9} | {'p50 (ms)':>9} | {'p99 (ms)':>9}")
+    for label, inline in (('gửi trong request', True), ('outbox nền', False)):
+        total, p50, p99 = _run(inline)
+        print(f'{label:>16} | {total:>9.2f} | {p50:>9.1f} | {p99:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
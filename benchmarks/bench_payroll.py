@@ -0,0 +1,45 @@
+# /benchmarks/bench_payroll.py
+# So sánh tính lương từng nhân viên và tính lương hàng loạt: số truy vấn, thời gian, kết quả.
+# Chạy: python benchmarks/bench_payroll.py
+
+import io
+import time
+from contextlib import redirect_stdout
+from datetime import date
+from common import make_app, seed_employees, count_queries
+
+HEADCOUNTS = [100, 500, 2000]
+
+
+def _run(db, month, year, bulk):
+    from app.models import Payroll
+    from app.payroll.calculator import calculate_and_store_salaries
+
+    with count_queries(db.engine) as counter, redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        calculate_and_store_salaries(month, year, bulk=bulk)
+        elapsed = (time.perf_counter() - started) * 1000
+    rows = db.session.query(Payroll.user_id, Payroll.gross_salary, Payroll.net_salary).filter_by(
+        month=month, year=year).order_by(Payroll.user_id).all()
+    Payroll.query.delete()
+    db.session.commit()
+    return counter['count'], elapsed, rows
+
+
+def main():
+    from app.models import db
+
+    today = date.today()
+    print(f"{'nhân viên':>10} | {'từng người (truy vấn/ms)':>24} | {'hàng loạt (truy vấn/ms)':>24} | khớp")
+    for headcount in HEADCOUNTS:
+        app = make_app()
+        with app.app_context():
+            seed_employees(headcount, days=40)
+            slow_queries, slow_ms, slow_rows = _run(db, today.month, today.year, bulk=False)
+            bulk_queries, bulk_ms, bulk_rows = _run(db, today.month, today.year, bulk=True)
+        print(f"{headcount:>10} | {slow_queries:>10} / {slow_ms:>11.1f} | {bulk_queries:>10} / {bulk_ms:>11.1f} | "
+              f"{'có' if slow_rows == bulk_rows else 'KHÔNG'}")
+
+
+if __name__ == '__main__':
+    main()
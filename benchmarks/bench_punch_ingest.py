@@ -0,0 +1,67 @@
+# /benchmarks/bench_punch_ingest.py
+# Giờ giao ca: nhiều nhân viên check-in rồi check-out cùng lúc, so sánh ghi từng request (mặc định)
+# với ghi gộp bằng một thread ghi (PUNCH_BATCHING). Báo cáo số lượt chấm công / giây, p50/p99 và số lỗi.
+# Chạy: python benchmarks/bench_punch_ingest.py [số nhân viên] [số thread]
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import pytz
+from common import make_app, seed_employees
+
+EMPLOYEES = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+THREADS = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _run(batching):
+    app = make_app(PUNCH_BATCHING=batching)
+    today = datetime.now(pytz.timezone('Asia/Ho_Chi_Minh')).date()
+    with app.app_context():
+        from app.models import db, Attendance
+        user_ids = seed_employees(EMPLOYEES, days=1)
+        Attendance.query.filter(Attendance.date == today).delete()
+        db.session.commit()
+
+    def punch(args):
+        kind, user_id = args
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session.update(user_id=user_id, role='employee', username=f'bench_{user_id}')
+        started = time.perf_counter()
+        try:
+            status = client.post(f'/{kind}').status_code
+        except Exception:
+            status = 500
+        return (time.perf_counter() - started) * 1000, status
+
+    latencies, errors, total = [], 0, 0.0
+    for kind in ('check_in', 'check_out'):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=THREADS) as pool:
+            results = list(pool.map(punch, [(kind, uid) for uid in user_ids]))
+        total += time.perf_counter() - started
+        latencies += [ms for ms, _ in results]
+        errors += sum(1 for _, status in results if status >= 500)
+
+    with app.app_context():
+        from app.models import Attendance
+        closed = Attendance.query.filter(Attendance.date == today, Attendance.check_out.isnot(None)).count()
+    return len(latencies) / total, _percentile(latencies, 0.50), _percentile(latencies, 0.99), errors, closed
+
+
+def main():
+    print(f'{EMPLOYEES} nhân viên check-in rồi check-out, {THREADS} thread đồng thời')
+    print(f"{'chế độ':>18} | {'lượt/s':>7} | {'p50 (ms)':>9} | {'p99 (ms)':>9} | {'lỗi':>4} | {'ca đã đóng':>10}")
+    for label, batching in (('mỗi request commit', False), ('ghi gộp (WAL)', True)):
+        rate, p50, p99, errors, closed = _run(batching)
+        print(f'{label:>18} | {rate:>7.0f} | {p50:>9.1f} | {p99:>9.1f} | {errors:>4} | {closed:>10}')
+
+
+if __name__ == '__main__':
+    main()
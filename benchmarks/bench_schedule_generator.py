@@ -0,0 +1,63 @@
+# /benchmarks/bench_schedule_generator.py
+# Đo thời gian tự động xếp lịch một tháng (tham lam + cân bằng), tính diff (dry-run) và ghi vào CSDL.
+# Chạy: python benchmarks/bench_schedule_generator.py
+
+import random
+import time
+from datetime import date, timedelta
+from common import make_app, seed_employees, count_queries
+
+HEADCOUNTS = [100, 500, 1000]
+
+
+def _next_month():
+    today = date.today()
+    start = (today.replace(day=1) + timedelta(days=32)).replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return start, end
+
+
+def main():
+    from app.models import db, Shift, LeaveRequest
+    from app.schedule.generator import generate_schedule, apply_plan
+
+    start, end = _next_month()
+    print(f'Xếp lịch {start} -> {end}')
+    print(f"{'nhân viên':>10} | {'xếp (ms)':>9} | {'diff (ms)':>9} | {'ghi (ms)':>9} | {'truy vấn':>8} | "
+          f"{'ca xếp':>7} | {'ô thiếu':>7} | {'ca/người (month)':>16} | {'ca/người (hour)':>15}")
+    for headcount in HEADCOUNTS:
+        app = make_app()
+        with app.app_context():
+            user_ids = seed_employees(headcount, days=1)
+            # Nhu cầu ~85% khả năng cung ứng: ca sáng 45%, ca chiều 40% số nhân viên mỗi ngày
+            for shift, ratio in zip(Shift.query.order_by(Shift.start_time).all(), (0.45, 0.40)):
+                shift.required_staff = int(headcount * ratio * 5 / 7)
+            rnd = random.Random(7)
+            db.session.execute(db.insert(LeaveRequest), [
+                {'user_id': uid, 'request_type': 'leave', 'start_date': start + timedelta(days=offset),
+                 'end_date': start + timedelta(days=offset + rnd.randint(0, 4)), 'request_date': date.today(),
+                 'reason': 'bench', 'status': 'approved'}
+                for uid in rnd.sample(user_ids, headcount // 10) for offset in [rnd.randint(0, 25)]
+            ])
+            db.session.commit()
+
+            with count_queries(db.engine) as counter:
+                started = time.perf_counter()
+                plan = generate_schedule(start, end)
+                generated = time.perf_counter()
+                diff = plan.diff()
+                diffed = time.perf_counter()
+                apply_plan(plan)
+                db.session.commit()
+                applied = time.perf_counter()
+
+            per_unit = plan.stats['shifts_per_employee']
+            fmt = lambda unit: (f"{per_unit[unit]['min']}-{per_unit[unit]['max']} (tb {per_unit[unit]['mean']})"
+                                if unit in per_unit else '-')
+            print(f"{headcount:>10} | {(generated - started) * 1000:>9.0f} | {(diffed - generated) * 1000:>9.0f} | "
+                  f"{(applied - diffed) * 1000:>9.0f} | {counter['count']:>8} | {len(diff.inserts):>7} | "
+                  f"{len(plan.unfilled):>7} | {fmt('month'):>16} | {fmt('hour'):>15}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# /benchmarks/common.py
+# Các hàm dùng chung cho script benchmark: tạo app với CSDL tạm, sinh dữ liệu, đếm truy vấn.
+
+import os
+import sys
+import random
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, date, time, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from sqlalchemy import event
+from config import Config
+
+
+def make_app(**overrides):
+    """Tạo app với một file SQLite tạm (không đụng vào instance/attendance.db)."""
+    db_path = os.path.join(tempfile.mkdtemp(prefix='ks-bench-'), 'bench.db')
+    attrs = {'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + db_path}
+    attrs.update(overrides)
+    bench_config = type('BenchConfig', (Config,), attrs)
+
+    from app import create_app
+    from app.models import db
+    app = create_app(bench_config)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def seed_employees(num_employees, days=60, seed=42):
+    """Sinh nhân viên, hợp đồng, ca, lịch, chấm công, thưởng/phạt, đơn từ (gọi trong app_context)."""
+    from app.models import (db, User, Contract, Attendance, Bonus, Deduction,
+                            LeaveRequest, Shift, Schedule, SalarySettings)
+    rnd = random.Random(seed)
+    today = date.today()
+
+    if not SalarySettings.query.first():
+        db.session.add(SalarySettings())
+    shifts = Shift.query.all()
+    if not shifts:
+        shifts = [Shift(name='Ca Sáng', start_time=time(8), end_time=time(12)),
+                  Shift(name='Ca Chiều', start_time=time(13), end_time=time(17))]
+        db.session.add_all(shifts)
+        db.session.flush()
+    shift_ids = [s.id for s in shifts]
+
+    start_id = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+    db.session.execute(db.insert(User), [
+        {'id': start_id + i, 'username': f'bench_{start_id + i}', 'password': 'x', 'role': 'employee',
+         'avatar_image': 'default-avatar.png'}
+        for i in range(num_employees)
+    ])
+    user_ids = range(start_id, start_id + num_employees)
+
+    contracts, schedules, attendances, bonuses, deductions, leaves = [], [], [], [], [], []
+    for uid in user_ids:
+        is_hourly = rnd.random() < 0.3
+        contracts.append({'user_id': uid, 'start_date': today - timedelta(days=400),
+                          'pay_rate': 25000 if is_hourly else rnd.choice([4e6, 8e6, 12e6, 18e6, 25e6]),
+                          'pay_unit': 'hour' if is_hourly else 'month'})
+        for d in range(days):
+            day = today - timedelta(days=d)
+            if day.weekday() >= 6:
+                continue
+            schedules.append({'user_id': uid, 'shift_id': rnd.choice(shift_ids), 'date': day})
+            if rnd.random() < 0.85:
+                check_in = datetime.combine(day, time(7, 45)) + timedelta(minutes=rnd.randint(0, 40))
+                check_out = check_in + timedelta(hours=rnd.uniform(4, 9)) if d > 0 else None
+                attendances.append({'user_id': uid, 'date': day, 'check_in': check_in, 'check_out': check_out})
+        bonuses.append({'user_id': uid, 'month': today.month, 'year': today.year, 'amount': 500000, 'reason': 'bench'})
+        deductions.append({'user_id': uid, 'month': today.month, 'year': today.year, 'amount': 100000, 'reason': 'bench'})
+        leaves.append({'user_id': uid, 'request_type': rnd.choice(['leave', 'late', 'early', 'shift_change']),
+                       'start_date': today, 'end_date': today + timedelta(days=1), 'request_date': today,
+                       'reason': 'bench', 'status': rnd.choice(['pending', 'approved', 'rejected'])})
+
+    for model, rows in ((Contract, contracts), (Schedule, schedules), (Attendance, attendances),
+                        (Bonus, bonuses), (Deduction, deductions), (LeaveRequest, leaves)):
+        if rows:
+            db.session.execute(db.insert(model), rows)
+    # Gắn lượt chấm công với lịch cùng ngày (như check-in thật) để bảng tổng hợp có số phút trễ
+    db.session.execute(db.update(Attendance).where(Attendance.schedule_id.is_(None)).values(
+        schedule_id=db.select(Schedule.id).where(
+            Schedule.user_id == Attendance.user_id, Schedule.date == Attendance.date
+        ).scalar_subquery()
+    ))
+    db.session.commit()
+
+    from app.attendance.rollup import rebuild_daily_rollup
+    rebuild_daily_rollup()
+    return list(user_ids)
+
+
+@contextmanager
+def count_queries(engine):
+    """Đếm số câu lệnh SQL được gửi tới engine trong khối with."""
+    counter = {'count': 0}
+
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        counter['count'] += 1
+
+    event.listen(engine, 'before_cursor_execute', _before_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', _before_execute)
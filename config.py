@@ -4,12 +4,73 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'your_secret_key_here'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///../instance/attendance.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Profile cấu hình CSDL (xem app/database.py): 'production' = WAL + PRAGMA tối ưu cho SQLite và pool theo loại CSDL,
+    # 'default' = để nguyên mặc định của SQLAlchemy / SQLite
+    DB_PROFILE = os.environ.get('DB_PROFILE', 'production')
+    # Pool kết nối (mặc định: 5 + 5 cho file SQLite, 10 + 20 cho PostgreSQL / MySQL)
+    DB_POOL_SIZE = int(os.environ['DB_POOL_SIZE']) if os.environ.get('DB_POOL_SIZE') else None
+    DB_MAX_OVERFLOW = int(os.environ['DB_MAX_OVERFLOW']) if os.environ.get('DB_MAX_OVERFLOW') else None
+    # PRAGMA cho SQLite ở profile 'production'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    # CSDL đọc cho các hàm @read_only (báo cáo lương, báo cáo chấm công chi tiết):
+    # replica của CSDL máy chủ, hoặc với SQLite là bản sao chỉ đọc (tương đối với thư mục instance).
+    # Bản sao được chụp lại khi migration đổi schema, sau mỗi job tính lương, ở đầu mỗi job báo cáo chi tiết
+    # và khi chạy "flask schema snapshot"; ngoài các lúc đó nó trễ so với CSDL chính, nên các view
+    # dữ liệu sống (dashboard, lịch sử chấm công) luôn đọc CSDL chính. Để trống = đọc thẳng CSDL chính.
+    READ_REPLICA_URI = os.environ.get('READ_REPLICA_URI')
+    READ_SNAPSHOT_PATH = os.environ.get('READ_SNAPSHOT_PATH')
+    # Tự áp dụng migration schema khi khởi động app (xem app/migrations.py)
+    AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', '1') == '1'
     UPLOAD_FOLDER = 'app/static/uploads'
     MAX_CONTENT_LENGTH = 10 * 1024 * 1024
+
+    # Số thread chạy nền cho tính lương / xuất báo cáo (0 = chạy ngay trong request)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    # Lease của job nền: tiến trình chạy job cập nhật heartbeat mỗi JOB_HEARTBEAT_INTERVAL giây,
+    # job 'queued' / 'running' không có heartbeat quá JOB_LEASE_SECONDS giây (tiến trình đã chết) mới bị đánh dấu 'failed'
+    JOB_HEARTBEAT_INTERVAL = int(os.environ.get('JOB_HEARTBEAT_INTERVAL', 30))
+    JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 120))
+    # Job đã xong / lỗi cũ hơn số ngày này bị xóa cùng file kết quả (0 = giữ mãi)
+    JOB_RESULT_RETENTION_DAYS = int(os.environ.get('JOB_RESULT_RETENTION_DAYS', 7))
+    # Số thread nén song song các file CSV trong báo cáo chi tiết (0 = nén tuần tự)
+    REPORT_ZIP_WORKERS = int(os.environ.get('REPORT_ZIP_WORKERS', 0))
+    # Thời gian (giây) cache số thông báo chưa đọc của mỗi user
+    UNREAD_CACHE_TTL = int(os.environ.get('UNREAD_CACHE_TTL', 30))
+    # Cache danh sách nhân viên (dropdown lọc) và tổng số lượt chấm công ở trang lịch sử toàn công ty (giây)
+    EMPLOYEE_CACHE_TTL = int(os.environ.get('EMPLOYEE_CACHE_TTL', 300))
+    ATTENDANCE_COUNT_TTL = int(os.environ.get('ATTENDANCE_COUNT_TTL', 300))
+    # Thời gian (giây) tối đa giữ kết quả phân tích độ phủ / xung đột lịch. Cache nằm trong từng tiến trình:
+    # thay đổi lịch / đơn từ chỉ xóa cache của worker xử lý request đó, các worker khác có thể trả kết quả
+    # cũ tối đa chừng này giây.
+    SCHEDULE_ANALYSIS_TTL = int(os.environ.get('SCHEDULE_ANALYSIS_TTL', 30))
+    # Thông báo ĐÃ ĐỌC cũ hơn số ngày này sẽ được chuyển sang bảng lưu trữ (flask notification archive)
+    NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', 90))
+    # Số dòng chuyển mỗi lô: mỗi lô là một transaction ngắn để không giữ khóa ghi SQLite lâu
+    NOTIFICATION_ARCHIVE_BATCH = int(os.environ.get('NOTIFICATION_ARCHIVE_BATCH', 500))
+    # Gửi email / push qua outbox (xem app/notification/outbox.py): 'auto' = chỉ gửi thật qua kênh đã có thông tin
+    # đăng nhập (MAIL_USERNAME + MAIL_APP_PASSWORD, FCM_CREDENTIALS_FILE), 'live' = luôn gửi thật, 'fake' = không gửi ra ngoài
+    OUTBOX_TRANSPORT = os.environ.get('OUTBOX_TRANSPORT', 'auto')
+    # Số giây giữa 2 lần quét outbox (0 = không chạy thread nền, dùng "flask notification dispatch-outbox")
+    OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 5))
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 100))
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 5))
+    OUTBOX_RETRY_DELAY = int(os.environ.get('OUTBOX_RETRY_DELAY', 30))
+    # Ghi gộp check-in / check-out bằng một thread ghi (xem app/attendance/ingest.py), bật khi giờ giao ca hay bị "database is locked"
+    PUNCH_BATCHING = os.environ.get('PUNCH_BATCHING', '0') == '1'
+    # Số giây gom thêm lượt chấm công cho một lô, số lượt tối đa mỗi lô, số giây request chờ lô được commit
+    PUNCH_BATCH_WINDOW = float(os.environ.get('PUNCH_BATCH_WINDOW', 0.005))
+    PUNCH_BATCH_SIZE = int(os.environ.get('PUNCH_BATCH_SIZE', 200))
+    PUNCH_ACK_TIMEOUT = float(os.environ.get('PUNCH_ACK_TIMEOUT', 10))
     
     # Cấu hình email
     MAIL_SERVER = 'smtp.gmail.com'
     MAIL_PORT = 587
     MAIL_USE_TLS = True
-    MAIL_USERNAME = os.environ.get('MAIL_USERNAME') or 'your_email@gmail.com'
-    MAIL_PASSWORD = os.environ.get('MAIL_APP_PASSWORD') or 'your_app_password'
\ No newline at end of file
+    MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
+    MAIL_PASSWORD = os.environ.get('MAIL_APP_PASSWORD')
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or MAIL_USERNAME
+    # File JSON service account Firebase cho push (để trống = không gửi push khi OUTBOX_TRANSPORT = 'auto')
+    FCM_CREDENTIALS_FILE = os.environ.get('FCM_CREDENTIALS_FILE')
\ No newline at end of file
@@ -0,0 +1,77 @@
+# /tests/conftest.py
+# Fixture dùng chung: app với file SQLite tạm (không đụng vào instance/attendance.db), không chạy thread nền.
+
+import os
+import sys
+from contextlib import contextmanager
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config
+
+
+@pytest.fixture
+def app(tmp_path):
+    test_config = type('TestConfig', (Config,), {
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'test.db'),
+        'READ_REPLICA_URI': None,
+        'READ_SNAPSHOT_PATH': None,
+        'OUTBOX_TRANSPORT': 'fake',
+        'OUTBOX_POLL_INTERVAL': 0,
+        'JOB_WORKERS': 0,
+        'JOB_HEARTBEAT_INTERVAL': 0,
+        'JOB_RESULT_FOLDER': str(tmp_path / 'jobs'),
+        'PUNCH_BATCHING': False,
+    })
+    from app import create_app
+    from app.models import db
+    app = create_app(test_config)
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, user):
+    """Đăng nhập bằng cách ghi thẳng vào session (bỏ qua form đăng nhập)."""
+    with client.session_transaction() as sess:
+        sess['user_id'] = user.id
+        sess['role'] = user.role
+        sess['username'] = user.username
+        sess['avatar_image'] = user.avatar_image
+
+
+def make_user(username, role='employee', pay_unit=None, pay_rate=0):
+    """Tạo nhân viên (kèm hợp đồng nếu có pay_unit), trả về User đã flush."""
+    from app.models import db, User, Contract
+    user = User(username=username, password='x', role=role, avatar_image='default-avatar.png')
+    db.session.add(user)
+    db.session.flush()
+    if pay_unit:
+        db.session.add(Contract(user_id=user.id, start_date=date(2020, 1, 1), pay_rate=pay_rate, pay_unit=pay_unit))
+    return user
+
+
+@contextmanager
+def count_queries(engine):
+    """Đếm số câu lệnh SQL được gửi tới engine trong khối with."""
+    counter = {'count': 0}
+
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        counter['count'] += 1
+
+    event.listen(engine, 'before_cursor_execute', _before_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', _before_execute)
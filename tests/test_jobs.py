@@ -0,0 +1,50 @@
+# /tests/test_jobs.py
+# Job nền (JobRunner, JOB_WORKERS = 0 nên job chạy ngay trong lời gọi submit): file kết quả, job lỗi, lease.
+
+import os
+from datetime import datetime, timedelta
+
+from app.models import db, BackgroundJob
+from app.jobs.runner import JobArtifact
+
+
+def _chunks(fail_after=None):
+    for i in range(3):
+        if fail_after is not None and i == fail_after:
+            raise RuntimeError('Lỗi khi nén')
+        yield b'chunk%d;' % i
+
+
+def test_stores_streamed_artifact(app):
+    runner = app.extensions['job_runner']
+    job_id = runner.submit('report', lambda progress: JobArtifact(_chunks(), 'a.zip', 'application/zip'), {})
+    job = db.session.get(BackgroundJob, job_id)
+    assert job.status == 'done' and job.progress == 1.0
+    with open(job.result_path, 'rb') as f:
+        assert f.read() == b'chunk0;chunk1;chunk2;'
+    assert os.listdir(app.config['JOB_RESULT_FOLDER']) == [job_id]
+
+
+def test_failed_stream_leaves_no_partial_file(app, caplog):
+    runner = app.extensions['job_runner']
+    job_id = runner.submit('report', lambda progress: JobArtifact(_chunks(fail_after=2), 'a.zip', 'application/zip'), {})
+    job = db.session.get(BackgroundJob, job_id)
+    assert job.status == 'failed' and job.message == 'Lỗi khi nén'
+    assert job.result_path is None
+    assert os.listdir(app.config['JOB_RESULT_FOLDER']) == []
+    assert any(record.exc_info and job_id in record.getMessage() for record in caplog.records)
+
+
+def test_reaps_only_expired_leases(app):
+    runner = app.extensions['job_runner']
+    now = datetime.utcnow()
+    db.session.add_all([
+        BackgroundJob(id='alive', job_type='payroll', status='running', worker_id='khac:1', heartbeat_at=now),
+        BackgroundJob(id='dead', job_type='payroll', status='running', worker_id='khac:2',
+                      heartbeat_at=now - timedelta(seconds=app.config['JOB_LEASE_SECONDS'] + 5)),
+    ])
+    db.session.commit()
+    runner.reap_expired()
+    db.session.expire_all()
+    assert db.session.get(BackgroundJob, 'alive').status == 'running'
+    assert db.session.get(BackgroundJob, 'dead').status == 'failed'
@@ -0,0 +1,68 @@
+# /tests/test_leave_bulk.py
+# API duyệt / từ chối đơn hàng loạt (leave.process_bulk): kiểm tra dữ liệu vào và kết quả.
+
+from datetime import date
+
+import pytest
+
+from app.models import db, LeaveRequest, Notification
+from conftest import login, make_user
+
+
+@pytest.fixture
+def pending(app, client):
+    admin = make_user('admin', role='admin')
+    employee = make_user('nv1')
+    requests = [LeaveRequest(user_id=employee.id, request_type='leave', start_date=date(2026, 11, d),
+                             end_date=date(2026, 11, d), reason='r', status='pending') for d in (2, 3, 4)]
+    db.session.add_all(requests)
+    db.session.commit()
+    login(client, admin)
+    return [r.id for r in requests]
+
+
+def test_approves_ids_sent_as_numbers(client, pending):
+    response = client.post('/leave/process_bulk', json={'ids': pending[:2], 'action': 'approved'})
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['updated_ids'] == pending[:2]
+    assert LeaveRequest.query.filter_by(status='approved').count() == 2
+    assert Notification.query.count() == 2
+
+
+def test_accepts_numeric_strings_like_the_checkbox_values(client, pending):
+    response = client.post('/leave/process_bulk', json={'ids': [str(i) for i in pending], 'action': 'rejected'})
+    assert response.status_code == 200
+    assert response.get_json()['updated'] == 3
+
+
+def test_skips_requests_that_are_no_longer_pending(client, pending):
+    client.post('/leave/process_bulk', json={'ids': [pending[0]], 'action': 'approved'})
+    body = client.post('/leave/process_bulk', json={'ids': pending, 'action': 'rejected'}).get_json()
+    assert body['updated_ids'] == pending[1:]
+    assert body['skipped_ids'] == [pending[0]]
+
+
+def test_form_post(client, pending):
+    response = client.post('/leave/process_bulk', data={'ids': [str(pending[0])], 'action': 'approved'})
+    assert response.status_code == 200
+    assert response.get_json()['updated_ids'] == [pending[0]]
+
+
+@pytest.mark.parametrize('payload', [
+    {'ids': '12', 'action': 'approved'},          # chuỗi không được tách thành các id 1 và 2
+    {'ids': [True], 'action': 'approved'},
+    {'ids': [1.5], 'action': 'approved'},
+    {'ids': ['abc'], 'action': 'approved'},
+    {'ids': [[1]], 'action': 'approved'},
+    {'action': 'approved'},
+    {'ids': [], 'action': 'approved'},
+    {'ids': [1], 'action': 'delete'},
+    [1, 2],                                        # body không phải object JSON
+    12,
+])
+def test_rejects_invalid_payload(client, pending, payload):
+    response = client.post('/leave/process_bulk', json=payload)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    assert LeaveRequest.query.filter_by(status='pending').count() == 3
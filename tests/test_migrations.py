@@ -0,0 +1,78 @@
+# /tests/test_migrations.py
+# Migration schema: backfill bảng tổng hợp (v10) và khóa khi nhiều tiến trình cùng upgrade().
+
+import threading
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.models import db, Attendance, AttendanceDaily, SchemaMigration, SchemaMigrationLock
+from app.migrations import MIGRATIONS, upgrade, current_version, _backfill_daily_rollup
+from conftest import make_user
+
+
+@pytest.fixture
+def legacy(app):
+    """CSDL ở version 9: có chấm công nhưng attendance_daily chưa được backfill (trừ một dòng ghi sau nâng cấp)."""
+    users = [make_user(f'nv{i}') for i in range(3)]
+    day = date(2026, 3, 2)
+    for user in users:
+        for offset in range(2):
+            check_in = datetime.combine(day + timedelta(days=offset), datetime.min.time()) + timedelta(hours=8)
+            db.session.add(Attendance(user_id=user.id, date=check_in.date(), check_in=check_in,
+                                      check_out=check_in + timedelta(hours=4)))
+    # Dòng do check-in của một worker đã chạy bản mới ghi vào, backfill không được ghi đè / xóa
+    db.session.add(AttendanceDaily(user_id=users[0].id, date=day, worked_seconds=123, completed_punches=1))
+    SchemaMigration.query.filter(SchemaMigration.version >= 10).delete()
+    db.session.commit()
+    return users, day
+
+
+def test_backfill_adds_missing_days_and_keeps_existing_rows(app, legacy):
+    users, day = legacy
+    assert upgrade() == [v for v, _, _ in MIGRATIONS if v >= 10]
+    assert AttendanceDaily.query.count() == 6
+    kept = AttendanceDaily.query.filter_by(user_id=users[0].id, date=day).one()
+    assert kept.worked_seconds == 123
+    other = AttendanceDaily.query.filter_by(user_id=users[1].id, date=day).one()
+    assert other.worked_seconds == 4 * 3600 and other.completed_punches == 1
+
+    _backfill_daily_rollup()  # chạy lại không lỗi, không nhân đôi
+    assert AttendanceDaily.query.count() == 6
+
+
+def test_upgrade_is_a_no_op_when_up_to_date(app):
+    assert upgrade() == []
+    assert SchemaMigrationLock.query.count() == 0
+
+
+def test_concurrent_upgrades_apply_each_migration_once(app, legacy):
+    results, errors = [], []
+
+    def worker():
+        with app.app_context():
+            try:
+                results.append(upgrade())
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(v for applied in results for v in applied) == [v for v, _, _ in MIGRATIONS if v >= 10]
+    assert current_version() == MIGRATIONS[-1][0]
+    assert AttendanceDaily.query.count() == 6
+    assert SchemaMigrationLock.query.count() == 0
+
+
+def test_stale_lock_is_reclaimed(app, legacy):
+    db.session.add(SchemaMigrationLock(id=1, owner='host-chet:1', acquired_at=datetime.utcnow() - timedelta(days=1)))
+    db.session.commit()
+    assert upgrade()
+    assert SchemaMigrationLock.query.count() == 0
@@ -0,0 +1,38 @@
+# /tests/test_notification_retention.py
+# Lưu trữ thông báo cũ đã đọc (archive_read_notifications).
+
+from datetime import datetime, timedelta
+
+from app.models import db, Notification, NotificationArchive
+from app.notification.retention import archive_read_notifications
+from conftest import make_user
+
+
+def _add(user, count, is_read=True, days_old=200):
+    for i in range(count):
+        db.session.add(Notification(user_id=user.id, message=f'm{i}', is_read=is_read,
+                                    timestamp=datetime.utcnow() - timedelta(days=days_old)))
+    db.session.commit()
+
+
+def test_moves_only_old_read_notifications_in_batches(app):
+    user = make_user('nv1')
+    _add(user, 5)
+    _add(user, 2, is_read=False)
+    _add(user, 1, days_old=1)
+    stats = archive_read_notifications(older_than_days=90, batch_size=2)
+    assert stats['rows_moved'] == 5 and stats['batches'] == 3
+    assert Notification.query.count() == 3
+    assert NotificationArchive.query.count() == 5
+
+
+def test_reused_notification_ids_do_not_stop_archiving(app):
+    user = make_user('nv1')
+    _add(user, 3)
+    archive_read_notifications(older_than_days=90)
+    # Bảng notification trống: SQLite cấp lại id đã dùng cho thông báo mới
+    _add(user, 3)
+    assert {n.id for n in Notification.query} == {1, 2, 3}
+
+    assert archive_read_notifications(older_than_days=90)['rows_moved'] == 3
+    assert sorted(a.notification_id for a in NotificationArchive.query) == [1, 1, 2, 2, 3, 3]
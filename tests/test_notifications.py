@@ -0,0 +1,56 @@
+# /tests/test_notifications.py
+# Trang thông báo: phân trang keyset, đánh dấu đã đọc, số truy vấn cố định.
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import db, Notification
+from app.notification.cache import get_unread_count
+from app.notification.routes import NOTIFICATIONS_PER_PAGE
+from conftest import login, make_user, count_queries
+
+
+@pytest.fixture
+def employee(app, client):
+    user = make_user('nv1')
+    other = make_user('nv2')
+    base = datetime(2026, 1, 1)
+    db.session.execute(db.insert(Notification), [
+        {'user_id': user.id, 'message': f'm{i}', 'is_read': False, 'timestamp': base + timedelta(minutes=i)}
+        for i in range(NOTIFICATIONS_PER_PAGE + 5)
+    ] + [{'user_id': other.id, 'message': 'khác', 'is_read': False, 'timestamp': base}])
+    db.session.commit()
+    login(client, user)
+    return user
+
+
+def test_marks_all_read_even_when_the_cached_count_is_stale(client, employee):
+    assert get_unread_count(employee.id) == NOTIFICATIONS_PER_PAGE + 5
+    # Một worker khác thêm thông báo: cache của tiến trình này vẫn giữ số cũ
+    db.session.add(Notification(user_id=employee.id, message='mới', is_read=False, timestamp=datetime(2026, 2, 1)))
+    db.session.commit()
+
+    assert client.get('/notifications/').status_code == 200
+    assert Notification.query.filter_by(user_id=employee.id, is_read=False).count() == 0
+    assert Notification.query.filter_by(is_read=False).count() == 1  # thông báo của người khác giữ nguyên
+    assert get_unread_count(employee.id) == 0
+
+
+def test_query_count_does_not_grow_with_the_page(app, client, employee):
+    client.get('/notifications/')  # làm nóng cache / template
+    with count_queries(db.engine) as counter:
+        response = client.get('/notifications/')
+    assert response.status_code == 200
+    assert b'm24' in response.data
+    assert counter['count'] <= 5
+
+
+def test_pages_follow_the_cursor_without_gaps(client, employee):
+    first = client.get('/notifications/').data.decode()
+    assert 'm24' in first and 'm5<' in first and 'm4<' not in first
+    assert 'cursor=' in first
+    cursor = first.split('cursor=')[1].split('"')[0]
+    second = client.get('/notifications/?cursor=' + cursor).data.decode()
+    assert all(f'm{i}<' in second for i in range(5))
+    assert 'm5<' not in second and 'cursor=' not in second
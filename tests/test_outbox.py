@@ -0,0 +1,80 @@
+# /tests/test_outbox.py
+# Outbox gửi email / push: nhận lô (claim), thử lại với thời gian chờ tăng dần, transport.
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import db, OutboxMessage
+from app.notification.outbox import enqueue_bulk
+from app.notification.transports import Transport, FakeTransport
+from conftest import make_user, count_queries
+
+
+@pytest.fixture
+def outbox(app):
+    dispatcher = app.extensions['outbox']
+    dispatcher.register_transport(FakeTransport('email', fail_recipients=['hong@example.com']))
+    return dispatcher
+
+
+def _enqueue(*emails):
+    users = []
+    for i, email in enumerate(emails):
+        user = make_user(f'nv{i}')
+        user.email = email
+        users.append(user)
+    db.session.flush()
+    enqueue_bulk((user.id, 'Tiêu đề', 'Nội dung') for user in users)
+    db.session.commit()
+
+
+def test_idle_dispatch_only_selects(app, outbox):
+    with count_queries(db.engine) as counter:
+        assert outbox.dispatch_pending() == 0
+    assert counter['count'] == 1
+
+
+def test_sends_due_messages_once(app, outbox):
+    _enqueue('a@example.com', 'b@example.com')
+    assert outbox.dispatch_pending() == 2
+    assert outbox.transports['email'].sent == [('a@example.com', 'Tiêu đề', 'Nội dung'),
+                                               ('b@example.com', 'Tiêu đề', 'Nội dung')]
+    assert OutboxMessage.query.filter_by(status='sent').count() == 2
+    assert outbox.dispatch_pending() == 0
+
+
+def test_claimed_batch_is_not_claimed_again(app, outbox):
+    _enqueue('a@example.com')
+    first = outbox._claim_batch(datetime.utcnow())
+    assert len(first) == 1 and first[0].claim_token
+    assert outbox._claim_batch(datetime.utcnow()) == []
+    # Hết lease (tiến trình nhận lô đã chết): lô được nhận lại
+    assert len(outbox._claim_batch(datetime.utcnow() + outbox.CLAIM_LEASE + timedelta(seconds=1))) == 1
+
+
+def test_retries_with_backoff_then_fails(app, outbox):
+    app.config.update(OUTBOX_MAX_ATTEMPTS=3, OUTBOX_RETRY_DELAY=10)
+    _enqueue('hong@example.com')
+    delays = []
+    for attempt in range(1, 4):
+        before = datetime.utcnow()
+        assert outbox.dispatch_once() == 1
+        message = db.session.get(OutboxMessage, 1)
+        db.session.refresh(message)
+        assert message.attempts == attempt
+        if attempt < 3:
+            assert message.status == 'pending'
+            delays.append(round((message.next_attempt_at - before).total_seconds()))
+            message.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)  # tới hạn thử lại
+            db.session.commit()
+    assert message.status == 'failed' and message.last_error == 'Lỗi giả lập'
+    assert delays == [10, 20]
+
+
+def test_incomplete_transport_fails_at_construction():
+    class Incomplete(Transport):
+        channel = 'sms'
+
+    with pytest.raises(TypeError):
+        Incomplete()
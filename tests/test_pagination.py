@@ -0,0 +1,41 @@
+# /tests/test_pagination.py
+# Cursor của phân trang keyset (app/pagination.py).
+
+from datetime import date, datetime
+
+import pytest
+
+from app.models import db, Notification
+from app.pagination import encode_cursor, decode_cursor, keyset_paginate
+from conftest import make_user
+
+
+def test_cursor_round_trip_keeps_types():
+    values = [datetime(2026, 3, 4, 5, 6, 7), date(2026, 3, 4), 'an', 42]
+    assert decode_cursor(encode_cursor(values), 4) == values
+
+
+@pytest.mark.parametrize('cursor', ['', None, 'không-phải-base64!', encode_cursor([1, 2])])
+def test_invalid_cursor_means_first_page(cursor):
+    assert decode_cursor(cursor, 3) is None
+
+
+def test_walks_every_row_once_with_ties_on_the_first_column(app):
+    user = make_user('nv1')
+    same_time = datetime(2026, 1, 1)
+    db.session.add_all([Notification(user_id=user.id, message=str(i), timestamp=same_time if i % 2 else datetime(2026, 1, i + 1))
+                        for i in range(23)])
+    db.session.commit()
+
+    seen, cursor = [], None
+    while True:
+        page = keyset_paginate(Notification.query, columns=(Notification.timestamp, Notification.id),
+                               descending=(True, True), cursor=cursor, per_page=5,
+                               key=lambda n: (n.timestamp, n.id))
+        seen.extend(n.id for n in page.items)
+        if not page.has_next:
+            break
+        cursor = page.next_cursor
+
+    expected = [n.id for n in Notification.query.order_by(Notification.timestamp.desc(), Notification.id.desc())]
+    assert seen == expected
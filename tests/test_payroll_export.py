@@ -0,0 +1,20 @@
+# /tests/test_payroll_export.py
+# Tải bản xuất dạng cột của tháng (payroll.monthly_export).
+
+import pytest
+
+from app.models import db
+from conftest import login, make_user
+
+
+@pytest.fixture
+def admin_client(app, client):
+    admin = make_user('admin', role='admin')
+    db.session.commit()
+    login(client, admin)
+    return client
+
+
+@pytest.mark.parametrize('path', ['/payroll/export/2026/13', '/payroll/export/2026/0', '/payroll/export/99999/1'])
+def test_out_of_range_period_is_404(admin_client, path):
+    assert admin_client.get(path).status_code == 404
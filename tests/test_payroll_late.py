@@ -0,0 +1,52 @@
+# /tests/test_payroll_late.py
+# Phạt đi trễ trong tính lương: chỉ ngày có late_minutes > 0 và KHÔNG có đơn xin đi trễ đã duyệt cho đúng ngày.
+
+from datetime import date
+
+import pytest
+
+from app.models import db, AttendanceDaily, LeaveRequest, Payroll, SalarySettings
+from app.payroll.calculator import (_get_employee_late_days, _get_late_days_for_month,
+                                    calculate_and_store_salaries)
+from conftest import make_user
+
+
+@pytest.fixture
+def late_month(app):
+    db.session.add(SalarySettings(late_penalty_amount=50000))
+    user = make_user('nv1', pay_unit='month', pay_rate=24000000)
+    other = make_user('nv2', pay_unit='month', pay_rate=24000000)
+    for day, late in ((2, 10), (3, 5), (4, 20), (5, 15), (6, 0)):
+        db.session.add(AttendanceDaily(user_id=user.id, date=date(2026, 3, day), worked_seconds=8 * 3600,
+                                       completed_punches=1, late_minutes=late))
+    db.session.add(AttendanceDaily(user_id=user.id, date=date(2026, 2, 27), worked_seconds=8 * 3600,
+                                   completed_punches=1, late_minutes=30))  # tháng khác
+    db.session.add(AttendanceDaily(user_id=other.id, date=date(2026, 3, 2), worked_seconds=8 * 3600,
+                                   completed_punches=1, late_minutes=0))
+
+    def late_request(user_id, day, status='approved', request_type='late'):
+        db.session.add(LeaveRequest(user_id=user_id, request_type=request_type, request_date=date(2026, 3, day),
+                                    start_date=date(2026, 3, day), reason='r', status=status))
+
+    late_request(user.id, 3)                          # được miễn
+    late_request(user.id, 7)                          # đơn cho ngày khác: không miễn ngày 4
+    late_request(user.id, 5, status='pending')        # chưa duyệt: không miễn
+    late_request(user.id, 2, request_type='early')    # sai loại đơn: không miễn
+    late_request(other.id, 2)                         # đơn của người khác: không miễn
+    db.session.commit()
+    return user, other
+
+
+def test_counts_only_unexcused_late_days(late_month):
+    user, other = late_month
+    assert _get_employee_late_days(user.id, 3, 2026) == 3
+    assert _get_late_days_for_month(3, 2026) == {user.id: 3}
+
+
+@pytest.mark.parametrize('bulk', [True, False])
+def test_penalty_is_applied_the_same_way_in_both_modes(late_month, bulk):
+    user, other = late_month
+    calculate_and_store_salaries(3, 2026, bulk=bulk)
+    payroll = {p.user_id: p for p in Payroll.query.filter_by(month=3, year=2026)}
+    assert payroll[user.id].gross_salary - payroll[user.id].net_salary == pytest.approx(3 * 50000)
+    assert payroll[other.id].gross_salary == payroll[other.id].net_salary
@@ -0,0 +1,23 @@
+# /tests/test_punch_writer.py
+# Ghi gộp chấm công (PunchWriter._write_batch): lô lỗi được ghi lại từng lượt, lỗi được ghi log.
+
+from concurrent.futures import Future
+from datetime import datetime
+
+from app.models import db, Attendance
+from conftest import make_user
+
+
+def test_failed_batch_falls_back_to_single_punches_and_logs(app, caplog):
+    user = make_user('nv1')
+    db.session.commit()
+    writer = app.extensions['punch_writer']
+    good, bad = Future(), Future()
+    writer._write_batch([('check_in', user.id, datetime(2026, 3, 2, 8, 0), good),
+                         ('khong_hop_le', user.id, datetime(2026, 3, 2, 8, 1), bad)])
+
+    assert good.result().category == 'success'
+    assert isinstance(bad.exception(), KeyError)
+    assert Attendance.query.filter_by(user_id=user.id).count() == 1
+    assert any(record.exc_info and 'khong_hop_le' in record.getMessage() and '2 lượt' in record.getMessage()
+               for record in caplog.records)
@@ -0,0 +1,53 @@
+# /tests/test_schedule_bulk.py
+# API xếp lịch hàng loạt theo mẫu tuần (schedule.bulk_update_schedule).
+
+from datetime import date, time
+
+import pytest
+
+from app.models import db, Shift, Schedule
+from app.schedule import bulk
+from conftest import login, make_user
+
+
+@pytest.fixture
+def setup(app, client):
+    admin = make_user('admin', role='admin')
+    employee = make_user('nv1')
+    shift = Shift(name='Sáng', start_time=time(8), end_time=time(12))
+    db.session.add(shift)
+    db.session.commit()
+    login(client, admin)
+    return employee, shift
+
+
+def _template(start, end, entries):
+    return {'template': {'start_date': start, 'end_date': end, 'entries': entries}}
+
+
+def test_weekly_template_is_applied(client, setup):
+    employee, shift = setup
+    response = client.post('/schedule/bulk_update', json=_template(
+        '2026-11-02', '2026-11-15', [{'user_id': employee.id, 'days': {'0': shift.id, '2': shift.id}}]))
+    assert response.status_code == 200
+    days = sorted(d for (d,) in db.session.query(Schedule.date).filter_by(user_id=employee.id))
+    assert days == [date(2026, 11, 2), date(2026, 11, 4), date(2026, 11, 9), date(2026, 11, 11)]
+
+
+def test_rejects_long_range_before_expanding(client, setup, monkeypatch):
+    employee, shift = setup
+    expanded = []
+    monkeypatch.setattr(bulk, '_parse_shift', lambda value: expanded.append(value) or value)
+    response = client.post('/schedule/bulk_update', json=_template(
+        '2000-01-01', '2040-12-31', [{'user_id': employee.id, 'days': {'0': shift.id}}]))
+    assert response.status_code == 400
+    assert expanded == []
+
+
+def test_rejects_when_days_times_entries_exceed_the_limit(client, setup, monkeypatch):
+    employee, shift = setup
+    monkeypatch.setattr(bulk, 'BULK_SCHEDULE_LIMIT', 100)
+    entries = [{'user_id': employee.id, 'days': {'0': shift.id}}] * 8
+    response = client.post('/schedule/bulk_update', json=_template('2026-11-02', '2026-11-15', entries))
+    assert response.status_code == 400
+    assert Schedule.query.count() == 0
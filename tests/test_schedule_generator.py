@@ -0,0 +1,91 @@
+# /tests/test_schedule_generator.py
+# Bộ xếp lịch tự động: giới hạn ca mỗi tuần, số ngày làm liên tiếp và giờ nghỉ giữa hai ca.
+
+from datetime import date, time, timedelta
+
+import pytest
+
+from app.models import db, Schedule, Shift
+from app.schedule.generator import GeneratorOptions, generate_schedule
+from conftest import make_user
+
+MONDAY = date(2026, 11, 2)
+
+
+@pytest.fixture
+def day_shift(app):
+    Shift.query.delete()
+    shift = Shift(name='Ca ngày', start_time=time(8), end_time=time(16), required_staff=3)
+    db.session.add(shift)
+    db.session.flush()
+    return shift
+
+
+def _assigned(plan, user_id):
+    return sorted(d for (u, d), shift_id in plan.desired.items() if u == user_id and shift_id)
+
+
+def _week_counts(days, start):
+    counts = {}
+    for d in days:
+        week = (d - start).days // 7
+        counts[week] = counts.get(week, 0) + 1
+    return counts
+
+
+def _longest_run(days):
+    best = run = 0
+    previous = None
+    for d in sorted(days):
+        run = run + 1 if previous and d - previous == timedelta(days=1) else 1
+        best = max(best, run)
+        previous = d
+    return best
+
+
+def test_weekly_cap_by_contract_type(day_shift):
+    monthly = [make_user(f'nv{i}', pay_unit='month', pay_rate=1) for i in range(3)]
+    hourly = make_user('pt', pay_unit='hour', pay_rate=1)
+    db.session.commit()
+    plan = generate_schedule(MONDAY, MONDAY + timedelta(days=13))
+    for user in monthly:
+        assert max(_week_counts(_assigned(plan, user.id), MONDAY).values()) <= 6
+    assert max(_week_counts(_assigned(plan, hourly.id), MONDAY).values(), default=0) <= 4
+
+
+def test_weekly_cap_counts_kept_shifts_later_in_the_week(day_shift):
+    users = [make_user(f'nv{i}', pay_unit='month', pay_rate=1) for i in range(3)]
+    kept = users[0]
+    db.session.add_all([Schedule(user_id=kept.id, shift_id=day_shift.id, date=MONDAY + timedelta(days=k))
+                        for k in (5, 6)])
+    db.session.commit()
+    plan = generate_schedule(MONDAY, MONDAY + timedelta(days=13))
+    days = _assigned(plan, kept.id)
+    assert {MONDAY + timedelta(days=5), MONDAY + timedelta(days=6)} <= set(days)
+    assert _week_counts(days, MONDAY)[0] <= 6
+
+
+def test_consecutive_days_include_shifts_before_the_range(day_shift):
+    users = [make_user(f'nv{i}', pay_unit='month', pay_rate=1) for i in range(3)]
+    tired = users[1]
+    before = [MONDAY - timedelta(days=k) for k in range(1, 7)]
+    db.session.add_all([Schedule(user_id=tired.id, shift_id=day_shift.id, date=d) for d in before])
+    db.session.commit()
+    plan = generate_schedule(MONDAY, MONDAY + timedelta(days=13))
+    days = _assigned(plan, tired.id)
+    assert MONDAY not in days
+    assert _longest_run(before + days) <= 6
+
+
+def test_min_rest_hours_between_night_and_morning_shifts(day_shift):
+    day_shift.required_staff = 0
+    night = Shift(name='Ca đêm', start_time=time(22), end_time=time(6), required_staff=1)
+    morning = Shift(name='Ca sáng', start_time=time(7), end_time=time(12), required_staff=1)
+    db.session.add_all([night, morning])
+    users = [make_user(f'nv{i}', pay_unit='month', pay_rate=1) for i in range(3)]
+    db.session.commit()
+    plan = generate_schedule(MONDAY, MONDAY + timedelta(days=6), GeneratorOptions(min_rest_hours=11))
+    for user in users:
+        for d in _assigned(plan, user.id):
+            if plan.desired[(user.id, d)] == night.id:
+                assert plan.desired.get((user.id, d + timedelta(days=1))) != morning.id